@@ -20,26 +20,12 @@ ALGORITHMS = ['random_move', 'compress', 'phototax', 'mzsolve']
 class Agent(Amoebot):
     r"""
     Inherits from class `Amoebots`. Each amoebot launches an `Agent` at each 
-    round of activation that performs one step of the desired algorithm.
+    round of activation that performs one step of the desired algorithm. The
+    agent is a view over the amoebot's row in the `ParticleTable`, creating one
+    is cheap.
     """
 
-    def __init__(self, __id: np.uint8, head: np.ndarray,
-                 tail: np.ndarray = None):
-        r"""
-        Attributes
-
-            __id (numpy.uint8) :: unique particle identifier.
-            head (numpy.ndarray) :: position (x and y co-ordinates) of amoebot 
-                            head.
-            tail (numpy.ndarray) default: None :: position (x and y co-ordinates) 
-                            of amoebot tail.
-        """
-
-        # initialise the super class
-        super().__init__(__id, head, tail)
-
-        # does not share id with super class
-        self.__id = __id
+    __slots__ = []
 
     def execute(
             self,
@@ -53,8 +39,8 @@ class Agent(Amoebot):
 
         Attributes
 
-            __nmap (defaultdict) :: a dictionary of dictionaries used to index 
-                            nodes using x and y co-ordinates.
+            __nmap (NodeManagerBitArray) :: node manager shared by all agents 
+                            of the simulation.
             algorithm (str) default: 'random_move' :: algorithm being performed 
                             in current step, one of "random_move", "compress" 
                             ...
@@ -64,7 +50,7 @@ class Agent(Amoebot):
 
             nenv (ndarray) default: None :: node environment
 
-        Return (defaultdict): udpated `__nmap` dictionary.
+        Return (tuple): the agent and the updated `__nmap` node manager.
         """
 
         # make sure `algorithm` is available
@@ -154,7 +140,7 @@ class Agent(Amoebot):
 
         # execute the sequential Markov Chain algorithm M
         if not async_mode:
-            __nmap = compress_agent_sequential(self, __nmap, _id=self.__id)
+            __nmap = compress_agent_sequential(self, __nmap, _id=self._getid())
 
         # execute the asynchronous algorithm for compression
         else:
@@ -191,7 +177,7 @@ class Agent(Amoebot):
 
         # execute the sequential Markov Chain algorithm M
         if not async_mode:
-            __nmap = maze_solve_sequential(self, __nmap, _id=self.__id)
+            __nmap = maze_solve_sequential(self, __nmap, _id=self._getid())
 
         else: raise NotImplementedError
 
@@ -207,11 +193,13 @@ class Agent(Amoebot):
 
         # execute the sequential Markov Chain algorithm M
         if not async_mode:
-            __nmap = phototax_sequential(self, __nmap, _id=self.__id)
+            __nmap = phototax_sequential(self, __nmap, _id=self._getid())
 
         else: raise NotImplementedError
 
         return __nmap
 
     def _getid(self):
-        return self.__id
+        # bots should be locally indistinguishable, the identifier is only 
+        # read on behalf of the `AmoebotManager` instance
+        return self._table.bot_id[self._row]
@@ -0,0 +1,493 @@
+# -*- coding: utf-8 -*-
+
+""" elements/bot/batch.py
+
+Vectorized engines that advance every particle of a round with array
+operations on the columns of the `ParticleTable`.
+"""
+
+from .lookup import ADMISSIBLE, EDGE_DELTA, MAX_DELTA
+from ..node.chunked import BIAS, STRIDE
+from ..node.lattice import extent_of
+from ..node.manager_utils import LAYOUT, NODE_LAYOUT, NEIGHBORHOOD_RING
+from ...utils.exceptions import InitializationError
+
+import numpy as np
+
+# relative point of every port, indexed by port
+RELATIVE_POINTS = np.array(
+    [v['relative_point'] for _, v in sorted(NODE_LAYOUT[LAYOUT].items())],
+    dtype=np.int64
+)
+
+# rank of occupants that never leave their node during a round
+NEVER = np.iinfo(np.int64).max
+
+# points of one colour are at least this many neighbour steps apart, more
+# than the reach of any batch move, so their moves commute
+COLOUR_SPACING = 4
+N_COLOURS = COLOUR_SPACING ** 2
+
+# axial co-ordinates of a point are its steps along ports 0 and 1, which
+# span the lattice; AXIAL_DET * (a, b) = AXIAL_INVERSE @ (x, y)
+AXIAL_INVERSE = np.array([[RELATIVE_POINTS[1, 1], -RELATIVE_POINTS[1, 0]],
+                          [-RELATIVE_POINTS[0, 1], RELATIVE_POINTS[0, 0]]])
+AXIAL_DET = int(RELATIVE_POINTS[0, 0] * RELATIVE_POINTS[1, 1] -
+                RELATIVE_POINTS[0, 1] * RELATIVE_POINTS[1, 0])
+
+def lattice_colours(x:np.ndarray, y:np.ndarray) -> np.ndarray:
+    r"""
+    Colour lattice points by their axial co-ordinates, the steps along ports
+    0 and 1 of the node layout, modulo `COLOUR_SPACING`.
+
+    Return (numpy.ndarray): colour in [0, N_COLOURS) of every point.
+    """
+    x, y = x.astype(np.int64), y.astype(np.int64)
+    (a1, a2), (b1, b2) = AXIAL_INVERSE.tolist()
+    a, b = (a1 * x + a2 * y) // AXIAL_DET, (b1 * x + b2 * y) // AXIAL_DET
+    return (a % COLOUR_SPACING) * COLOUR_SPACING + b % COLOUR_SPACING
+
+def point_keys(x:np.ndarray, y:np.ndarray) -> np.ndarray:
+    r"""
+    Pack lattice points into single int64 keys, the packing of the chunked
+    lattice; co-ordinates must stay within +-BIAS, see `check_key_range`.
+    """
+    return (x.astype(np.int64) + BIAS) * STRIDE + (y.astype(np.int64) + BIAS)
+
+def check_key_range(points:np.ndarray,
+                    remedy:str="use `exec_sequential`"):
+    r"""
+    Refuse a configuration whose points, with a margin for the walk to grow,
+    leave the +-BIAS range of `point_keys` and of the chunked lattice, where
+    distinct points would share a key.
+
+    Attributes
+
+        points (numpy.ndarray) :: n x 2 array of lattice points.
+        remedy (str) default: "use `exec_sequential`" :: advice appended to
+                        the error.
+    """
+    if not points.size: return
+
+    # particles may walk far past the initial configuration, as in
+    # `coordinate_dtype`
+    x_min, y_min, x_max, y_max = extent_of(points)
+    margin = max(x_max - x_min, y_max - y_min, 1)
+
+    if min(x_min, y_min) - margin < -BIAS or \
+            max(x_max, y_max) + margin >= BIAS:
+        raise InitializationError(
+            f"co-ordinates in [{min(x_min, y_min)}, {max(x_max, y_max)}] "
+            f"reach past +-{BIAS}, which packed point keys cannot hold; "
+            f"{remedy}."
+        )
+
+def _find(keys:np.ndarray, queries:np.ndarray) -> tuple:
+    r"""
+    Look the queries up in the sorted `keys`.
+
+    Return (tuple): position of every query in `keys` and whether it is there.
+    """
+    if keys.size == 0:
+        return (np.zeros(queries.size, dtype=np.int64),
+                np.zeros(queries.size, dtype=bool))
+
+    at = np.minimum(np.searchsorted(keys, queries), keys.size - 1)
+    return at, keys[at] == queries
+
+def _earliest(keys:np.ndarray, ranks:np.ndarray,
+              queries:np.ndarray) -> np.ndarray:
+    r"""
+    Attributes
+
+        keys (numpy.ndarray) :: n x k keys held by n moves.
+        ranks (numpy.ndarray) :: activation rank of the n moves.
+        queries (numpy.ndarray) :: n x m keys to look up.
+
+    Return (numpy.ndarray): per row of `queries` the lowest rank holding one
+                    of its keys, `NEVER` if none does.
+    """
+    keys, held_by = keys.ravel(), np.repeat(ranks, keys.shape[1])
+    order = np.lexsort((held_by, keys))
+    keys, held_by = keys[order], held_by[order]
+
+    # the first entry of every key carries its lowest rank
+    first = np.ones(keys.size, dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    keys, held_by = keys[first], held_by[first]
+
+    at, hit = _find(keys, queries.ravel())
+    earliest = np.where(hit, held_by[at], NEVER).reshape(queries.shape)
+    return earliest.min(axis=1)
+
+class BatchEngine(object):
+    r"""
+    Base class of the batch engines, `step` advances the position columns of
+    the table by one round.
+
+    A round is either played as the sequential round in a random activation
+    order, or in colour classes: the particles are coloured by the position
+    of their head with `lattice_colours` and the classes are activated one
+    after the other in random order. Particles of one class are too far apart
+    to interfere, so a class is activated at once with no conflict to settle,
+    and every particle is still activated exactly once per round.
+
+    Attributes
+
+        table (ParticleTable) :: table whose position columns are advanced.
+        wall_keys (numpy.ndarray) :: sorted keys of all wall points.
+        coloured (bool) :: play rounds in colour classes.
+    """
+
+    def __init__(self, table:object, walls:np.ndarray=None,
+                 coloured:bool=False):
+        r"""
+        Attributes
+
+            table (ParticleTable) :: table whose position columns are advanced.
+            walls (numpy.ndarray) default: None :: n x 2 array of wall points.
+            coloured (bool) default: False :: play rounds in colour classes
+                            instead of in a random activation order.
+        """
+        self.table = table
+        self.coloured = coloured
+
+        walls = np.zeros((0, 2), dtype=np.int64) if walls is None else walls
+
+        n = table.size
+        check_key_range(np.concatenate((
+            np.stack((table.head_x[:n], table.head_y[:n]), axis=1),
+            np.stack((table.tail_x[:n], table.tail_y[:n]), axis=1),
+            np.asarray(walls, dtype=np.int64).reshape(-1, 2)
+        )).astype(np.int64))
+
+        self.wall_keys = np.unique(point_keys(walls[:, 0], walls[:, 1]))
+
+    def step(self):
+        r"""
+        Advance every particle by one activation.
+        """
+        if self.coloured: self.step_coloured()
+        else: self._step_sequential()
+
+    def _step_sequential(self): raise NotImplementedError
+
+    def _activate(self, rows:np.ndarray): raise NotImplementedError
+
+    def step_coloured(self, rows:np.ndarray=None):
+        r"""
+        Play a round in colour classes, in random order.
+
+        Attributes
+
+            rows (numpy.ndarray) default: None :: rows to activate once each,
+                            every row if None; the others stay put.
+        """
+        table = self.table
+        rows = np.arange(table.size) if rows is None else rows
+
+        colours = lattice_colours(table.head_x[rows], table.head_y[rows])
+        order = np.argsort(colours, kind='stable')
+        classes = np.split(rows[order], np.searchsorted(colours[order],
+                                                        np.arange(1, N_COLOURS)))
+
+        for colour in np.random.permutation(N_COLOURS).tolist():
+            if classes[colour].size: self._activate(classes[colour])
+
+    def _occupied(self) -> np.ndarray:
+        r"""
+        Return (numpy.ndarray): sorted keys of all occupied nodes.
+        """
+        table = self.table
+        n = table.size
+
+        hx, hy = table.head_x[:n], table.head_y[:n]
+        tx, ty = table.tail_x[:n], table.tail_y[:n]
+        expanded = (hx != tx) | (hy != ty)
+        return np.sort(np.concatenate((point_keys(hx, hy),
+                                       point_keys(tx[expanded], ty[expanded]))))
+
+    def points(self) -> np.ndarray:
+        r"""
+        Return (numpy.ndarray): 4 x n array of head x, head y, tail x and tail
+                        y in row order, the bot identifiers of the columns
+                        are `bot_ids`.
+        """
+        table = self.table
+        n = table.size
+        return np.stack((table.head_x[:n], table.head_y[:n],
+                         table.tail_x[:n], table.tail_y[:n])).astype(np.int64)
+
+    def bot_ids(self) -> np.ndarray:
+        r"""
+        Return (numpy.ndarray): bot identifier of every column of `points`.
+        """
+        return self.table.bot_id[:self.table.size].copy()
+
+class RandomMoveEngine(BatchEngine):
+    r"""
+    Batch engine for the "random_move" algorithm. One call to `step` plays a
+    full sequential round, every particle activated once in random order:
+    expanded particles contract to their head, contracted ones expand through
+    a random port if the target node is free.
+
+    The activation order is drawn as a rank per particle and every conflict is
+    settled by rank, the way the sequential loop would have settled it: a
+    particle may expand into a tail that a lower ranked particle vacated, and
+    of several particles expanding onto the same node the lowest rank wins.
+    The resulting tracks follow the same distribution as the sequential
+    engine.
+    """
+
+    def _step_sequential(self):
+        table = self.table
+        n = table.size
+
+        hx, hy = table.head_x[:n], table.head_y[:n]
+        tx, ty = table.tail_x[:n], table.tail_y[:n]
+
+        # activation order of the round
+        rank = np.random.permutation(n).astype(np.int64)
+
+        expanded = (hx != tx) | (hy != ty)
+        contracted = np.flatnonzero(~expanded)
+
+        # every head stays put, a tail is released at its owner's rank
+        occupied = np.concatenate((point_keys(hx, hy),
+                                   point_keys(tx[expanded], ty[expanded])))
+        released = np.concatenate((np.full(n, NEVER), rank[expanded]))
+        order = np.argsort(occupied, kind='stable')
+        occupied, released = occupied[order], released[order]
+
+        # targets of the contracted particles
+        ports = np.random.randint(6, size=contracted.size)
+        rx, ry = RELATIVE_POINTS[ports].T
+        target_x = hx[contracted] + rx
+        target_y = hy[contracted] + ry
+        targets = point_keys(target_x, target_y)
+
+        # gather the occupant of every target
+        at, hit = _find(occupied, targets)
+        free = ~hit | (released[at] < rank[contracted])
+        free &= ~np.isin(targets, self.wall_keys, assume_unique=False)
+
+        # of all particles heading for the same node the lowest rank wins
+        candidates = np.flatnonzero(free)
+        by_target = np.lexsort((rank[contracted[candidates]],
+                                targets[candidates]))
+        candidates = candidates[by_target]
+        first = np.ones(candidates.size, dtype=bool)
+        first[1:] = targets[candidates[1:]] != targets[candidates[:-1]]
+        winners = candidates[first]
+
+        # scatter the contractions and expansions
+        tx[expanded], ty[expanded] = hx[expanded], hy[expanded]
+
+        movers = contracted[winners]
+        hx[movers], hy[movers] = target_x[winners], target_y[winners]
+
+    def _activate(self, rows:np.ndarray):
+        r"""
+        Activate particles that do not interfere, all at once.
+
+        Attributes
+
+            rows (numpy.ndarray) :: rows of the particles.
+        """
+        table = self.table
+        hx, hy = table.head_x, table.head_y
+        tx, ty = table.tail_x, table.tail_y
+
+        expanded = (hx[rows] != tx[rows]) | (hy[rows] != ty[rows])
+        contracted = rows[~expanded]
+        occupied = self._occupied()
+
+        ports = np.random.randint(6, size=contracted.size)
+        rx, ry = RELATIVE_POINTS[ports].T
+        target_x, target_y = hx[contracted] + rx, hy[contracted] + ry
+
+        targets = point_keys(target_x, target_y)
+        free = ~_find(occupied, targets)[1] & ~np.isin(targets, self.wall_keys)
+
+        rows = rows[expanded]
+        tx[rows], ty[rows] = hx[rows], hy[rows]
+
+        movers = contracted[free]
+        hx[movers], hy[movers] = target_x[free], target_y[free]
+
+class CompressEngine(BatchEngine):
+    r"""
+    Batch engine for the sequential "compress" Markov chain of Cannon et al.
+    (2016). In a round every contracted particle is activated once in random
+    order, picks a random port and moves one node along it if the target is
+    free, the move is admissible by the `lookup` tables and passes the
+    Metropolis filter with lambda = exp(1 / tau). Expanded particles stay put,
+    as in `compress_agent_sequential`.
+
+    A move reads its target and the eight nodes around it and writes its
+    origin and target. The round is played in waves: a move whose target is
+    held by a wall, a settled particle or a later ranked one fails outright,
+    and a move is ready once no earlier ranked pending move writes what it
+    reads or reads what it writes. Ready moves cannot disturb each other and
+    are evaluated together, the outcome is the sequential round in rank order.
+
+    Attributes
+
+        waves (int) :: number of waves the last round took.
+    """
+
+    def __init__(self, table:object, walls:np.ndarray=None,
+                 coloured:bool=False):
+        r"""
+        Attributes
+
+            table (ParticleTable) :: table whose position columns are advanced.
+            walls (numpy.ndarray) default: None :: n x 2 array of wall points.
+            coloured (bool) default: False :: play rounds in colour classes
+                            instead of in a random activation order.
+        """
+        super().__init__(table, walls=walls, coloured=coloured)
+        self.waves = 0
+
+    def _step_sequential(self):
+        table = self.table
+        n = table.size
+
+        hx, hy = table.head_x[:n], table.head_y[:n]
+        tx, ty = table.tail_x[:n], table.tail_y[:n]
+
+        # activation order, ports and Metropolis draws of the round
+        rank = np.random.permutation(n).astype(np.int64)
+        ports = np.random.randint(6, size=n)
+        q = np.random.uniform(size=n)
+
+        expanded = (hx != tx) | (hy != ty)
+        rows = np.flatnonzero(~expanded)
+
+        moves = self._proposals(rows, ports[rows], q[rows])
+        targets, ring = moves['targets'], moves['ring']
+        origins = point_keys(hx[rows], hy[rows])
+
+        # a target held by a wall never frees up
+        pending = np.flatnonzero(~np.isin(targets, self.wall_keys))
+        waiting = np.zeros(n, dtype=bool)
+        waiting[rows[pending]] = True
+
+        x3 = np.flatnonzero(expanded)
+        owners = np.concatenate((np.arange(n), x3))
+
+        self.waves = 0
+        while pending.size:
+            self.waves += 1
+            ranks = rank[rows[pending]]
+
+            # occupied nodes with the rank of their pending owner, -1 if the
+            # owner has settled for the round
+            occupied = np.concatenate((point_keys(hx, hy),
+                                       point_keys(tx[x3], ty[x3])))
+            order = np.argsort(occupied)
+            occupied, owner = occupied[order], owners[order]
+            holder = np.where(waiting[owner], rank[owner], -1)
+
+            # drop moves whose target stays held until they are activated
+            at, hit = _find(occupied, targets[pending])
+            blocked = hit & (holder[at] < 0) | hit & (holder[at] > ranks)
+            waiting[rows[pending[blocked]]] = False
+            pending, ranks = pending[~blocked], ranks[~blocked]
+
+            # ready unless an earlier pending move writes what this one reads
+            # or reads what this one writes
+            writes = np.stack((origins[pending], targets[pending]), axis=1)
+            reads = np.concatenate((targets[pending, None], ring[pending]),
+                                   axis=1)
+            ready = _earliest(writes, ranks, reads) >= ranks
+            ready &= _earliest(reads, ranks, writes) >= ranks
+
+            self._move(rows, pending[ready], moves, occupied)
+            waiting[rows[pending[ready]]] = False
+            pending = pending[~ready]
+
+    def _activate(self, rows:np.ndarray):
+        r"""
+        Activate particles that do not interfere, all at once.
+
+        Attributes
+
+            rows (numpy.ndarray) :: rows of the particles.
+        """
+        table = self.table
+        ports = np.random.randint(6, size=rows.size)
+        q = np.random.uniform(size=rows.size)
+
+        contracted = (table.head_x[rows] == table.tail_x[rows]) & \
+                     (table.head_y[rows] == table.tail_y[rows])
+        rows = rows[contracted]
+
+        moves = self._proposals(rows, ports[contracted], q[contracted])
+        movers = np.flatnonzero(~np.isin(moves['targets'], self.wall_keys))
+        self._move(rows, movers, moves, self._occupied())
+
+    def _proposals(self, rows:np.ndarray, ports:np.ndarray,
+                   q:np.ndarray) -> dict:
+        r"""
+        Attributes
+
+            rows (numpy.ndarray) :: rows of contracted particles.
+            ports, q (numpy.ndarray) :: port and uniform draw per row.
+
+        Return (dict): target point and keys, ring keys, uniform draw and
+                        Metropolis thresholds of the move of every row.
+        """
+        table = self.table
+
+        # Metropolis threshold of every move, once per distinct temperature
+        x1 = 1. / table.tau[rows].astype(np.float64)
+        lambdas, temperature = np.unique(np.exp(x1), return_inverse=True)
+        x2 = np.arange(-MAX_DELTA, MAX_DELTA + 1, dtype=np.float64)
+        thresholds = (lambdas[:, None] ** x2)[temperature]
+
+        # origin, target and the ring around both for every move
+        x, y = table.head_x[rows], table.head_y[rows]
+        rx, ry = RELATIVE_POINTS[ports].T
+        target_x, target_y = x + rx, y + ry
+
+        ring = np.empty((rows.size, len(NEIGHBORHOOD_RING)), dtype=np.int64)
+        for bit, (from_head, offset) in enumerate(NEIGHBORHOOD_RING):
+            ox, oy = (target_x, target_y) if from_head else (x, y)
+            dx, dy = RELATIVE_POINTS[(ports + offset) % 6].T
+            ring[:, bit] = point_keys(ox + dx, oy + dy)
+
+        return dict(x=target_x, y=target_y,
+                    targets=point_keys(target_x, target_y), ring=ring, q=q,
+                    thresholds=thresholds)
+
+    def _move(self, rows:np.ndarray, movers:np.ndarray, moves:dict,
+              occupied:np.ndarray):
+        r"""
+        Evaluate and apply moves that do not disturb each other.
+
+        Attributes
+
+            rows (numpy.ndarray) :: table row of every move.
+            movers (numpy.ndarray) :: the moves to evaluate.
+            moves (dict) :: target point and keys, ring keys, uniform draw and
+                            Metropolis thresholds of every move.
+            occupied (numpy.ndarray) :: sorted keys of all occupied nodes.
+        """
+        table = self.table
+
+        free = ~_find(occupied, moves['targets'][movers])[1]
+
+        # occupancy of the ring around the particle expanded onto the target
+        mask = np.zeros(movers.size, dtype=np.int64)
+        for bit in range(len(NEIGHBORHOOD_RING)):
+            hit = _find(occupied, moves['ring'][movers, bit])[1]
+            mask |= hit.astype(np.int64) << bit
+
+        x1 = moves['thresholds'][movers, EDGE_DELTA[mask] + MAX_DELTA]
+        accepted = free & ADMISSIBLE[mask] & (moves['q'][movers] < x1)
+
+        movers = movers[accepted]
+        x, y, x2 = moves['x'][movers], moves['y'][movers], rows[movers]
+        table.head_x[x2], table.head_y[x2] = x, y
+        table.tail_x[x2], table.tail_y[x2] = x, y
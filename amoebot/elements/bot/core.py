@@ -5,27 +5,42 @@
 
 from ..core import Core
 
-import pickle
 import numpy as np
 from collections import defaultdict
 
 # global wait time for agents
 WAIT_TIME: np.uint8 = 64
 
+# port labels in clockwise order, `orientation` is the offset of port 0
+PORT_LABELS = ('n', 'ne', 'se', 's', 'sw', 'nw')
+
+# neighbourhood status of a port that has not been looked at yet
+UNSET = -2
+
+def _column(name:str, doc:str) -> property:
+    r"""
+    Property reading and writing the scalar column `name` of the particle 
+    table at the row of the view.
+    """
+    def fget(self): return getattr(self._table, name)[self._row]
+    def fset(self, value): getattr(self._table, name)[self._row] = value
+    return property(fget, fset, doc=doc)
+
 class Amoebot(Core):
     r"""
-    Core amobeot functionalities, extended using algorithmic modules.
+    Core amobeot functionalities, extended using algorithmic modules. An 
+    amoebot is a view over one row of the `ParticleTable` held by the 
+    `AmoebotManager`, reads and writes go straight to the table columns.
 
     Attributes
 
-        __id (numpy.uint8) :: unique particle identifier.
         head (numpy.ndarray) :: position (x and y co-ordinates) of amoebot head.
         tail (numpy.ndarray) :: position (x and y co-ordinates) of amoebot tail.
-        labels (numpy.ndarray) :: lookup directions in grid from port labels.
-        h_neigbor_status (dict) :: status of the amoebot's neighbourhood around
-                        its head.
-        t_neigbor_status (dict) :: status of the amoebot's neighbourhood around
-                        its tail.
+        labels (dict) :: lookup directions in grid from port labels.
+        h_neigbor_status (numpy.ndarray) :: status of the amoebot's 
+                        neighbourhood around its head, `UNSET` where unknown.
+        t_neigbor_status (numpy.ndarray) :: status of the amoebot's 
+                        neighbourhood around its tail, `UNSET` where unknown.
         mu (numpy.uint8) :: rate parameter for Poisson clock.
         tau0 (numpy.float16) :: temperature parameter for compression.
         cflag (numpy.uint8) :: status flag for compression algorithm.
@@ -34,53 +49,71 @@ class Amoebot(Core):
 
     """
 
-    def __init__(self, __id:np.uint8, head:np.ndarray, tail:np.ndarray=None):
+    __slots__ = ['_table', '_row']
+
+    def __init__(self, table:object, row:int):
         r"""
         Attributes
 
-        __id (numpy.uint8) :: unique particle identifier.
-        head (numpy.ndarray) :: position (x and y co-ordinates) of amoebot head.
-        tail (numpy.ndarray) default: None :: position (x and y co-ordinates) of 
-                        amoebot tail.
+        table (ParticleTable) :: table holding the particle states.
+        row (int) :: row of this amoebot in `table`.
         """
+        self._table = table
+        self._row = row
 
-        # bots should be locally indistinguishable, this name-mangled
-        # variable is accesible only to the `AmoebotManager` instance.
-        self.__id:np.uint8 = __id
+    mu = _column('mu', "rate parameter for Poisson clock")
+    clock = _column('clock', "time on the Poisson clock")
+    cflag = _column('cflag', "status flag for compression algorithm")
 
-        # head of the bot
-        self.head:np.ndarray = head
+    # internal temperature parameters, tau is unset (negative) for maze 
+    # solving and positive (.25) for compression
+    tau = _column('tau', "internal temperature parameter")
+    tau0 = _column('tau0', "initial temperature")
+    gamma = _column('gamma', "temperature decay")
 
-        # tail of the bot, initially same as head
-        self.tail:np.ndarray = head if tail is None else tail
+    @property
+    def head(self) -> np.ndarray:
+        table, row = self._table, self._row
+        return np.array([table.head_x[row], table.head_y[row]])
 
-        # lookup/map for port labels to the general grid direction
-        self.labels:dict = self._reset_neighbourhood_map()
+    @head.setter
+    def head(self, value:np.ndarray):
+        table, row = self._table, self._row
+        table.head_x[row], table.head_y[row] = value
 
-        # status of the bot's neighbourhood
-        self.h_neighbor_status:dict = self._reset_neighbourhood_map()
-        self.t_neighbor_status:dict = self._reset_neighbourhood_map()
+    @property
+    def tail(self) -> np.ndarray:
+        table, row = self._table, self._row
+        return np.array([table.tail_x[row], table.tail_y[row]])
 
-        # rate parameter for Poisson clock
-        self.mu:np.uint8 = np.uint8(1)
+    @tail.setter
+    def tail(self, value:np.ndarray):
+        table, row = self._table, self._row
+        table.tail_x[row], table.tail_y[row] = value
 
-        # internal temperature parameter
-        # unset for maze solving
-        self.tau:np.float16 = np.float16(-.5)
-        # unset for compression
-        # self.tau:np.float16 = np.float16(.25)
+    @property
+    def labels(self) -> dict:
+        r"""
+        Return (dict): port number to the general grid direction.
+        """
+        offset = self._table.orientation[self._row]
+        return {ix: PORT_LABELS[(offset + ix) % 6] for ix in range(6)}
 
-        self.gamma:np.float16 = np.float16(0.95)
-        self.tau0:np.float16 = np.float16(1.)
+    @property
+    def h_neighbor_status(self) -> np.ndarray:
+        return self._table.h_status[self._row]
 
-        # status flag for compression algorithm
-        self.cflag:np.uint8 = np.uint8(0)
+    @h_neighbor_status.setter
+    def h_neighbor_status(self, value:np.ndarray):
+        self._table.h_status[self._row] = value
 
-        # activation status, true means the bot is active
-        # self.active, self.clock = self._reset_clock(refresh=True)
+    @property
+    def t_neighbor_status(self) -> np.ndarray:
+        return self._table.t_status[self._row]
 
-        # wait timer for agents
-        # self.wait: uint8 = WAIT_TIME
+    @t_neighbor_status.setter
+    def t_neighbor_status(self, value:np.ndarray):
+        self._table.t_status[self._row] = value
 
     def orient(self, __nmap:defaultdict=None):
         r""" 
@@ -96,17 +129,8 @@ class Amoebot(Core):
                         used to index nodes using x and y co-odrinates.
         """
 
-        # ports labellings of the node
-        node_ports = np.array(['n', 'ne', 'se', 's', 'sw', 'nw'], dtype='<U2')
-
-        # choose a port at random
-        choice = np.random.choice(node_ports)
-        choice_ix = node_ports.tolist().index(choice)
-
-        # map the neighbouring nodes to the dictionary of labels
-        for ix in range(6):
-            self.labels[ix] = node_ports[choice_ix % 6]
-            choice_ix += 1
+        # choose a port at random, the labels follow clockwise from it
+        self._table.orientation[self._row] = np.random.randint(6)
 
         # if __nmap is not None: self.generate_neighbourhood_map(__nmap)
 
@@ -121,7 +145,7 @@ class Amoebot(Core):
         """
 
         # map the neighbourhood around the particle head
-        for port in self.h_neighbor_status:
+        for port in range(6):
             node = __nmap[self.head[0]][self.head[1]]
 
             # get the position of neighbour on current port
@@ -137,7 +161,7 @@ class Amoebot(Core):
 
         # if this is an expanded particle, also map the tail
         if not self._is_contracted:
-            for port in self.t_neighbor_status:
+            for port in range(6):
                 node = __nmap[self.tail[0]][self.tail[1]]
 
                 # get the position of neighbour on current port
@@ -172,7 +196,7 @@ class Amoebot(Core):
         """
 
         scan = self.t_neighbor_status if scan_tail else self.h_neighbor_status
-        return np.array([status != 2 for _, status in scan.items()])
+        return scan != 2
 
     def open_ports(self, scan_tail:bool=False) -> np.ndarray:
         r"""
@@ -185,22 +209,16 @@ class Amoebot(Core):
         Return (numpy.ndarray): a list of open or available ports.
         """
 
-        open_port_list = list()
         scan = self.t_neighbor_status if scan_tail else self.h_neighbor_status
 
-        for port in scan:
-            status = scan[port]
-            # nodes with status 0 are unoccupied
-            if status == np.uint8(0):
-                open_port_list.append(port)
-
-        return np.array(open_port_list)
+        # nodes with status 0 are unoccupied
+        return np.flatnonzero(scan == 0)
     
-    def _reset_neighbourhood_map(self) -> dict:
+    def _reset_neighbourhood_map(self) -> np.ndarray:
         r"""
-        Return (dict): dictionary with port labels as keys and `None` values.
+        Return (numpy.ndarray): status per port, all `UNSET`.
         """
-        return dict([(ix, None) for ix in range(6)])
+        return np.full(6, UNSET, dtype=np.int8)
 
     def _reset_clock(self, refresh:bool) -> tuple:
         r"""
@@ -228,13 +246,9 @@ class Amoebot(Core):
 
     @property
     def _is_contracted(self):
-        return np.all(self.head == self.tail)
-
-    @property
-    def pickled(self): return pickle.dumps(self)
-
-    @classmethod
-    def unpickled(cls, data:bytes): return pickle.loads(data)
+        table, row = self._table, self._row
+        return table.head_x[row] == table.tail_x[row] and \
+            table.head_y[row] == table.tail_y[row]
 
     def execute(self): raise NotImplementedError
     
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+""" elements/bot/domain.py
+
+Spatial domain decomposition for `AmoebotManager.exec_async`. The lattice is
+cut into vertical strips, one per worker process, and the particle table is
+kept in a shared memory `SharedObjects` store. Every round each worker plays
+the particles well inside its strip and writes them straight back into the
+store; particles of different strips are too far apart to interfere, so no
+lock is taken. The particles in the halo along the strip edges are then
+played by the coordinating process alone.
+"""
+
+from .batch import RELATIVE_POINTS
+from .table import ParticleTable
+from ...utils.shared_objects import SharedObjects
+
+import numpy as np
+
+# columns spanned by one step of the node layout, two for the east and west
+# ports of a horizontal layout
+STEP_COLUMNS = int(np.abs(RELATIVE_POINTS[:, 0]).max())
+
+# columns away from a particle that its move reads, the target is one step
+# away and the ring around the target one step further
+REACH = 2 * STEP_COLUMNS
+
+# columns along a strip edge whose particles the coordinator plays; the
+# interior particles only read nodes inside their strip, and interiors of
+# neighbouring strips are further apart than one read plus one write
+HALO = REACH
+
+# state of a worker process, set once by `attach_worker`
+_worker = dict()
+
+def strip_bounds(table:ParticleTable, n_strips:int) -> list:
+    r"""
+    Cut the lattice into strips holding about as many particle heads each.
+
+    Attributes
+
+        table (ParticleTable) :: table of all particles.
+        n_strips (int) :: number of strips.
+
+    Return (list): (lo, hi) column range of every strip, from left to right.
+    """
+    n = table.size
+    x = np.concatenate((table.head_x[:n], table.tail_x[:n])).astype(np.int64)
+
+    x1 = np.linspace(0, 1, n_strips + 1)[1:-1]
+    edges = np.quantile(table.head_x[:n], x1).astype(np.int64).tolist()
+    edges = [int(x.min()) - HALO - 1] + edges + [int(x.max()) + HALO + 1]
+    return list(zip(edges[:-1], edges[1:]))
+
+def interior_rows(table:ParticleTable, lo:int, hi:int) -> np.ndarray:
+    r"""
+    Return (numpy.ndarray): rows of the particles with head and tail at least
+                    `HALO` columns inside the strip [lo, hi).
+    """
+    n = table.size
+    hx, tx = table.head_x[:n], table.tail_x[:n]
+    inside = (hx >= lo + HALO) & (hx < hi - HALO)
+    inside &= (tx >= lo + HALO) & (tx < hi - HALO)
+    return np.flatnonzero(inside)
+
+def halo_rows(table:ParticleTable, strips:list) -> np.ndarray:
+    r"""
+    Return (numpy.ndarray): rows of the particles inside no strip.
+    """
+    halo = np.ones(table.size, dtype=bool)
+    for lo, hi in strips: halo[interior_rows(table, lo, hi)] = False
+    return np.flatnonzero(halo)
+
+def attach_worker(handle:tuple, engine_cls:type, walls:np.ndarray):
+    r"""
+    Initializer of a worker process, attaches to the shared particle store.
+
+    Attributes
+
+        handle (tuple) :: `handle` of the shared `SharedObjects` store.
+        engine_cls (type) :: `BatchEngine` of the algorithm.
+        walls (numpy.ndarray) :: n x 2 array of wall points.
+    """
+    _worker['store'] = SharedObjects.attach(handle)
+    _worker['engine_cls'] = engine_cls
+    _worker['walls'] = walls
+
+def advance_strip(lo:int, hi:int, seed:int) -> int:
+    r"""
+    Activate the particles inside the strip [lo, hi) once each, in colour
+    classes, and write them back into the shared store. The particles and
+    walls within `REACH` columns of the strip are loaded too, read only.
+
+    Attributes
+
+        lo, hi (int) :: column range of the strip.
+        seed (int) :: seed of the strip for this round.
+
+    Return (int): number of particles activated.
+    """
+    np.random.seed(seed)
+    records, walls = _worker['store'].records, _worker['walls']
+
+    x1, x2 = lo - REACH, hi + REACH
+    hx, tx = records['head_x'], records['tail_x']
+    rows = np.flatnonzero((hx >= x1) & (hx < x2) | (tx >= x1) & (tx < x2))
+    table = ParticleTable.from_records(records[rows])
+
+    interior = interior_rows(table, lo, hi)
+    if not interior.size: return 0
+
+    x3 = (walls[:, 0] >= x1) & (walls[:, 0] < x2)
+    engine = _worker['engine_cls'](table, walls=walls[x3])
+    engine.step_coloured(interior)
+
+    # only the position columns of the interior change
+    x4 = rows[interior]
+    for name in ('head_x', 'head_y', 'tail_x', 'tail_y'):
+        records[name][x4] = getattr(table, name)[interior]
+    return interior.size
@@ -6,6 +6,7 @@ A generalised functional module for basic SOPS movements and utilities.
 """
 
 from ..core import Core
+from .lookup import ADMISSIBLE, EDGE_DELTA, MAX_DELTA, metropolis_thresholds
 from ...utils.graphs import GraphAlgorithms
 from amoebot.elements.node.manager import NodeManagerBitArray
 
@@ -17,23 +18,23 @@ MAX_DEPTH = sys.maxsize
 
 def contract_particle(
         agent: Core,
-        __nmap: defaultdict,
+        __nmap: NodeManagerBitArray,
         backward: bool = False
-    ) -> defaultdict:
+    ) -> NodeManagerBitArray:
     r"""
     Contract an expanded particle to head or tail.
 
     Attributes
 
         agent (Core) :: instance of class `Agent`
-        __nmap (defaultdict) :: a dictionary of dictionaries used to index nodes 
-                        using x and y co-ordinates.
+        __nmap (NodeManagerBitArray) :: node manager shared by all agents of
+                        the simulation.
         backward (bool) default: False :: contract to tail if true, else 
                         contract to head.
 
-    Return (defaultdict): `__nmap` dictionary.
+    Return (NodeManagerBitArray): the shared `__nmap` node manager.
     """
-    nm = NodeManagerBitArray(bot_id=agent._getid().item(), nodes=__nmap)
+    nm = __nmap.retarget(bot_id=agent._getid().item())
 
     # contract an expanded particle to its head
     if not backward:
@@ -44,28 +45,28 @@ def contract_particle(
         nm.contract_backward()
 
     agent.head, agent.tail = nm.current_position()
-    return nm.nodes
+    return nm
 
 
 def expand_particle(
         agent: Core,
-        __nmap: defaultdict,
+        __nmap: NodeManagerBitArray,
         port: np.uint8 = None
-) -> defaultdict:
+) -> NodeManagerBitArray:
     r"""
     Contract an expanded particle to head or tail.
 
     Attributes
 
         agent (Core) :: instance of class `Agent`
-        __nmap (defaultdict) :: a dictionary of dictionaries used to index nodes 
-                        using x and y co-ordinates.
+        __nmap (NodeManagerBitArray) :: node manager shared by all agents of
+                        the simulation.
         port (numpy.uint8) default: None :: port number to move to; if no 
                         value provided, choose a port at random.
 
-    Return (defaultdict): the updated `__nmap` dictionary.
+    Return (NodeManagerBitArray): the updated `__nmap` node manager.
     """
-    nm = NodeManagerBitArray(bot_id=agent._getid().item(), nodes=__nmap)
+    nm = __nmap.retarget(bot_id=agent._getid().item())
 
     open_ports = [0,1,2,3,4,5]
 
@@ -74,28 +75,26 @@ def expand_particle(
         port = np.random.randint(6, dtype=np.uint8)
 
     elif len(open_ports) == 0:
-        return nm.nodes
+        return nm
 
     # move to indicated direction if available
     if port in open_ports:
         test = nm.move_to(port=port)
         agent.head, agent.tail = nm.current_position()
 
-    return nm.nodes
+    return nm
 
 def phototax_sequential(
         agent: Core, 
-        __nmap: defaultdict, 
+        __nmap: NodeManagerBitArray, 
         _id: int = None, 
         depth: int = 200):
     r"""
     """
 
-    nm = NodeManagerBitArray(bot_id=_id.item(), nodes=__nmap)
-    open_ports_head, _ = nm.open_ports()
+    nm = __nmap.retarget(bot_id=_id.item())
 
     port = 1
-    contracted = True
     
     # ping to get distance k to wall
     k = nm.ping_for_wall(port, depth=depth)
@@ -105,80 +104,65 @@ def phototax_sequential(
         # choose a neigbouring location uniformly at random
         port = np.random.randint(6)
 
-        if port in open_ports_head:
-            contracted = not nm.move_to(port=port)
-            agent.head, agent.tail = nm.current_position()
-
-        if contracted: return nm.nodes
-
+    elif not np.random.uniform() < .25:
+        return nm
 
-        if _verify_compression_conditions(agent, nm, async_mode=False, _lambda=_lambda):
-            nm.contract_forward()
-        # else contract back to the tail
-        else:
-            nm.contract_backward()
-
-    elif np.random.uniform() < .25:
-
-        if port in open_ports_head:
-            contracted = not nm.move_to(port=port)
-            agent.head, agent.tail = nm.current_position()
-
-        if contracted: return nm.nodes
+    # evaluate the move without expanding into the target
+    mask = nm.propose(port=port)
+    if mask == -1: return nm
 
-        if _verify_compression_conditions(agent, nm, async_mode=False, _lambda=_lambda):
-            nm.contract_forward()
-        # else contract back to the tail
-        else:
-            nm.contract_backward()
+    # if compression conditions are satisfied move to the target
+    if _accept_compression_move(agent, mask, async_mode=False, 
+                                _lambda=_lambda):
+        nm.commit(port=port)
+        agent.head, agent.tail = nm.current_position()
 
-    agent.head, agent.tail = nm.current_position()
-    return nm.nodes
+    return nm
 
 
 def maze_solve_sequential(
         agent: Core, 
-        __nmap: defaultdict, 
+        __nmap: NodeManagerBitArray, 
         _id: int = None, 
         depth: int = 100):
     r"""
     """
 
-    nm = NodeManagerBitArray(bot_id=_id.item(), nodes=__nmap)
-    open_ports_head, _ = nm.open_ports()
+    nm = __nmap.retarget(bot_id=_id.item())
 
     # choose a neigbouring location uniformly at random
     port = np.random.randint(6)
-    contracted = True
-
-    if port in open_ports_head:
-        contracted = not nm.move_to(port=port)
-        agent.head, agent.tail = nm.current_position()
 
-    if contracted: return nm.nodes
+    # evaluate the move without expanding into the target
+    mask = nm.propose(port=port)
+    if mask == -1: return nm
 
     if np.random.uniform() < 1/3: depth //= 5
 
-    # ping to get distance k to wall
-    k = nm.ping_for_wall(port, depth=depth)
+    # ping to get distance k to wall from the target, one node further out
+    # than the bot itself
+    k = nm.ping_for_wall(port, depth=depth + 1)
     if k != -1:
+        k -= 1
         T_k = agent.tau + agent.tau0 * agent.gamma ** (-k)
         _lambda = np.exp(1 / T_k)
     else: 
         _lambda = 1.
 
-    # if compression conditions are satisfied contract to head
-    if _verify_compression_conditions(agent, nm, async_mode=False, _lambda=_lambda):
-        nm.contract_forward()
-    # else contract back to the tail
-    else:
-        nm.contract_backward()
+    # if compression conditions are satisfied move to the target
+    if _accept_compression_move(agent, mask, async_mode=False, 
+                                _lambda=_lambda):
+        nm.commit(port=port)
+        agent.head, agent.tail = nm.current_position()
 
-    agent.head, agent.tail = nm.current_position()
-    return nm.nodes
+    return nm
 
 
-def compress_agent_sequential(agent: Core, __nmap: defaultdict, _id: int = None):
+def compress_agent_sequential(
+        agent: Core,
+        __nmap: NodeManagerBitArray,
+        _id: int = None
+) -> NodeManagerBitArray:
     r"""
     A centralized Markov chain algorithm for compression in SOPS based on 
     
@@ -186,38 +170,34 @@ def compress_agent_sequential(agent: Core, __nmap: defaultdict, _id: int = None)
     A Markov chain algorithm for compressionin self-organizing particle 
     systems (2016); full text at arxiv.org/abs/1603.07991
 
+    The move is proposed and evaluated on the node manager without writing,
+    the node space is only touched when the move is accepted.
+
     Attributes
 
         agent (Core) :: instance of class `Agent`
-        __nmap (defaultdict) :: a dictionary of dictionaries used to index nodes 
-                        using x and y co-ordinates.
+        __nmap (NodeManagerBitArray) :: node manager shared by all agents of
+                        the simulation.
+        _id (BOT_ID_DTYPE) :: unique identifier of the particle.
 
-    Return (defaultdict): the updated `__nmap` dictionary.
+    Return (NodeManagerBitArray): the updated `__nmap` node manager.
     """
 
-    nm = NodeManagerBitArray(bot_id=_id.item(), nodes=__nmap)
-    open_ports_head, open_ports_tail = nm.open_ports()
+    nm = __nmap.retarget(bot_id=_id.item())
 
     # choose a neigbouring location uniformly at random
     port = np.random.randint(6)
-    contracted = True
 
-    if port in open_ports_head:
-        contracted = not nm.move_to(port=port)
-        agent.head, agent.tail = nm.current_position()
+    # evaluate the move without expanding into the target
+    mask = nm.propose(port=port)
+    if mask == -1: return nm
 
-    if contracted: return nm.nodes
-
-    # if compression conditions are satisfied contract to head
-    if _verify_compression_conditions(agent, nm, async_mode=False):
-        nm.contract_forward()
-        # return contract_particle(agent, __nmap, backward=False)
-    # else contract back to the tail
-    else:
-        nm.contract_backward()
+    # if compression conditions are satisfied move to the target
+    if _accept_compression_move(agent, mask, async_mode=False):
+        nm.commit(port=port)
+        agent.head, agent.tail = nm.current_position()
 
-    agent.head, agent.tail = nm.current_position()
-    return nm.nodes
+    return nm
 
 
 def compress_agent_async_contracted(
@@ -331,48 +311,49 @@ def _verify_compression_conditions(
     Return (bool): True if all conditions are verified, else False.
     """
 
-    # draw a number from U[0,1]
-    q = np.random.uniform()
+    return _accept_compression_move(agent, nm.neighborhood_mask(), 
+                                    async_mode=async_mode, _lambda=_lambda)
 
-    # list of conditional truth values
-    conditions = np.zeros(4, dtype=np.uint8)
 
-    # collect neighbouring positions around head and tail
-    h_neighbors, t_neighbors = [set() for _ in range(2)]
+def _accept_compression_move(
+        agent: Core,
+        mask: int,
+        async_mode: bool = True, 
+        _lambda: np.float16 = None
+) -> bool:
+    r"""
+    Verify all compression conditions for an expanded particle, real or 
+    proposed, from the occupancy of its neighbourhood.
 
-    # REQUIRED in async_mode: reset head and tail orientations
-    # if async_mode: agent.generate_neighbourhood_map(__nmap)
+    Attributes
 
-    h_neighbors, t_neighbors = nm.get_occupied_neighbors()
+        agent (Core) :: instance of class `Agent`
+        mask (int) :: occupancy bitmask of the eight nodes around the expanded
+                    particle, as given by `neighborhood_mask` or `propose`.
+        async_mode (bool) :: if True, execute the local, distributed, 
+                    asynchronous algorithm for compression else run sequential 
+                    algorithm.
+        _lambda (numpy.float16) default: None :: the compression parameter,
+                    exp(1 / tau) if None.
 
-    e_head, e_tail = len(h_neighbors), len(t_neighbors)
+    Return (bool): True if all conditions are verified, else False.
+    """
 
-    # does not leave behind a hole
-    if e_tail != 5: conditions[0] = np.uint8(1)
+    # draw a number from U[0,1]
+    q = np.random.uniform()
 
-    # satisfy property 1 or 2
-    common_neighbors = h_neighbors & t_neighbors
+    # list of conditional truth values
+    conditions = np.zeros(4, dtype=np.uint8)
 
-    if len(common_neighbors) in [1, 2]:
-        conditions[1] = _verify_compression_property_1(
-            nm,
-            h_neighbors,
-            t_neighbors
-        )
-    elif len(common_neighbors) == 0:
-        conditions[1] = _verify_compression_property_2(
-            nm,
-            h_neighbors,
-            t_neighbors
-        )
-    else:
-        raise ValueError
+    # does not leave behind a hole and satisfies property 1 or 2
+    if ADMISSIBLE[mask]: conditions[:2] = np.uint8(1)
 
     # the compression parameter
     _lambda = np.exp(1 / agent.tau) if _lambda is None else _lambda
 
     # the Metropolis filter 
-    if q < _lambda ** (e_head - e_tail):
+    x1 = EDGE_DELTA[mask] + MAX_DELTA
+    if q < metropolis_thresholds(float(_lambda))[x1]:
         conditions[2] = np.uint8(1)
 
     # not a condition in async_mode
@@ -385,6 +366,9 @@ def _verify_compression_conditions(
     return np.all(conditions)
 
 
+# graph search versions of the two properties, `lookup` tabulates the same
+# conditions per neighbourhood
+
 def _verify_compression_property_1(
         nm,
         h_neighbors: set,
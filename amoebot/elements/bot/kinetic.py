@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+
+""" elements/bot/kinetic.py
+
+Rejection-free (n-fold way) engines. A sequential step activates a uniformly
+random particle through a uniformly random port, and at high lambda or once
+the swarm is compressed almost every such proposal is rejected. These engines
+keep the acceptance probability of every particle move in a `SumTree`, draw
+the next accepted move in proportion to it and skip the rejected steps in
+between with one geometric draw.
+"""
+
+from .batch import BatchEngine, RELATIVE_POINTS, point_keys
+from .lookup import ADMISSIBLE, EDGE_DELTA, MAX_DELTA
+from ..node.chunked import BIAS, STRIDE
+from ..node.manager_utils import NEIGHBORHOOD_RING
+from ...utils.structures import SumTree
+
+import math
+import numpy as np
+from collections import defaultdict
+
+# offset of every port in the key space of `point_keys`
+KEY_OFFSETS = [x * STRIDE + y for x, y in RELATIVE_POINTS.tolist()]
+
+def _reads() -> tuple:
+    r"""
+    Return (tuple): per port the key offsets of the ring bits of the move, and
+                    per key offset the (port, bit) pairs of the moves that read
+                    it, bit -1 standing for the target.
+    """
+    rings, readers = list(), defaultdict(list)
+    for port, target in enumerate(KEY_OFFSETS):
+        readers[target].append((port, -1))
+
+        ring = list()
+        for bit, (from_head, offset) in enumerate(NEIGHBORHOOD_RING):
+            x1 = (target if from_head else 0) + KEY_OFFSETS[(port + offset) % 6]
+            readers[x1].append((port, bit))
+            ring.append(x1)
+        rings.append(ring)
+
+    return rings, dict(readers)
+
+RINGS, READERS = _reads()
+
+# plain lists are faster to index one entry at a time
+_ADMISSIBLE, _EDGE_DELTA = ADMISSIBLE.tolist(), EDGE_DELTA.tolist()
+
+class CompressKineticEngine(BatchEngine):
+    r"""
+    Rejection-free engine for the "compress" Markov chain of Cannon et al.
+    (2016). Every contracted particle owns six entries, one per port, holding
+    the probability that the move is accepted once proposed: the target is
+    free, the move is admissible by the `lookup` tables and passes the
+    Metropolis filter with lambda = exp(1 / tau). Expanded particles never
+    move, as in `compress_agent_sequential`.
+
+    After a move only the entries that read one of the two nodes it changed
+    are touched. A call to `step` plays the n steps of a sequential round,
+    the geometric skips are memoryless so the residual skip is dropped at the
+    end of a round.
+
+    Attributes
+
+        keys (list) :: key of the node of every particle.
+        occupied (dict) :: particle row by key of every occupied node.
+        walls (set) :: keys of all wall nodes.
+        tree (SumTree) :: acceptance probability of every move, the move of
+                        port p of row i at index 6 i + p.
+        moves (int) :: number of accepted moves so far.
+    """
+
+    def __init__(self, table:object, walls:np.ndarray=None):
+        r"""
+        Attributes
+
+            table (ParticleTable) :: table whose position columns are advanced.
+            walls (numpy.ndarray) default: None :: n x 2 array of wall points.
+        """
+        super().__init__(table, walls=walls)
+        n = table.size
+
+        heads = point_keys(table.head_x[:n], table.head_y[:n]).tolist()
+        tails = point_keys(table.tail_x[:n], table.tail_y[:n]).tolist()
+
+        self.keys = heads
+        self.walls = set(self.wall_keys.tolist())
+        self.occupied = dict(zip(tails, range(n)))
+        self.occupied.update(zip(heads, range(n)))
+        self._movable = [h == t for h, t in zip(heads, tails)]
+
+        # Metropolis filter min(1, lambda ** k) per row
+        x1 = np.arange(-MAX_DELTA, MAX_DELTA + 1, dtype=np.float64)
+        x2 = np.exp(1. / table.tau[:n].astype(np.float64))
+        self._accept = np.minimum(x2[:, None] ** x1, 1.).tolist()
+
+        self._masks = [0] * (6 * n)
+        self._free = [False] * (6 * n)
+        self._dirty = set()
+        self.moves = 0
+
+        for row in range(n): self._read_row(row)
+        self._dirty.clear()
+        self.tree = SumTree(6 * n, [self._weight(e) for e in range(6 * n)])
+
+    def step(self):
+        r"""
+        Play the n steps of a sequential round.
+        """
+        self.advance(self.table.size)
+
+    def advance(self, steps:int):
+        r"""
+        Play `steps` sequential steps, only the accepted ones are executed.
+
+        Attributes
+
+            steps (int) :: number of sequential steps to play.
+        """
+        tree, slots = self.tree, 6 * self.table.size
+
+        while tree.total > 0:
+            skip = np.random.geometric(min(tree.total / slots, 1.))
+            if skip > steps: break
+            steps -= skip
+
+            entry = tree.find(np.random.uniform() * tree.total)
+            self._move(*divmod(entry, 6))
+
+    def _move(self, row:int, port:int):
+        r"""
+        Move the particle of `row` through `port` and refresh every entry
+        that reads the two changed nodes.
+        """
+        occupied = self.occupied
+        origin = self.keys[row]
+        target = origin + KEY_OFFSETS[port]
+
+        del occupied[origin]
+        occupied[target] = row
+        self.keys[row] = target
+        self.moves += 1
+
+        table = self.table
+        x, y = target // STRIDE - BIAS, target % STRIDE - BIAS
+        table.head_x[row] = table.tail_x[row] = x
+        table.head_y[row] = table.tail_y[row] = y
+
+        self._touch(origin, row, vacated=True)
+        self._touch(target, row, vacated=False)
+        self._read_row(row)
+
+        tree, weight = self.tree, self._weight
+        for entry in self._dirty:
+            w = weight(entry)
+            if w != tree[entry]: tree[entry] = w
+        self._dirty.clear()
+
+    def _touch(self, key:int, row:int, vacated:bool):
+        r"""
+        Flip the node `key` in the entries of every other particle that reads
+        it.
+        """
+        occupied, movable = self.occupied, self._movable
+        masks, free, dirty = self._masks, self._free, self._dirty
+
+        for offset, readers in READERS.items():
+            other = occupied.get(key - offset)
+            if other is None or other == row or not movable[other]:
+                continue
+
+            for port, bit in readers:
+                entry = 6 * other + port
+                if bit < 0:
+                    free[entry] = vacated
+                elif vacated:
+                    masks[entry] &= ~(1 << bit)
+                else:
+                    masks[entry] |= 1 << bit
+                dirty.add(entry)
+
+    def _read_row(self, row:int):
+        r"""
+        Read the target and ring of all six moves of `row` from scratch.
+        """
+        if not self._movable[row]: return
+
+        occupied, walls = self.occupied, self.walls
+        origin = self.keys[row]
+
+        for port in range(6):
+            entry = 6 * row + port
+            target = origin + KEY_OFFSETS[port]
+            self._free[entry] = target not in occupied and target not in walls
+
+            mask = 0
+            for bit, offset in enumerate(RINGS[port]):
+                if origin + offset in occupied: mask |= 1 << bit
+            self._masks[entry] = mask
+            self._dirty.add(entry)
+
+    def _weight(self, entry:int) -> float:
+        r"""
+        Return (float): acceptance probability of the move at `entry`.
+        """
+        mask = self._masks[entry]
+        if not self._free[entry] or not _ADMISSIBLE[mask]: return 0.
+        return self._accept[entry // 6][_EDGE_DELTA[mask] + MAX_DELTA]
+
+class MazeSolveKineticEngine(CompressKineticEngine):
+    r"""
+    Rejection-free engine for the "mzsolve" chain of `maze_solve_sequential`.
+    The compression parameter of a move depends on the distance k from its
+    target to a wall along the port, found by a ping that a bot in the way
+    stops: lambda = exp(1 / T_k) with T_k = tau + tau0 * gamma ** -k, and 1
+    when no wall is found. One time in three the ping reaches `depth // 5`
+    nodes instead of `depth`, the acceptance probability is the mix of both.
+
+    A node that changes can only shorten or lengthen the ping of the first
+    particle found behind it along each of the six directions, only those
+    pings are taken again.
+
+    Attributes
+
+        depth (int) :: reach of the ping.
+    """
+
+    def __init__(self, table:object, walls:np.ndarray=None, depth:int=100):
+        r"""
+        Attributes
+
+            table (ParticleTable) :: table whose position columns are advanced.
+            walls (numpy.ndarray) default: None :: n x 2 array of wall points.
+            depth (int) default: 100 :: reach of the ping, as in
+                            `maze_solve_sequential`.
+        """
+        self.depth = depth
+
+        rows = slice(0, table.size)
+        self._tau = table.tau[rows].astype(np.float64).tolist()
+        self._tau0 = table.tau0[rows].astype(np.float64).tolist()
+        self._gamma = table.gamma[rows].astype(np.float64).tolist()
+
+        super().__init__(table, walls=walls)
+
+    def _move(self, row:int, port:int):
+        origin = self.keys[row]
+        target = origin + KEY_OFFSETS[port]
+
+        for key in (origin, target): self._behind(key, row)
+        super()._move(row, port)
+
+    def _behind(self, key:int, row:int):
+        r"""
+        Mark the pings through node `key` to be taken again, the first
+        particle behind it in every direction other than the moving one.
+        """
+        occupied, walls, movable = self.occupied, self.walls, self._movable
+
+        for port, offset in enumerate(KEY_OFFSETS):
+            x1 = key
+            for _ in range(self.depth + 1):
+                x1 -= offset
+                if x1 in walls: break
+
+                other = occupied.get(x1)
+                if other is None: continue
+
+                if other != row and movable[other]:
+                    self._dirty.add(6 * other + port)
+                break
+
+    def _ping(self, row:int, port:int) -> int:
+        r"""
+        Return (int): distance from the target of the move to a wall along
+                        `port`, -1 if a particle is hit first or no wall is
+                        within `depth`.
+        """
+        occupied, walls = self.occupied, self.walls
+        offset, key = KEY_OFFSETS[port], self.keys[row]
+
+        for k in range(self.depth + 1):
+            key += offset
+            if key in walls: return k
+            if key in occupied: return -1
+        return -1
+
+    def _weight(self, entry:int) -> float:
+        mask = self._masks[entry]
+        if not self._free[entry] or not _ADMISSIBLE[mask]: return 0.
+
+        row, port = divmod(entry, 6)
+        k = self._ping(row, port)
+
+        # the short ping finds the same wall only if it is within its reach
+        short = k if k <= self.depth // 5 else -1
+
+        delta = _EDGE_DELTA[mask]
+        return (self._filter(row, short, delta) +
+                2 * self._filter(row, k, delta)) / 3
+
+    def _filter(self, row:int, k:int, delta:int) -> float:
+        r"""
+        Return (float): Metropolis filter min(1, lambda ** delta) for a wall
+                        at distance k.
+        """
+        if k == -1: return 1.
+
+        T_k = self._tau[row] + self._tau0[row] * self._gamma[row] ** (-k)
+        return min(1., math.exp(delta / T_k))
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+""" elements/bot/lookup.py
+
+Lookup tables for the compression move. Whether an expanded particle may
+contract to its head depends only on which of the eight nodes around it are
+occupied, so every answer is computed once per occupancy bitmask (bit i for
+node i of `NEIGHBORHOOD_RING`) when the module is loaded.
+"""
+
+from ..node.manager_utils import LAYOUT, NODE_LAYOUT, NEIGHBORHOOD_RING
+from ...utils.graphs import GraphAlgorithms
+
+import numpy as np
+from functools import lru_cache
+
+# number of distinct neighbourhoods
+N_MASKS = 1 << len(NEIGHBORHOOD_RING)
+
+# e_head - e_tail lies within [-MAX_DELTA, MAX_DELTA]
+MAX_DELTA = 5
+
+def _reaches_all(graph:dict, vertices:set, roots:set) -> bool:
+    r"""
+    Return (bool): True if every vertex is connected to one of the roots by a
+                    path through `vertices`.
+    """
+    subgraph = GraphAlgorithms({v: graph[v] & vertices for v in vertices})
+
+    reached = set()
+    for root in roots:
+        reached |= {k for k, v in subgraph.dfs(root).items() if v}
+    return reached == vertices
+
+def _build_tables() -> tuple:
+    r"""
+    Evaluate the compression conditions of Cannon et al. (2016) for every
+    neighbourhood of an expanded particle.
+
+    Return (tuple): the `PROPERTY`, `HOLE_SAFE` and `EDGE_DELTA` tables.
+    """
+    relative = [v['relative_point'] for _, v in
+                                        sorted(NODE_LAYOUT[LAYOUT].items())]
+
+    # lay the ring out around a tail at the origin and its head on port 0
+    head, tail = relative[0], (0, 0)
+    ring = list()
+    for from_head, offset in NEIGHBORHOOD_RING:
+        x, y = head if from_head else tail
+        rx, ry = relative[offset % 6]
+        ring.append((x + rx, y + ry))
+
+    def adjacent(a, b): return (b[0] - a[0], b[1] - a[1]) in relative
+
+    around_head = {i for i, p in enumerate(ring) if adjacent(head, p)}
+    around_tail = {i for i, p in enumerate(ring) if adjacent(tail, p)}
+    graph = {i: {j for j, q in enumerate(ring) if adjacent(p, q)}
+                                                for i, p in enumerate(ring)}
+
+    prop = np.zeros(N_MASKS, dtype=bool)
+    hole_safe = np.zeros(N_MASKS, dtype=bool)
+    edge_delta = np.zeros(N_MASKS, dtype=np.int8)
+
+    for mask in range(N_MASKS):
+        occupied = {i for i in range(len(ring)) if mask >> i & 1}
+        h_neighbors = occupied & around_head
+        t_neighbors = occupied & around_tail
+        common = h_neighbors & t_neighbors
+
+        edge_delta[mask] = len(h_neighbors) - len(t_neighbors)
+
+        # does not leave behind a hole
+        hole_safe[mask] = len(t_neighbors) != 5
+
+        # property 1: every neighbour is connected to the common neighbours
+        if common:
+            prop[mask] = _reaches_all(graph, occupied, common)
+
+        # property 2: head and tail neighbourhoods are each connected
+        elif h_neighbors and t_neighbors:
+            prop[mask] = \
+                _reaches_all(graph, h_neighbors, {min(h_neighbors)}) and \
+                _reaches_all(graph, t_neighbors, {min(t_neighbors)})
+
+    return prop, hole_safe, edge_delta
+
+# property 1 or 2 holds
+PROPERTY, HOLE_SAFE, EDGE_DELTA = _build_tables()
+
+# property 1 or 2 holds and no hole is left behind
+ADMISSIBLE = PROPERTY & HOLE_SAFE
+
+for _table in (PROPERTY, HOLE_SAFE, EDGE_DELTA, ADMISSIBLE):
+    _table.setflags(write=False)
+
+@lru_cache(maxsize=N_MASKS)
+def metropolis_thresholds(_lambda:float) -> np.ndarray:
+    r"""
+    Precomputed Metropolis filter of the compression parameter.
+
+    Attributes
+
+        _lambda (float) :: the compression parameter.
+
+    Return (numpy.ndarray): `_lambda ** k` for k in [-MAX_DELTA, MAX_DELTA],
+                    index with `EDGE_DELTA[mask] + MAX_DELTA`.
+    """
+    powers = np.arange(-MAX_DELTA, MAX_DELTA + 1, dtype=np.float64)
+    thresholds = np.float64(_lambda) ** powers
+    thresholds.setflags(write=False)
+    return thresholds
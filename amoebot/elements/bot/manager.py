@@ -4,19 +4,49 @@
 """
 
 from .agent import Agent
+from .batch import CompressEngine, RandomMoveEngine, RELATIVE_POINTS
+from .domain import advance_strip, attach_worker, halo_rows, strip_bounds
+from .kinetic import CompressKineticEngine, MazeSolveKineticEngine
+from .lookup import ADMISSIBLE
+from .table import ParticleTable
 from ..manager import Manager
-from ..tracker import StateTracker
+from ..tracker import QueuedTracker, StateTracker
+from ..node.manager import NodeManagerBitArray
+from ..node.store import COORDINATE_DTYPE, BOT_ID_DTYPE
 from ...utils.shared_objects import SharedObjects
 
 import os
 import time
+import heapq
 import numpy as np
-from tqdm import trange
+from tqdm import tqdm, trange
 from pathlib import Path
 from functools import partial
 from concurrent import futures
 from collections import defaultdict
 
+# algorithms with a vectorized engine for `exec_batch`
+BATCH_ENGINES = {
+    'random_move': RandomMoveEngine,
+    'compress': CompressEngine,
+}
+
+# algorithms with a rejection-free engine for `exec_kinetic`
+KINETIC_ENGINES = {
+    'compress': CompressKineticEngine,
+    'mzsolve': MazeSolveKineticEngine,
+}
+
+# particles activated back to back in curve order before jumping to another
+# randomly chosen block
+SCHEDULE_BLOCK_LEN = 32
+
+# offsets of the nodes within two steps of a node, an activation only reads 
+# and writes nodes this close to the particle
+WAKE_OFFSETS = sorted({(a + c, b + d) for a, b in RELATIVE_POINTS.tolist() 
+                       for c, d in RELATIVE_POINTS.tolist()} | 
+                      {tuple(p) for p in RELATIVE_POINTS.tolist()})
+
 class AmoebotManager(Manager):
     r""" 
     Manages sequential and/or asynchronous task assignment to agents of 
@@ -24,61 +54,68 @@ class AmoebotManager(Manager):
 
     Attributes
 
-        __nmap (defaultdict) :: a dictionary of dictionaries used to index nodes
-                        using x and y co-ordinates.
-        amoebots (dict) :: dcitionary of amoebot objects indexed by identifiers.
-                        tracker
-        shared (SharedObjects) :: a custom shared memory object for pickling
-                        and unpickling the data dumps. Useful in true 
-                        multiprocessing implementations.
-        tracker (StateTracker) :: instance of `StateTracker` for data handling. 
+        __nmap (NodeManagerBitArray) :: node manager owned by this manager and
+                        shared by every agent; it is retargeted to the active 
+                        bot on each step instead of being rebuilt.
+        amoebots (ParticleTable) :: struct-of-arrays table of amoebot states 
+                        indexed by identifiers, yields `Agent` views.
+        tracker (QueuedTracker) :: `StateTracker` for data handling, written 
+                        to from a background thread.
         config_num (str) :: identifier number for the json configuration file,
                         required here for multiprocessing picklers.
     """
 
-    def __init__(self, __nmap:object=None, config_num:str=None):
+    def __init__(
+                    self, 
+                    __nmap:object=None, 
+                    config_num:str=None, 
+                    coordinate_dtype:type=COORDINATE_DTYPE
+                ):
         r"""
         Attributes
 
-            __nmap (defaultdict) :: a dictionary of dictionaries used to index 
-                            nodes using x and y co-ordinates.
-            amoebots (dict) :: dcitionary of amoebot objects indexed by 
-                            identifiers.
+            __nmap (NodeManagerBitArray) :: node manager shared by all agents.
             tracker (StateTracker) :: instance of `StateTracker` for data 
                             handling. 
             config_num (str) :: identifier number for the json configuration 
                             file, required here for multiprocessing picklers.
+            coordinate_dtype (type) default: COORDINATE_DTYPE :: signed integer
+                            type of the particle positions.
         """
-        # `nmap` object of the `NodeManager`
-        self.__nmap:defaultdict = __nmap
+        # long-lived `NodeManagerBitArray` shared by all agents
+        self.__nmap:NodeManagerBitArray = __nmap
 
-        # map of all `Amoebot` objects
-        self.amoebots:dict = dict()
+        # table of all amoebot states, agents are views over its rows
+        self.amoebots:ParticleTable = ParticleTable(
+                                            coordinate_dtype=coordinate_dtype
+                                        )
 
-        # object of class `StateTracker`
-        self.tracker:object = StateTracker(config_num)
+        # object of class `StateTracker` behind a queue
+        x1 = StateTracker(config_num, coordinate_dtype=coordinate_dtype)
+        self.tracker:object = QueuedTracker(x1)
 
         # configuration identifier for logging
         self.config_num = config_num
 
     def _add_bot(
                     self, 
-                    __id:np.uint8, 
+                    __id:BOT_ID_DTYPE, 
                     head:np.ndarray, 
                     tail:np.ndarray=None
                 ):
         r""" 
-        Adds individual particles to the dictionary of amoebots.
+        Adds individual particles to the table of amoebots.
 
         Attributes
 
-            __id (numpy.uint8) :: unique particle identifier.
+            __id (BOT_ID_DTYPE) :: unique particle identifier, 32 bits wide 
+                            like the bot id column of the node store.
             head (numpy.ndarray) :: position (x and y co-ordinates) of amoebot 
                             head.
             tail (numpy.ndarray) default: None :: position (x and y 
                             co-ordinates) of amoebot tail.
         """
-        agent_of_amoebot = Agent(__id, head=head, tail=tail)
+        agent_of_amoebot = self.amoebots.add(__id, head=head, tail=tail)
 
         # # update the node map for current particle
         # if np.all(head == tail) or (tail is None):
@@ -92,9 +129,6 @@ class AmoebotManager(Manager):
         # NOTE how nmap is only shared when needed
         agent_of_amoebot.orient(self.__nmap)
 
-        # store a serialized objects for efficiency
-        self.amoebots[__id] = agent_of_amoebot.pickled
-
     def exec_async(
                     self, 
                     n_cores:int, 
@@ -103,11 +137,14 @@ class AmoebotManager(Manager):
                     algorithm:str=None
                 ):
         r"""
-        The function is originally intended as a fully asynchronous, distributed
-        manager for the amoebots. To simplify implementation we put a GIL on the
-        function.
+        Execute the `algorithm` on `n_cores` worker processes. The lattice is
+        cut into one strip per worker and the particles are kept in shared 
+        memory, every worker plays the particles inside its strip and the
+        particles along the strip edges are played by this process after 
+        them. Every particle is activated once per round.
 
-        NOTE a [WIP] is available in branch `mp-test`
+        Algorithms without a vectorized engine, see `BATCH_ENGINES`, fall 
+        back to a thread pool under the interpreter lock.
 
         Attributes
 
@@ -117,9 +154,9 @@ class AmoebotManager(Manager):
             algorithm (str) default: None :: algorithm being performed in 
                         current step, one of "random_move", "compress"
         """
-
-        # dump the amoebot dictionary into a pickle(d) database
-        self.shared = SharedObjects(self.config_num, data=self.amoebots)
+        if algorithm in BATCH_ENGINES:
+            self._exec_async_with_domains(n_cores, max_rnds, algorithm)
+            return
 
         # call the psuedo-async method for execution
         self._exec_async_with_interpreter_lock(n_cores, max_rnds, 
@@ -128,37 +165,326 @@ class AmoebotManager(Manager):
     def exec_sequential(
                             self, 
                             max_rnds:int, 
-                            algorithm:str=None
+                            algorithm:str=None,
+                            reorder_every:int=None,
+                            curve_order:bool=False,
+                            block_len:int=SCHEDULE_BLOCK_LEN
                         ):
         r"""
         Sequentially execute the `algorithm`.
 
         Attributes
 
-            shared (SharedObjects) :: a custom shared memory object for pickling
-                        and unpickling the data dumps. Useful in true 
-                        multiprocessing implementations.
             max_rnds (int) :: maximum number of full rounds before termination.
             algorithm (str) default: None :: algorithm being performed in 
                         current step, one of "random_move", "compress" ...
+            reorder_every (int) default: None :: lay the node array out along 
+                        a space-filling curve every this many rounds, never 
+                        when None.
+            curve_order (bool) default: False :: activate particles in curve 
+                        order within randomly ordered blocks instead of in a 
+                        uniformly random order.
+            block_len (int) default: SCHEDULE_BLOCK_LEN :: number of particles 
+                        per block when `curve_order` is set.
         """
 
-        # dump the amoebot dictionary into a pickle(d) database
-        self.shared = SharedObjects(self.config_num, data=self.amoebots)
-
         # iteratively execute the algorithm over each amoebot for fixed rounds
         for iter_ in trange(max_rnds):
-            exec_seq = list(self.amoebots.keys())
-            np.random.shuffle(exec_seq)
+            if reorder_every and iter_ % reorder_every == 0 and \
+                    hasattr(self.__nmap, 'reorder'):
+                self.__nmap.reorder()
+
+            exec_seq = self._schedule(curve_order=curve_order, 
+                                      block_len=block_len)
             for __id in exec_seq:
                 amoebot_t = (__id, self.amoebots[__id])
-                self.amoebots[__id] = self._exec_one_step(
+                self._exec_one_step(
                                                             amoebot_t, 
                                                             algorithm=algorithm, 
                                                             async_mode=False
                                                         )
             self.update_tracker(iter_)
 
+        self.tracker.flush()
+
+    def exec_poisson(self, max_time:float, algorithm:str=None):
+        r"""
+        Execute the `algorithm` in continuous time. Every particle carries a
+        Poisson clock of rate `mu` and is activated each time it rings, the 
+        next ring of every particle is kept in a priority queue and the rings
+        are played in time order. At `mu` = 1 a time unit holds one 
+        activation per particle in expectation, like a round.
+
+        A particle whose activation changed nothing and that has no valid move
+        left is parked off the queue until a node within two steps of it 
+        changes. The clocks are memoryless, so a woken particle simply draws
+        a fresh ring from the time it is woken. A particle found to have a
+        valid move is not checked again until a node that close changes.
+
+        Attributes
+
+            max_time (float) :: simulated time before termination.
+            algorithm (str) default: None :: algorithm being performed in 
+                        current step, one of "random_move", "compress" ...
+        """
+        agents = {int(__id): (__id, agent) for __id, agent in 
+                                                    self.amoebots.items()}
+
+        def ring(now:float, i:int):
+            mu = agents[i][1].mu
+            if not mu: return
+            heapq.heappush(queue, (now + np.random.exponential(1. / mu), i))
+
+        table = self.amoebots
+        rows = {i: agent._row for i, (_, agent) in agents.items()}
+
+        def position(i:int) -> set:
+            row = rows[i]
+            return {(table.head_x.item(row), table.head_y.item(row)),
+                    (table.tail_x.item(row), table.tail_y.item(row))}
+
+        # particle on every occupied node
+        occupant = {point: i for i in agents for point in position(i)}
+
+        queue = list()
+        for i in agents: ring(0., i)
+
+        # particles parked off the queue and those known to have a valid move
+        parked, movable = set(), set()
+
+        elapsed = 0
+        with tqdm(total=int(np.ceil(max_time)), unit='t') as progress:
+            while queue and queue[0][0] < max_time:
+                now, i = heapq.heappop(queue)
+
+                # progress in whole units of simulated time
+                while elapsed < int(now):
+                    self.update_tracker(elapsed)
+                    elapsed += 1
+                    progress.update()
+
+                before = position(i)
+                self._exec_one_step(agents[i], algorithm=algorithm, 
+                                    async_mode=False)
+                after = position(i)
+
+                if before == after:
+                    if i in movable or \
+                            not self._is_frozen(agents[i], algorithm=algorithm):
+                        movable.add(i)
+                        ring(now, i)
+                    else:
+                        parked.add(i)
+                    continue
+
+                for point in before - after: del occupant[point]
+                for point in after - before: occupant[point] = i
+                ring(now, i)
+
+                # wake the parked particles around the changed nodes and 
+                # forget what was known of the others
+                for x, y in before ^ after:
+                    for dx, dy in WAKE_OFFSETS:
+                        j = occupant.get((x + dx, y + dy))
+                        if j in parked:
+                            parked.remove(j)
+                            ring(now, j)
+                        movable.discard(j)
+
+            # the swarm may be frozen or done before the time is up
+            while elapsed < max_time:
+                self.update_tracker(elapsed)
+                elapsed += 1
+                progress.update()
+
+        self.tracker.flush()
+
+    def _is_frozen(self, amoebot_t:tuple, algorithm:str=None) -> bool:
+        r"""
+        Whether no activation of the particle can change anything until a
+        node within two steps of it changes.
+
+        Attributes
+
+            amoebot_t (tuple) :: a tuple with the identifier and its `Agent` 
+                        view.
+            algorithm (str) default: None :: algorithm being performed in 
+                        current step, one of "random_move", "compress" ...
+
+        Return (bool): True if every move of the particle is blocked.
+        """
+        __id, amoebot = amoebot_t
+
+        # an expanded particle always contracts in a random move and never 
+        # moves in the compression chains
+        if not amoebot._is_contracted: return algorithm != 'random_move'
+
+        nm = self.__nmap.retarget(bot_id=int(__id))
+        for port in range(6):
+            mask = nm.propose(port=port)
+            if mask == -1: continue
+
+            # any admissible move passes the Metropolis filter with some 
+            # probability, whatever the distance to a wall
+            if algorithm == 'random_move' or ADMISSIBLE[mask]: return False
+
+        return True
+
+    def exec_batch(self, max_rnds:int, algorithm:str='random_move', 
+                   coloured:bool=False):
+        r"""
+        Execute the `algorithm` with its vectorized engine, every round is 
+        played on the particle table columns at once. The node manager is 
+        brought up to date when the rounds are done.
+
+        With `coloured` a round is played in colour classes of particles too 
+        far apart to interfere, each class activated at once in random class 
+        order. Every particle is still activated once per round, but the 
+        activation orders are not uniformly random, so runs only agree with
+        `exec_sequential` in distribution.
+
+        Attributes
+
+            max_rnds (int) :: maximum number of full rounds before termination.
+            algorithm (str) default: 'random_move' :: algorithm being 
+                        performed, one of `BATCH_ENGINES`.
+            coloured (bool) default: False :: play rounds in colour classes.
+        """
+        if algorithm not in BATCH_ENGINES:
+            raise NotImplementedError(
+                f"no batch engine for `{algorithm}`, use `exec_sequential`."
+            )
+
+        engine = BATCH_ENGINES[algorithm](self.amoebots, 
+                                          walls=self.__nmap.wall_points(),
+                                          coloured=coloured)
+        self._exec_engine(engine, max_rnds)
+
+    def exec_kinetic(self, max_rnds:int, algorithm:str='compress'):
+        r"""
+        Execute the `algorithm` with its rejection-free engine, only accepted
+        moves are played and the rejected proposals in between are skipped. A
+        round is n sequential steps, each activating a uniformly random 
+        particle, so rounds stay comparable to `exec_sequential`.
+
+        Attributes
+
+            max_rnds (int) :: maximum number of full rounds before termination.
+            algorithm (str) default: 'compress' :: algorithm being performed,
+                        one of `KINETIC_ENGINES`.
+        """
+        if algorithm not in KINETIC_ENGINES:
+            raise NotImplementedError(
+                f"no rejection-free engine for `{algorithm}`, use "
+                f"`exec_sequential`."
+            )
+
+        engine = KINETIC_ENGINES[algorithm](self.amoebots, 
+                                            walls=self.__nmap.wall_points())
+        self._exec_engine(engine, max_rnds)
+
+    def _exec_engine(self, engine:object, max_rnds:int):
+        r"""
+        Play `max_rnds` rounds of an engine working on the particle table, then
+        bring the node manager up to date.
+
+        Attributes
+
+            engine (BatchEngine) :: engine whose `step` plays one round.
+            max_rnds (int) :: maximum number of full rounds before termination.
+        """
+        for iter_ in trange(max_rnds):
+            engine.step()
+            self.update_tracker(iter_)
+
+        self.tracker.flush()
+        self.__nmap.relocate(points=engine.points(), 
+                             bot_ids=engine.bot_ids())
+
+    def _schedule(self, curve_order:bool=False, 
+                  block_len:int=SCHEDULE_BLOCK_LEN) -> list:
+        r"""
+        Activation order for one round.
+
+        Attributes
+
+            curve_order (bool) default: False :: if True, walk the particles 
+                        along the space-filling curve of their heads in blocks 
+                        of `block_len`, visiting the blocks in random order, so 
+                        consecutive activations touch nearby nodes; else 
+                        shuffle all particles.
+            block_len (int) default: SCHEDULE_BLOCK_LEN :: number of particles 
+                        per block.
+
+        Return (list): amoebot identifiers in activation order.
+        """
+        if not curve_order:
+            exec_seq = list(self.amoebots.keys())
+            np.random.shuffle(exec_seq)
+            return exec_seq
+
+        # map the plain ids of the node manager back to the amoebot keys
+        keys = {int(__id): __id for __id in self.amoebots.keys()}
+        order = [keys[i] for i in self.__nmap.curve_order()]
+
+        blocks = [order[i:i + block_len] for i in range(0, len(order), 
+                                                         block_len)]
+        np.random.shuffle(blocks)
+        return [__id for block in blocks for __id in block]
+
+    def _exec_async_with_domains(
+                                    self, 
+                                    n_cores:int, 
+                                    max_rnds:int, 
+                                    algorithm:str
+                                ):
+        r"""
+        Play rounds with one worker process per strip of the lattice. The 
+        particle records live in a shared `SharedObjects` store that the 
+        workers write into directly, strips are recut every round so they
+        hold about as many particles each.
+
+        Attributes
+
+            n_cores (int) :: number of processor cores to use.
+            max_rnds (int) :: maximum number of full rounds before termination.
+            algorithm (str) :: algorithm being performed, one of 
+                        `BATCH_ENGINES`.
+        """
+        table, engine_cls = self.amoebots, BATCH_ENGINES[algorithm]
+        walls = self.__nmap.wall_points()
+
+        # the coordinator plays the halo on the table itself
+        engine = engine_cls(table, walls=walls, coloured=True)
+        store = SharedObjects(self.config_num, data=table.records(), 
+                              shared=True)
+
+        try:
+            with futures.ProcessPoolExecutor(
+                                max_workers=n_cores, 
+                                initializer=attach_worker,
+                                initargs=(store.handle, engine_cls, walls)
+                            ) as executor:
+                for iter_ in trange(max_rnds):
+                    strips = strip_bounds(table, n_cores)
+                    seeds = np.random.randint(2 ** 31 - 1, size=len(strips))
+
+                    los, his = zip(*strips)
+                    list(executor.map(advance_strip, los, his, seeds.tolist()))
+
+                    table.load_records(store.records)
+                    engine.step_coloured(halo_rows(table, strips))
+                    store.records[...] = table.records()
+
+                    self.update_tracker(iter_)
+        finally:
+            store.close()
+            store.unlink()
+
+        self.tracker.flush()
+        self.__nmap.relocate(points=engine.points(), 
+                             bot_ids=engine.bot_ids())
+
     def _exec_async_with_interpreter_lock(
                                             self, 
                                             n_cores:int, 
@@ -187,8 +513,8 @@ class AmoebotManager(Manager):
                                             async_mode=True
                                         )
 
-        # zip identifier to amoebot objects for `map` function
-        amoebots_z = zip(self.amoebots.keys(), self.amoebots.values())
+        # zip identifier to amoebot views for `map` function
+        amoebots_z = self.amoebots.items()
 
         for _ in range(max_rnds):
             # set up the asynchronous caller with GIL
@@ -207,8 +533,8 @@ class AmoebotManager(Manager):
 
         Attributes
 
-            amoebot_t (tuple) :: a tuple with `Agent` and its respective 
-                        identifier.
+            amoebot_t (tuple) :: a tuple with the identifier and its `Agent` 
+                        view.
             algorithm (str) default: None :: algorithm being performed in 
                         current step, one of "random_move" and "compress"...
             async_mode (bool) default: True :: if True, execute the local, 
@@ -218,11 +544,8 @@ class AmoebotManager(Manager):
         Return (Agent): instance of amoebot.
         """
 
-        # unpack the 2-tuple
-        __id, _ = amoebot_t
-
-        # fetch and unpickle the instance of amoebot
-        amoebot = Agent.unpickled(self.shared.ifetch(__id))
+        # unpack the 2-tuple, the view writes straight into the table
+        _, amoebot = amoebot_t
 
         # execute the amoebot algorithm(s) and update activation status
         amoebot, self.__nmap = amoebot.execute(
@@ -231,14 +554,12 @@ class AmoebotManager(Manager):
                                                 async_mode=async_mode,
                                              )
 
-        # write back to data dump
-        self.shared.iwrite(__id, amoebot.pickled)
-
-        return amoebot.pickled
+        return amoebot
 
     def update_tracker(self, iter_:int):
         """
-        Update the tracker file with most current state.
+        Queue the most current state for the tracker file, it is written by
+        the tracker's background thread.
 
         Attributes
 
@@ -246,20 +567,19 @@ class AmoebotManager(Manager):
                         defaults to 10 when all iterations are saved.
         """
 
-        config = list()
-
         # update the tracker file every few iterations
         if iter_ % 100 == 0:
-            # collect configurations of all particles
-            # TODO: optimize block
-            for __id in self.amoebots.keys():
-                amoebot = Agent.unpickled(self.shared.ifetch(__id))
-                config.append(dict(
-                                    head_pos=amoebot.head.tolist(), 
-                                    tail_pos=amoebot.tail.tolist()
-                            ))
-
-            self.tracker.update(config)
-
-    def load_env(self, value):
+            # queue a copy of the positions from the table columns
+            self.tracker.update(self.amoebots.positions(), rnd=iter_)
+
+    def load_env(self, value:NodeManagerBitArray):
+        r"""
+        Hand the node environment over to the manager.
+
+        Attributes
+
+            value (NodeManagerBitArray) :: node manager holding the node array 
+                        and its point index, kept for the whole simulation; a 
+                        `NodeManagerLattice` for bounded arenas.
+        """
         self.__nmap = value
\ No newline at end of file
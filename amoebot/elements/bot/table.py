@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+""" elements/bot/table.py
+"""
+
+from .agent import Agent
+from .core import UNSET
+from ..node.store import COORDINATE_DTYPE, BOT_ID_DTYPE
+
+import numpy as np
+
+# column name to (dtype, width, default), the coordinate columns take the
+# dtype of the table instead
+COLUMNS = {
+    'bot_id': (BOT_ID_DTYPE, 1, -1),
+    'head_x': (None, 1, 0),
+    'head_y': (None, 1, 0),
+    'tail_x': (None, 1, 0),
+    'tail_y': (None, 1, 0),
+    'orientation': (np.uint8, 1, 0),
+    'mu': (np.uint8, 1, 1),
+    'clock': (np.uint8, 1, 0),
+    'cflag': (np.uint8, 1, 0),
+    'tau': (np.float16, 1, -.5),
+    'tau0': (np.float16, 1, 1.),
+    'gamma': (np.float16, 1, .95),
+    'h_status': (np.int8, 6, UNSET),
+    't_status': (np.int8, 6, UNSET),
+}
+
+class ParticleTable(object):
+    r"""
+    Struct-of-arrays table with one row per particle, owned by
+    `AmoebotManager`. Every particle attribute lives in its own typed column
+    and an `Agent` is a view over one row, so an activation reads and writes
+    the columns in place instead of unpickling and pickling an object.
+
+    The table behaves like the former dictionary of amoebots, it is keyed by
+    bot identifier and `table[__id]` hands back the `Agent` view.
+
+    Attributes
+
+        bot_id (numpy.ndarray) :: unique particle identifier per row.
+        head_x, head_y (numpy.ndarray) :: position of the amoebot head.
+        tail_x, tail_y (numpy.ndarray) :: position of the amoebot tail.
+        orientation (numpy.ndarray) :: offset of port 0 into `PORT_LABELS`.
+        mu (numpy.ndarray) :: rate parameter for Poisson clock.
+        clock (numpy.ndarray) :: time on the Poisson clock.
+        cflag (numpy.ndarray) :: status flag for compression algorithm.
+        tau, tau0, gamma (numpy.ndarray) :: temperature parameters.
+        h_status, t_status (numpy.ndarray) :: n x 6 neighbourhood status around
+                        the head and the tail, `UNSET` where unknown.
+        size (int) :: number of rows in use.
+    """
+
+    def __init__(self, capacity:int=16, coordinate_dtype:type=COORDINATE_DTYPE):
+        r"""
+        Attributes
+
+            capacity (int) default: 16 :: number of rows to allocate up front,
+                            the table doubles whenever it runs full.
+            coordinate_dtype (type) default: COORDINATE_DTYPE :: signed integer
+                            type of the head and tail columns.
+        """
+        self.coordinate_dtype = coordinate_dtype
+        self.size = 0
+
+        # map of bot identifiers to rows
+        self.rows:dict = dict()
+
+        for name, (dtype, width, default) in COLUMNS.items():
+            shape = (capacity,) if width == 1 else (capacity, width)
+            setattr(self, name, np.full(shape, default,
+                                        dtype=dtype or coordinate_dtype))
+
+    @classmethod
+    def from_records(cls, records:np.ndarray) -> 'ParticleTable':
+        r"""
+        Build a table from records exported by `records`, keyed by their bot
+        identifiers.
+
+        Attributes
+
+            records (numpy.ndarray) :: one record per particle.
+        """
+        table = cls(capacity=max(records.shape[0], 1),
+                    coordinate_dtype=records.dtype['head_x'].type)
+        table.size = records.shape[0]
+        table.load_records(records)
+        table.rows = dict(zip(table.bot_id[:table.size].tolist(),
+                              range(table.size)))
+        return table
+
+    @property
+    def capacity(self) -> int:
+        return self.bot_id.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        r"""
+        Return (int): bytes held by all columns.
+        """
+        return sum(getattr(self, name).nbytes for name in COLUMNS)
+
+    @classmethod
+    def bytes_per_particle(cls) -> int:
+        r"""
+        Return (int): bytes one row takes across all columns.
+        """
+        return cls(capacity=1).nbytes
+
+    def add(self, __id:int, head:np.ndarray, tail:np.ndarray=None) -> Agent:
+        r"""
+        Append a particle.
+
+        Attributes
+
+            __id (int) :: unique particle identifier, stored as 
+                            `BOT_ID_DTYPE`.
+            head (numpy.ndarray) :: position (x and y co-ordinates) of amoebot
+                            head.
+            tail (numpy.ndarray) default: None :: position (x and y
+                            co-ordinates) of amoebot tail, same as the head if
+                            None.
+
+        Return (Agent): view over the new row.
+        """
+        if __id in self.rows:
+            raise KeyError(f"Particle {__id} is already in the table.")
+
+        if self.size == self.capacity: self._grow(2 * self.capacity)
+
+        row = self.size
+        self.size += 1
+        self.rows[__id] = row
+
+        tail = head if tail is None else tail
+        self.bot_id[row] = __id
+        self.head_x[row], self.head_y[row] = head
+        self.tail_x[row], self.tail_y[row] = tail
+
+        return Agent(self, row)
+
+    def states(self) -> list:
+        r"""
+        Return (list[dict]): head and tail positions of every particle, in row
+                        order, as written to the tracker.
+        """
+        n = self.size
+        heads = np.stack((self.head_x[:n], self.head_y[:n]), axis=1).tolist()
+        tails = np.stack((self.tail_x[:n], self.tail_y[:n]), axis=1).tolist()
+        return [dict(head_pos=h, tail_pos=t) for h, t in zip(heads, tails)]
+
+    def positions(self) -> np.ndarray:
+        r"""
+        Return (numpy.ndarray): n x 4 copy of head x, head y, tail x and tail y
+                        of every particle, in row order.
+        """
+        n = self.size
+        return np.stack((self.head_x[:n], self.head_y[:n],
+                         self.tail_x[:n], self.tail_y[:n]), axis=1)
+
+    @property
+    def record_dtype(self) -> np.dtype:
+        r"""
+        Return (numpy.dtype): structured dtype of one row, as exported by
+                        `records`.
+        """
+        return np.dtype([(name, getattr(self, name).dtype,
+                          getattr(self, name).shape[1:]) for name in COLUMNS])
+
+    def records(self) -> np.ndarray:
+        r"""
+        Return (numpy.ndarray): copy of the rows in use as fixed-size records, 
+                        ready for `SharedObjects`.
+        """
+        records = np.empty(self.size, dtype=self.record_dtype)
+        for name in COLUMNS:
+            records[name] = getattr(self, name)[:self.size]
+        return records
+
+    def load_records(self, records:np.ndarray):
+        r"""
+        Overwrite the rows in use with records exported by `records`, for 
+        example after workers changed them in a `SharedObjects` store.
+
+        Attributes
+
+            records (numpy.ndarray) :: one record per row in use.
+        """
+        for name in COLUMNS:
+            getattr(self, name)[:self.size] = records[name]
+
+    def keys(self) -> list:
+        return list(self.rows.keys())
+
+    def values(self) -> list:
+        return [Agent(self, row) for row in self.rows.values()]
+
+    def items(self) -> list:
+        return [(__id, Agent(self, row)) for __id, row in self.rows.items()]
+
+    def __getitem__(self, __id:int) -> Agent:
+        return Agent(self, self.rows[__id])
+
+    def __contains__(self, __id:int) -> bool:
+        return __id in self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _grow(self, capacity:int):
+        r"""
+        Reallocate every column to `capacity` rows, new rows take the column
+        defaults.
+        """
+        for name, (dtype, width, default) in COLUMNS.items():
+            column = getattr(self, name)
+            shape = (capacity,) + column.shape[1:]
+            new_column = np.full(shape, default, dtype=column.dtype)
+            new_column[:self.size] = column[:self.size]
+            setattr(self, name, new_column)
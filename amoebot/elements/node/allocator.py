@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+""" elements/node/allocator.py
+"""
+
+import math
+import numpy as np
+import typing
+
+from amoebot.elements.node.manager_utils import increase_array_size_ver_1
+from amoebot.elements.node.store import NodeStore
+
+GROWTH_FACTOR = 2.
+
+
+class NodeAllocator:
+    __slots__ = [
+        '__free',
+        '__growth_factor',
+        'allocations',
+        'releases',
+        'resizes',
+    ]
+
+    def __init__(self, nodes: NodeStore, growth_factor: float = GROWTH_FACTOR):
+        """
+        Hands out empty columns of the node store from a free-list and grows
+        the store geometrically once the free-list runs dry, so that creating a
+        node is amortized O(1).
+
+        :param NodeStore nodes: Node store whose empty (type 0) columns seed
+            the free-list.
+        :param float growth_factor: Factor the capacity is multiplied by on
+            every resize, must be greater than 1.
+        """
+        if growth_factor <= 1:
+            raise ValueError(f"Growth factor must be greater than 1, got "
+                             f"{growth_factor}")
+        self.__growth_factor = growth_factor
+
+        # kept in descending order so that pop hands out the lowest index first
+        empty = np.where(nodes.get_enabled_type() == 0)[0]
+        self.__free = empty[::-1].tolist()
+
+        # counters for watching growth in long runs
+        self.allocations = 0
+        self.releases = 0
+        self.resizes = 0
+
+    @property
+    def growth_factor(self) -> float:
+        return self.__growth_factor
+
+    @property
+    def free(self) -> int:
+        """
+        :returns: Number of empty columns left before the next resize.
+        """
+        return len(self.__free)
+
+    @property
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        :returns: Allocation, release and resize counters along with the
+            current number of free columns.
+        """
+        return dict(allocations=self.allocations, releases=self.releases,
+                    resizes=self.resizes, free=self.free)
+
+    def reset(self, nodes: NodeStore) -> None:
+        """
+        Re-seeds the free-list from a store that was rebuilt outside of the
+        allocator, for example by compaction. The counters are kept.
+
+        :param NodeStore nodes: The new node store.
+        """
+        empty = np.where(nodes.get_enabled_type() == 0)[0]
+        self.__free = empty[::-1].tolist()
+
+    def allocate(self, nodes: NodeStore) -> typing.Tuple[int, NodeStore]:
+        """
+        Takes an empty column for a new node, growing the node store first if
+        none is left.
+
+        :param NodeStore nodes: Current node store.
+        :returns: Index of the empty column and the (possibly grown) node
+            store.
+        """
+        if not self.__free:
+            nodes = self.reserve(nodes=nodes, size=1)
+
+        self.allocations += 1
+        return self.__free.pop(), nodes
+
+    def release(self, index: int) -> None:
+        """
+        Returns a column to the free-list. The caller is responsible for
+        clearing the column in the node store.
+
+        :param int index: Column that is no longer in use.
+        """
+        self.releases += 1
+        self.__free.append(index)
+
+    def reserve(self, nodes: NodeStore, size: int) -> NodeStore:
+        """
+        Makes sure at least size empty columns are available, growing the
+        node store by the growth factor if they are not.
+
+        :param NodeStore nodes: Current node store.
+        :param int size: Number of columns that are about to be allocated.
+        :returns: The node store, reallocated if it had to grow.
+        """
+        missing = size - len(self.__free)
+        if missing <= 0:
+            return nodes
+
+        capacity = nodes.size
+        new_capacity = max(math.ceil(capacity * self.__growth_factor),
+                           capacity + missing)
+        nodes = increase_array_size_ver_1(nodes=nodes, size=new_capacity)
+
+        # new columns sit above every free index, so they go under the stack
+        self.__free = list(range(new_capacity - 1, capacity - 1, -1)) + \
+            self.__free
+        self.resizes += 1
+        return nodes
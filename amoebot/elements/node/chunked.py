@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+""" elements/node/chunked.py
+"""
+
+from amoebot.elements.node.manager_utils import LAYOUT, NODE_LAYOUT
+from amoebot.elements.node.store import BOT_ID_DTYPE
+
+import numpy as np
+import typing
+
+BLOCK_SIZE = 64
+
+# node keys pack a point as (x + BIAS) * STRIDE + (y + BIAS) so that a port is
+# a fixed offset from any key, co-ordinates must stay within +-BIAS
+STRIDE = 2 ** 31
+BIAS = 2 ** 30
+
+# layer name to the value of an untouched cell
+LAYER_DEFAULTS = {'occupied': 0, 'wall': 0, 'bot_ids': -1}
+LAYER_DTYPES = {'occupied': np.uint8, 'wall': np.uint8, 'bot_ids': BOT_ID_DTYPE}
+
+
+class Block:
+    __slots__ = [
+        'layers',
+        'count',
+    ]
+
+    def __init__(self, block_size: int):
+        """
+        One block_size x block_size tile of the lattice.
+
+        :param int block_size: Side of the tile.
+        """
+        size = block_size * block_size
+        self.layers = {k: np.full(size, v, dtype=LAYER_DTYPES[k])
+                       for k, v in LAYER_DEFAULTS.items()}
+
+        # number of cells holding a particle or a wall, the block is freed
+        # once it drops back to zero
+        self.count = 0
+
+
+class ChunkedLayer:
+    __slots__ = [
+        '__lattice',
+        '__name',
+        '__default',
+    ]
+
+    def __init__(self, lattice: 'ChunkedLattice', name: str):
+        """
+        Array-like access to one layer of a chunked lattice by node key.
+        Reads of untouched blocks return the layer default, writes allocate
+        the block on first touch.
+
+        :param ChunkedLattice lattice:
+        :param str name: One of the LAYER_DEFAULTS keys.
+        """
+        self.__lattice = lattice
+        self.__name = name
+        self.__default = LAYER_DEFAULTS[name]
+
+    def __getitem__(self, keys):
+        if np.ndim(keys):
+            return np.array([self.__get(k) for k in np.ravel(keys).tolist()],
+                            dtype=LAYER_DTYPES[self.__name])
+        return self.__get(int(keys))
+
+    def __setitem__(self, keys, value) -> None:
+        if np.ndim(keys):
+            keys = np.ravel(keys).tolist()
+            values = np.broadcast_to(value, (len(keys),)).tolist()
+            for k, v in zip(keys, values):
+                self.__set(k, v)
+        else:
+            self.__set(int(keys), int(value))
+
+    def __get(self, key: int):
+        block_key, local = self.__lattice.locate(key)
+        block = self.__lattice.blocks.get(block_key)
+        if block is None:
+            return self.__default
+        return block.layers[self.__name].item(local)
+
+    def __set(self, key: int, value: int) -> None:
+        lattice, name = self.__lattice, self.__name
+        block_key, local = lattice.locate(key)
+        block = lattice.blocks.get(block_key)
+
+        if block is None:
+            # writing the default into an untouched block changes nothing
+            if value == self.__default:
+                return
+            block = lattice.allocate(block_key)
+
+        layers = block.layers
+        if name == 'bot_ids':
+            layers[name][local] = value
+            return
+
+        before = layers['occupied'].item(local) | layers['wall'].item(local)
+        layers[name][local] = value
+        after = layers['occupied'].item(local) | layers['wall'].item(local)
+
+        block.count += after - before
+        if block.count == 0:
+            lattice.release(block_key)
+
+
+class ChunkedLattice:
+    __slots__ = [
+        'block_size',
+        'offsets',
+        'blocks',
+        'occupied',
+        'wall',
+        'bot_ids',
+        'allocations',
+        'releases',
+    ]
+
+    def __init__(self, block_size: int = BLOCK_SIZE):
+        """
+        Sparse, unbounded lattice tiled into block_size x block_size blocks.
+        Blocks are allocated on the first write, kept in a block index and
+        freed once they hold neither particles nor walls, so memory follows the
+        area the swarm currently covers.
+
+        :param int block_size: Side of a block.
+        """
+        self.block_size = block_size
+        self.offsets = np.array(
+            [v['relative_point'][0] * STRIDE + v['relative_point'][1]
+             for _, v in sorted(NODE_LAYOUT[LAYOUT].items())],
+            dtype=np.int64
+        )
+
+        # block index, (block x, block y) to Block
+        self.blocks: typing.Dict[typing.Tuple[int, int], Block] = {}
+
+        self.occupied = ChunkedLayer(self, 'occupied')
+        self.wall = ChunkedLayer(self, 'wall')
+        self.bot_ids = ChunkedLayer(self, 'bot_ids')
+
+        # counters for watching block churn
+        self.allocations = 0
+        self.releases = 0
+
+    @property
+    def nbytes(self) -> int:
+        """
+        :returns: Bytes held by the layers of all live blocks.
+        """
+        return sum(a.nbytes for b in self.blocks.values()
+                   for a in b.layers.values())
+
+    def index(
+            self, x: typing.Union[int, float], y: typing.Union[int, float]
+    ) -> int:
+        """
+        :returns: Node key of the point (x, y).
+        """
+        x, y = int(x), int(y)
+        if not (-BIAS <= x < BIAS and -BIAS <= y < BIAS):
+            raise IndexError(f"Point ({x}, {y}) lies outside of the lattice")
+        return (x + BIAS) * STRIDE + (y + BIAS)
+
+    def point(self, index: int) -> typing.Tuple[int, int]:
+        """
+        :returns: The point (x, y) of a node key.
+        """
+        x, y = divmod(int(index), STRIDE)
+        return x - BIAS, y - BIAS
+
+    def locate(self, index: int) -> typing.Tuple[typing.Tuple[int, int], int]:
+        """
+        :returns: Key of the block holding the node and the flat position of
+            the node inside the block.
+        """
+        x, y = divmod(index, STRIDE)
+        block_x, local_x = divmod(x - BIAS, self.block_size)
+        block_y, local_y = divmod(y - BIAS, self.block_size)
+        return (block_x, block_y), local_x * self.block_size + local_y
+
+    def indices(self, layer: str) -> np.ndarray:
+        """
+        :param str layer: One of 'occupied', 'wall' or 'bot_ids'.
+        :returns: Sorted node keys where the layer is not at its default.
+        """
+        default, size = LAYER_DEFAULTS[layer], self.block_size
+        keys = []
+        for (block_x, block_y), block in self.blocks.items():
+            local = np.flatnonzero(block.layers[layer] != default)
+            x = block_x * size + local // size + BIAS
+            y = block_y * size + local % size + BIAS
+            keys.append(x.astype(np.int64) * STRIDE + y)
+        return np.sort(np.concatenate(keys)) if keys else \
+            np.array([], dtype=np.int64)
+
+    def allocate(self, block_key: typing.Tuple[int, int]) -> Block:
+        """
+        :returns: A new, empty block registered under block_key.
+        """
+        self.allocations += 1
+        block = self.blocks[block_key] = Block(block_size=self.block_size)
+        return block
+
+    def release(self, block_key: typing.Tuple[int, int]) -> None:
+        """
+        Drops the block registered under block_key.
+        """
+        self.releases += 1
+        del self.blocks[block_key]
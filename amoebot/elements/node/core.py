@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from numpy import ndarray, uint8
+from numpy import uint8
 
 """ elements/node/core.py
 """
@@ -7,41 +7,39 @@ from numpy import ndarray, uint8
 
 class Node:
     __slots__ = [
-        '__node_data',
-        '__enabled_type',
-        '__x',
-        '__y',
-        '__occupied',
-        '__bot_id',
-        '__neighbor_0_index',
-        '__neighbor_1_index',
-        '__neighbor_2_index',
-        '__neighbor_3_index',
-        '__neighbor_4_index',
-        '__neighbor_5_index',
-        '__signal_0',
-        '__signal_1',
-        '__signal_2',
-        '__signal_3',
-        '__signal_4',
-        '__signal_5',
-        '__bot_contraction_status',
+        '__nodes',
+        '__index',
+        '__nodes_by_point',
     ]
 
-    def __init__(self, node_data: ndarray):
+    def __init__(self, nodes, index: int, nodes_by_point: dict = None):
         """
-        :param ndarray node_data: A single column of node data (attributes
-            states)
+        A view of a single node in the node store, reads and writes go straight
+        to the store columns.
+
+        :param NodeStore nodes: Store holding the node space.
+        :param int index: Index of the node in the store.
+        :param dict nodes_by_point: Point dictionary of the store, needed to
+            look neighbors up since the store keeps no neighbor links.
         """
 
-        self.__node_data = node_data
+        self.__nodes = nodes
+        self.__index = index
+        self.__nodes_by_point = nodes_by_point
+
+    @property
+    def index(self):
+        """
+        :returns: Index of the node in the node store.
+        """
+        return self.__index
 
     @property
     def enabled_type(self):
         """
         :returns: Enabled type attribute.
         """
-        return self.__node_data[0, 0]
+        return self.__nodes.get_enabled_type(self.__index)
 
     @enabled_type.setter
     def enabled_type(self, value: uint8):
@@ -49,154 +47,175 @@ class Node:
         :param uint8 value: value that correlates to inactive (0), node (1),
             wall (2).
         """
-        self.__node_data[0, 0] = value
+        self.__nodes.set_enabled_type(self.__index, value)
+
+    @property
+    def bot_id(self):
+        """
+        :returns: Id of the bot on the node, -1 when empty.
+        """
+        return self.__nodes.bot_id.item(self.__index)
+
+    @property
+    def bot_contraction_status(self):
+        """
+        :returns: None (0), head (1), tail (2) or contracted (3).
+        """
+        return self.__nodes.get_contraction(self.__index)
+
+    @bot_contraction_status.setter
+    def bot_contraction_status(self, value: uint8):
+        """
+        :param uint8 value: None (0), head (1), tail (2) or contracted (3).
+        """
+        self.__nodes.set_contraction(self.__index, value)
 
     @property
     def neighbor_0_index(self):
         """
         :returns: Index of neighbor in port 0
         """
-        return self.__node_data[5, 0]
+        return self.__neighbor_index(port=0)
 
     @property
     def neighbor_1_index(self):
         """
         :returns: Index of neighbor in port 1
         """
-        return self.__node_data[6, 0]
+        return self.__neighbor_index(port=1)
 
     @property
     def neighbor_2_index(self):
         """
         :returns: Index of neighbor in port 2
         """
-        return self.__node_data[7, 0]
+        return self.__neighbor_index(port=2)
 
     @property
     def neighbor_3_index(self):
         """
         :returns: Index of neighbor in port 3
         """
-        return self.__node_data[8, 0]
+        return self.__neighbor_index(port=3)
 
     @property
     def neighbor_4_index(self):
         """
         :returns: Index of neighbor in port 4
         """
-        return self.__node_data[9, 0]
+        return self.__neighbor_index(port=4)
 
     @property
     def neighbor_5_index(self):
         """
         :returns: Index of neighbor in port 5
         """
-        return self.__node_data[10, 0]
+        return self.__neighbor_index(port=5)
 
     @property
     def occupied(self):
         """
         :returns: Occupied attribute.
         """
-        return self.__node_data[3, 0]
+        return self.__nodes.get_occupied(self.__index)
 
     @property
     def signal_0(self):
         """
         :returns: Signal value in the direction port 0
         """
-        return self.__node_data[11, 0]
+        return self.__nodes.get_signal(self.__index, 0)
 
     @signal_0.setter
     def signal_0(self, value: uint8):
         """
         :param uint8 value: value that correlates to false (0) or true (1)
         """
-        self.__node_data[11, 0] = value
+        self.__nodes.set_signal(self.__index, 0, value)
 
     @property
     def signal_1(self):
         """
         :returns: Signal value in the direction port 1
         """
-        return self.__node_data[12, 0]
+        return self.__nodes.get_signal(self.__index, 1)
 
     @signal_1.setter
     def signal_1(self, value: uint8):
         """
         :param uint8 value: value that correlates to false (0) or true (1)
         """
-        self.__node_data[12, 0] = value
+        self.__nodes.set_signal(self.__index, 1, value)
 
     @property
     def signal_2(self):
         """
         :returns: Signal value in the direction port 2
         """
-        return self.__node_data[13, 0]
+        return self.__nodes.get_signal(self.__index, 2)
 
     @signal_2.setter
     def signal_2(self, value: uint8):
         """
         :param uint8 value: value that correlates to false (0) or true (1)
         """
-        self.__node_data[13, 0] = value
+        self.__nodes.set_signal(self.__index, 2, value)
 
     @property
     def signal_3(self):
         """
         :returns: Signal value in the direction port 3
         """
-        return self.__node_data[14, 0]
+        return self.__nodes.get_signal(self.__index, 3)
 
     @signal_3.setter
     def signal_3(self, value: uint8):
         """
         :param uint8 value: value that correlates to false (0) or true (1)
         """
-        self.__node_data[14, 0] = value
+        self.__nodes.set_signal(self.__index, 3, value)
 
     @property
     def signal_4(self):
         """
         :returns: Signal value in the direction port 4
         """
-        return self.__node_data[15, 0]
+        return self.__nodes.get_signal(self.__index, 4)
 
     @signal_4.setter
     def signal_4(self, value: uint8):
         """
         :param uint8 value: value that correlates to false (0) or true (1)
         """
-        self.__node_data[15, 0] = value
+        self.__nodes.set_signal(self.__index, 4, value)
 
     @property
     def signal_5(self):
         """
         :returns: Signal value in the direction port 5
         """
-        return self.__node_data[16, 0]
+        return self.__nodes.get_signal(self.__index, 5)
 
     @signal_5.setter
     def signal_5(self, value: uint8):
         """
         :param uint8 value: value that correlates to false (0) or true (1)
         """
-        self.__node_data[16, 0] = value
+        self.__nodes.set_signal(self.__index, 5, value)
 
     @property
     def x(self):
         """
         :returns: X attribute.
         """
-        return self.__node_data[1, 0]
+        return self.__nodes.x.item(self.__index)
 
     @property
     def y(self):
         """
         :returns: Y attribute.
         """
-        return self.__node_data[2, 0]
+        return self.__nodes.y.item(self.__index)
 
     def get_neighbor_index(self, port: uint8):
         """
@@ -273,6 +292,46 @@ class Node:
         # Converts node to a wall type
         self.enabled_type = uint8(wall)
 
+    def occupy(self, bot_id: int, status: uint8):
+        """
+        Places a bot on the node.
+
+        :param int bot_id: Id of the bot.
+        :param uint8 status: head (1), tail (2) or contracted (3).
+        """
+        nodes, index = self.__nodes, self.__index
+        nodes.set_occupied(index, 1)
+        nodes.set_contraction(index, status)
+        nodes.bot_id[index] = bot_id
+
+    def vacate(self):
+        """
+        Removes the bot from the node.
+        """
+        nodes, index = self.__nodes, self.__index
+        nodes.set_occupied(index, 0)
+        nodes.set_contraction(index, 0)
+        nodes.bot_id[index] = -1
+
+    def __neighbor_index(self, port: uint8):
+        """
+        :param uint8 port: direction to look in.
+        :returns: Index of the neighbor found by point, -1 when it was not
+            created.
+        """
+        nodes_by_point = self.__nodes_by_point
+        if nodes_by_point is None:
+            raise ValueError("Node view was made without a point dictionary, "
+                             "neighbors can not be looked up")
+
+        # manager_utils imports this module, so it is only imported here
+        from amoebot.elements.node.manager_utils import \
+            get_neighbor_index_ver_0
+
+        return get_neighbor_index_ver_0(nodes=self.__nodes, index=self.__index,
+                                        port=port,
+                                        nodes_by_point=nodes_by_point)
+
     def __get_from_neighbor(self, port: uint8, item: str):
         """
         :param uint8 port: direction to look in.
@@ -0,0 +1,534 @@
+# -*- coding: utf-8 -*-
+
+""" elements/node/lattice.py
+"""
+
+from amoebot.elements.node.chunked import ChunkedLattice, BLOCK_SIZE
+from amoebot.elements.node.manager_utils import LAYOUT, NODE_LAYOUT, \
+    NEIGHBORHOOD_RING, get_morton_keys_ver_0
+from amoebot.elements.node.store import BOT_ID_DTYPE
+
+from numpy import uint8
+
+import numpy as np
+import typing
+
+# cells added around the extent so that neighbor offsets never leave the
+# arrays, the padding is made of walls
+PADDING_X = 1
+PADDING_Y = 2
+
+
+def extent_of(points: np.ndarray) -> typing.Tuple[int, int, int, int]:
+    """
+    Bounding box of a set of lattice points.
+
+    :param ndarray points: Array of shape (..., 2) holding (x, y) pairs, like
+        the grids make_triangular_grid produces.
+    :returns: (x_min, y_min, x_max, y_max)
+    """
+    points = np.asarray(points).reshape(-1, 2)
+    x_min, y_min = points.min(axis=0).tolist()
+    x_max, y_max = points.max(axis=0).tolist()
+    return x_min, y_min, x_max, y_max
+
+
+class DenseLattice:
+    __slots__ = [
+        'origin',
+        'shape',
+        'offsets',
+        'occupied',
+        'wall',
+        'bot_ids',
+    ]
+
+    def __init__(self, extent: typing.Tuple[int, int, int, int]):
+        """
+        Occupancy, wall and bot id layers as dense arrays over a bounded
+        extent. A node index is the flat position of a point in the layers.
+        The extent is padded with walls so neighbor offsets never leave the
+        arrays.
+
+        :param tuple extent: (x_min, y_min, x_max, y_max) of the arena,
+            inclusive.
+        """
+        x_min, y_min, x_max, y_max = extent
+        if x_max < x_min or y_max < y_min:
+            raise ValueError(f"Received an empty extent {extent}")
+
+        self.origin = (x_min - PADDING_X, y_min - PADDING_Y)
+        self.shape = shape = (x_max - x_min + 1 + 2 * PADDING_X,
+                              y_max - y_min + 1 + 2 * PADDING_Y)
+
+        # flat offset of every port, a point moves by dx rows and dy columns
+        height = shape[1]
+        self.offsets = np.array(
+            [v['relative_point'][0] * height + v['relative_point'][1]
+             for _, v in sorted(NODE_LAYOUT[LAYOUT].items())]
+        )
+
+        # layers are kept flat, node indices address them directly
+        size = shape[0] * shape[1]
+        self.occupied = np.zeros(size, dtype=np.uint8)
+        self.wall = np.zeros(size, dtype=np.uint8)
+        self.bot_ids = np.full(size, -1, dtype=BOT_ID_DTYPE)
+
+        # wall off the padding
+        wall = self.grid('wall')
+        wall[:PADDING_X, :] = wall[-PADDING_X:, :] = 1
+        wall[:, :PADDING_Y] = wall[:, -PADDING_Y:] = 1
+
+    @property
+    def nbytes(self) -> int:
+        """
+        :returns: Bytes held by the layers.
+        """
+        return self.occupied.nbytes + self.wall.nbytes + self.bot_ids.nbytes
+
+    def grid(self, layer: str) -> np.ndarray:
+        """
+        :param str layer: One of 'occupied', 'wall' or 'bot_ids'.
+        :returns: 2D view of the layer, x along the first axis.
+        """
+        return getattr(self, layer).reshape(self.shape)
+
+    def index(
+            self, x: typing.Union[int, float], y: typing.Union[int, float]
+    ) -> int:
+        """
+        :returns: Flat node index of the point (x, y).
+        :raises IndexError: If the point lies outside of the extent.
+        """
+        i, j = int(x) - self.origin[0], int(y) - self.origin[1]
+        width, height = self.shape
+        if not (0 <= i < width and 0 <= j < height):
+            raise IndexError(f"Point ({x}, {y}) lies outside of the lattice")
+        return i * height + j
+
+    def point(self, index: int) -> typing.Tuple[int, int]:
+        """
+        :returns: The point (x, y) of a flat node index.
+        """
+        i, j = divmod(int(index), self.shape[1])
+        return i + self.origin[0], j + self.origin[1]
+
+    def indices(self, layer: str) -> np.ndarray:
+        """
+        :param str layer: One of 'occupied', 'wall' or 'bot_ids'.
+        :returns: Sorted node indices where the layer is set.
+        """
+        values = getattr(self, layer)
+        return np.flatnonzero(values != (-1 if layer == 'bot_ids' else 0))
+
+
+class NodeManagerLattice:
+    __slots__ = [
+        '__lattice',
+        '__offsets',
+        '__occupied',
+        '__wall',
+        '__bot_ids',
+        '__bot_id',
+        '__working_nodes',
+        '__working_nodes_by_bot',
+        '__validate',
+        '__weakref__',
+    ]
+
+    def __init__(
+            self,
+            extent: typing.Tuple[int, int, int, int] = None,
+            bot_id: int = -1,
+            points: np.ndarray = np.array([]),
+            validate: bool = False,
+            block_size: int = BLOCK_SIZE,
+    ) -> None:
+        """
+        Lattice alternative to NodeManagerBitArray. Nodes are held as
+        occupancy, wall and bot id layers, neighbors are found at fixed
+        offsets taken from NODE_LAYOUT, so no neighbor links and no point
+        dictionary are kept.
+
+        With an extent the layers are a DenseLattice and everything outside of
+        the extent behaves as a wall. Without one they are an unbounded
+        ChunkedLattice whose blocks come and go with the swarm.
+
+        :param tuple extent: (x_min, y_min, x_max, y_max) of the arena,
+            inclusive.
+        :param int bot_id:
+        :param ndarray points: 4 x n array of head x, head y, tail x and tail
+            y, the column is the bot id.
+        :param bool validate: When set, the bot to working node table is
+            checked against the layers after every change. Slow, meant for
+            tests.
+        :param int block_size: Side of the blocks of an unbounded lattice.
+        """
+        if extent is None:
+            self.__lattice = lattice = ChunkedLattice(block_size=block_size)
+        else:
+            self.__lattice = lattice = DenseLattice(extent=extent)
+
+        self.__offsets = lattice.offsets
+        self.__occupied = lattice.occupied
+        self.__wall = lattice.wall
+        self.__bot_ids = lattice.bot_ids
+
+        self.__working_nodes_by_bot = {}
+        self.__validate = validate
+
+        if points.size > 0:
+            self.add_points(points=points)
+
+        if bot_id != -1:
+            self.retarget(bot_id=bot_id)
+        else:
+            self.__bot_id = bot_id
+            self.__working_nodes = ()
+
+    @property
+    def lattice(self) -> typing.Union[DenseLattice, ChunkedLattice]:
+        """
+
+        :return: the layer storage, dense over a known extent or chunked
+        """
+        return self.__lattice
+
+    @property
+    def bot_id(self) -> int:
+        return self.__bot_id
+
+    @property
+    def working_nodes(self) -> typing.Union[tuple, typing.Tuple[int]]:
+        return self.__working_nodes
+
+    @property
+    def working_nodes_by_bot(self) -> typing.Dict[int, typing.Tuple[int]]:
+        """
+
+        :return typing.Dict[int, typing.Tuple[int]]: bot id to (head index,)
+         or (head index, tail index)
+        """
+        return self.__working_nodes_by_bot
+
+    def index(
+            self, x: typing.Union[int, float], y: typing.Union[int, float]
+    ) -> int:
+        """
+        :returns: Node index of the point (x, y).
+        """
+        return self.__lattice.index(x=x, y=y)
+
+    def point(self, index: int) -> typing.Tuple[int, int]:
+        """
+        :returns: The point (x, y) of a node index.
+        """
+        return self.__lattice.point(index)
+
+    def add_points(self, points: np.ndarray,
+                   bot_ids: np.ndarray = None) -> None:
+        """
+        Places bots on the lattice.
+
+        :param ndarray points: 4 x n array of head x, head y, tail x and tail
+            y of every bot.
+        :param ndarray bot_ids: Id of the bot of every column, the column
+            itself if None.
+        """
+        occupied, layer = self.__occupied, self.__bot_ids
+        index = self.index
+        if bot_ids is None: bot_ids = range(points[0].size)
+
+        item = points.item
+        for column, bot_id in enumerate(np.asarray(bot_ids).tolist()):
+            head = index(x=item((0, column)), y=item((1, column)))
+            tail = index(x=item((2, column)), y=item((3, column)))
+            working_nodes = (head,) if head == tail else (head, tail)
+
+            occupied[list(working_nodes)] = 1
+            layer[list(working_nodes)] = bot_id
+            self.__working_nodes_by_bot[bot_id] = working_nodes
+
+        self.__check_working_nodes()
+
+    def retarget(self, bot_id: int) -> 'NodeManagerLattice':
+        """
+        Points the manager at another bot.
+
+        :param int bot_id: Id of the bot whose working nodes are used by the
+            subsequent calls.
+        :returns: The same manager, now working on behalf of bot_id.
+        """
+        if bot_id not in self.__working_nodes_by_bot:
+            raise ValueError("Bot does not appear to be on any existing node")
+        self.__working_nodes = self.__working_nodes_by_bot[bot_id]
+        self.__bot_id = bot_id
+        return self
+
+    def relocate(self, points: np.ndarray,
+                 bot_ids: np.ndarray = None) -> None:
+        """
+        Moves every bot to new head and tail positions in one go, for engines
+        that advance the swarm outside of the node manager.
+
+        :param ndarray points: 4 x n array of head x, head y, tail x and tail
+            y of every bot.
+        :param ndarray bot_ids: Id of the bot of every column, the column
+            itself if None.
+        """
+        for working_nodes in self.__working_nodes_by_bot.values():
+            for index in working_nodes:
+                self.__vacate(index)
+
+        self.__working_nodes_by_bot.clear()
+        self.add_points(points=points, bot_ids=bot_ids)
+
+        if self.__bot_id in self.__working_nodes_by_bot:
+            self.__working_nodes = self.__working_nodes_by_bot[self.__bot_id]
+
+    def wall_points(self) -> np.ndarray:
+        """
+        :returns: n x 2 array of the points of all walls, the padding of a
+            dense lattice included.
+        """
+        walls = self.__lattice.indices('wall').tolist()
+        return np.array([self.point(i) for i in walls],
+                        dtype=np.int64).reshape(-1, 2)
+
+    def check_working_nodes(self) -> None:
+        """
+        Verifies the bot to working node table against the bot id layer.
+
+        :raises ValueError: If the table and the layers disagree.
+        """
+        lattice = self.__lattice
+        occupied = lattice.indices('occupied')
+
+        if not np.array_equal(occupied, lattice.indices('bot_ids')):
+            raise ValueError("Occupancy and bot id layers disagree")
+
+        expected = {}
+        for index, bot_id in zip(occupied.tolist(),
+                                 self.__bot_ids[occupied].tolist()):
+            expected.setdefault(bot_id, set()).add(index)
+
+        table = {k: set(v) for k, v in self.__working_nodes_by_bot.items()}
+        if table != expected:
+            raise ValueError(f"Working node table holds {table}, layers hold "
+                             f"{expected}")
+
+    def curve_order(self) -> typing.List[int]:
+        """
+        :returns: Bot ids sorted along the Morton curve of their heads.
+        """
+        bot_ids = list(self.__working_nodes_by_bot)
+        heads = [self.point(self.__working_nodes_by_bot[i][0])
+                 for i in bot_ids]
+        x, y = np.array(heads, dtype=np.int64).reshape(-1, 2).T
+        keys = get_morton_keys_ver_0(x=x, y=y)
+        return [bot_ids[i] for i in np.argsort(keys, kind='stable').tolist()]
+
+    def is_occupied(
+            self, x: typing.Union[int, float], y: typing.Union[int, float]
+    ) -> bool:
+        index = self.index(x=x, y=y)
+        return bool(self.__occupied[index] | self.__wall[index])
+
+    def move_to(self, port: int, ) -> bool:
+        working_nodes = self.__working_nodes
+        if len(working_nodes) == 1:
+            current_index = working_nodes[0]
+            target_index = current_index + self.__offsets.item(port)
+
+            occupied = self.__occupied
+            if occupied[target_index] or self.__wall[target_index]:
+                return False
+
+            occupied[target_index] = 1
+            self.__bot_ids[target_index] = self.__bot_id
+            self.__set_working_nodes((target_index, current_index))
+            return True
+        raise ValueError("You are trying to move the head while bot is "
+                         "expanded, compress this bot first")
+
+    def propose(self, port: int) -> int:
+        """
+        Evaluates a move of the contracted bot through port without writing
+        to the layers. Only the target node is checked, the ring around the
+        bot as if expanded onto the target is read.
+
+        :param int port: direction of the move.
+        :returns: neighborhood mask of the bot expanded onto the target, see
+            neighborhood_mask, or -1 if the target is occupied or a wall or
+            the bot is expanded.
+        """
+        working_nodes = self.__working_nodes
+        if len(working_nodes) != 1:
+            return -1
+
+        current_index = working_nodes[0]
+        target_index = current_index + self.__offsets.item(port)
+        if self.__occupied[target_index] or self.__wall[target_index]:
+            return -1
+
+        return self.__ring_mask(target_index, current_index, port)
+
+    def commit(self, port: int) -> None:
+        """
+        Moves the contracted bot through port in one go, the write of an
+        accepted proposal. Same as move_to followed by contract_forward.
+
+        :param int port: direction of the move.
+        """
+        working_nodes = self.__working_nodes
+        if len(working_nodes) != 1:
+            raise ValueError("You are trying to move the head while bot is "
+                             "expanded, compress this bot first")
+
+        current_index = working_nodes[0]
+        target_index = current_index + self.__offsets.item(port)
+        if self.__occupied[target_index] or self.__wall[target_index]:
+            raise ValueError("The target of the move is not free")
+
+        self.__occupied[target_index] = 1
+        self.__bot_ids[target_index] = self.__bot_id
+        self.__vacate(current_index)
+        self.__set_working_nodes((target_index,))
+
+    def contract_forward(self) -> bool:
+        working_nodes = self.__working_nodes
+        if len(working_nodes) == 1:
+            return False
+        self.__vacate(working_nodes[1])
+        self.__set_working_nodes((working_nodes[0],))
+        return True
+
+    def contract_backward(self) -> bool:
+        working_nodes = self.__working_nodes
+        if len(working_nodes) == 1:
+            return False
+        self.__vacate(working_nodes[0])
+        self.__set_working_nodes((working_nodes[1],))
+        return True
+
+    def open_ports(self) -> typing.Union[list, typing.List[typing.Set[int]]]:
+        working_nodes = self.__working_nodes
+        occupied, wall = self.__occupied, self.__wall
+
+        head_tail_empty_ports = list()
+        for index in working_nodes:
+            neighbors = index + self.__offsets
+            empty = (occupied[neighbors] | wall[neighbors]) == 0
+            head_tail_empty_ports.append(set(np.flatnonzero(empty)))
+
+        # contracted bots have no tail ports
+        if len(working_nodes) == 1:
+            head_tail_empty_ports.append(set())
+
+        return head_tail_empty_ports
+
+    def current_position(self) -> np.ndarray:
+        working_nodes = self.__working_nodes
+        head = self.point(working_nodes[0])
+        tail = self.point(working_nodes[-1])
+        return np.array([head, tail])
+
+    def get_occupied_neighbors(self) -> np.ndarray:
+        working_nodes = self.__working_nodes
+
+        if len(working_nodes) == 1:
+            neighbors_set = self.get_occupied_neighbors_of(working_nodes[0])
+            return np.array([neighbors_set, set()])
+
+        head_index, tail_index = working_nodes
+        head_neighbors_set = self.get_occupied_neighbors_of(head_index)
+        tail_neighbors_set = self.get_occupied_neighbors_of(tail_index)
+        head_neighbors_set.discard(tail_index)
+        tail_neighbors_set.discard(head_index)
+        return np.array([head_neighbors_set, tail_neighbors_set])
+
+    def get_occupied_neighbors_of(
+            self, node_index: int) -> typing.Union[set, typing.Set[int]]:
+        neighbors = node_index + self.__offsets
+        return set(neighbors[self.__occupied[neighbors] == 1])
+
+    def neighborhood_mask(self) -> int:
+        """
+        Occupancy of the eight nodes around the expanded bot, bit i is set
+        when node i of NEIGHBORHOOD_RING holds a bot. Walls count as empty.
+
+        :returns: bitmask in [0, 256)
+        """
+        working_nodes = self.__working_nodes
+        if len(working_nodes) != 2:
+            raise ValueError("Only an expanded bot has a neighborhood mask")
+
+        head_index, tail_index = working_nodes
+        port = self.__offsets.tolist().index(head_index - tail_index)
+        return self.__ring_mask(head_index, tail_index, port)
+
+    def add_wall(self, point: tuple) -> None:
+        """
+        Adds given points as walls in the wall layer.
+
+        :param tuple point: A tuple with x and y co-ordinates
+        :returns: nothing
+        """
+        wall_x, wall_y = point
+        index = self.index(x=wall_x, y=wall_y)
+
+        if self.__occupied[index]:
+            raise Exception(f"Unable to place wall because point "
+                            f"({wall_x}, {wall_y}) is occupied.")
+        if self.__wall[index]:
+            raise Exception("Node is already a wall type.")
+
+        self.__wall[index] = 1
+
+    def ping_for_wall(self, port: uint8, depth: uint8) -> uint8:
+        """
+        Sends a ping in a specified directions that travels across head
+        objects in the same direction for a limited distance.
+
+        :param uint8 port: Specified direction to use
+        :param uint8 depth: Number of nodes to travel before signal dies.
+        :returns: distance to the wall, -1 if a bot is hit first or the signal
+            dies
+        """
+        occupied, wall = self.__occupied, self.__wall
+        offset = self.__offsets.item(port)
+
+        index = self.__working_nodes[0]
+        for k in range(depth):
+            index += offset
+
+            if wall[index]:
+                return k + 1
+
+            if occupied[index]:
+                return -1
+
+        return -1
+
+    def __ring_mask(self, head_index: int, tail_index: int, port: int) -> int:
+        offsets, occupied = self.__offsets, self.__occupied
+
+        mask = 0
+        for bit, (from_head, offset) in enumerate(NEIGHBORHOOD_RING):
+            index = head_index if from_head else tail_index
+            if occupied[index + offsets.item((port + offset) % 6)]:
+                mask |= 1 << bit
+        return mask
+
+    def __vacate(self, index: int) -> None:
+        self.__occupied[index] = 0
+        self.__bot_ids[index] = -1
+
+    def __set_working_nodes(self, working_nodes: typing.Tuple[int]) -> None:
+        self.__working_nodes = working_nodes
+        self.__working_nodes_by_bot[self.__bot_id] = working_nodes
+        self.__check_working_nodes()
+
+    def __check_working_nodes(self) -> None:
+        if self.__validate:
+            self.check_working_nodes()
@@ -3,7 +3,9 @@
 """ elements/node/manager.py
 """
 
+from amoebot.elements.node.allocator import NodeAllocator, GROWTH_FACTOR
 from amoebot.elements.node.core import Node
+from amoebot.elements.node.store import NodeStore, COORDINATE_DTYPE
 from amoebot.elements.manager import Manager
 from amoebot.elements.node.manager_utils import *
 
@@ -14,6 +16,12 @@ import numpy as np
 import typing
 from collections import defaultdict
 
+# nodes kept around particles by a compaction, in neighbor steps
+HALO = 1
+
+# empty to occupied node ratio past which the node array is compacted
+COMPACTION_RATIO = 8.
+
 # @pedantic.pedantic_class
 class NodeManagerBitArray:
     # TODO: Write docstrings for all current methods
@@ -24,6 +32,13 @@ class NodeManagerBitArray:
         '__nodes',
         '__bot_id',
         '__working_nodes',
+        '__working_nodes_by_bot',
+        '__validate',
+        '__allocator',
+        '__halo',
+        '__compaction_ratio',
+        '__compaction_check',
+        'reclaimed',
         '__weakref__',
         '__pedantic_a42__'
     ]
@@ -32,71 +47,107 @@ class NodeManagerBitArray:
             self,
             bot_id: int = -1,
             points: np.ndarray = np.array([]),
-            nodes: np.ndarray = np.array([]),
+            nodes: NodeStore = None,
+            validate: bool = False,
+            growth_factor: float = GROWTH_FACTOR,
+            halo: int = HALO,
+            compaction_ratio: float = COMPACTION_RATIO,
+            coordinate_dtype: type = COORDINATE_DTYPE,
     ) -> None:
         """
-        The class is used to handle the node space as an numpy.ndarray.
+        The class is used to handle the node space as a struct-of-arrays
+        NodeStore.
 
         :param int bot_id:
         :param ndarray points:
-        :param ndarray nodes:
+        :param NodeStore nodes:
+        :param bool validate: When set, the bot to working node table is
+            checked against the node array after every change. Slow, meant for
+            tests.
+        :param float growth_factor: Factor the node array capacity grows by
+            whenever it runs out of empty columns.
+        :param int halo: Neighbor steps around particles whose empty nodes
+            survive a compaction.
+        :param float compaction_ratio: Empty to occupied node ratio past which
+            the node array is compacted after a contraction, None turns
+            automatic compaction off.
+        :param type coordinate_dtype: Signed integer type of the node
+            co-ordinates when a new store is created, int64 for configurations
+            beyond the int32 range.
         """
 
         self.nodes_by_point = nodes_by_point = {}
-        if nodes.size == 0:
-            self.nodes = np.zeros([NUMBER_OF_ATTRIBUTES, 1], dtype=np.int8)
+        self.working_nodes_by_bot = working_nodes_by_bot = {}
+        self.__validate = validate
+        self.__halo = halo
+        self.__compaction_ratio = compaction_ratio
+        self.__compaction_check = 0
+
+        # bytes freed by all compactions so far
+        self.reclaimed = 0
+
+        if nodes is None:
+            self.nodes = NodeStore(coordinate_dtype=coordinate_dtype)
 
         else:
             self.nodes = nodes
             # TODO: Create dictionary of nodes
             map_node_array_ver_0(nodes=nodes, nodes_by_point=nodes_by_point)
+            map_working_nodes_ver_0(nodes=nodes,
+                                    working_nodes_by_bot=working_nodes_by_bot)
+
+        self.allocator = NodeAllocator(nodes=self.nodes,
+                                       growth_factor=growth_factor)
 
         if bot_id != -1:
-            self.working_nodes = get_working_node_index_ver_0(nodes=nodes,
-                                                              bot_id=bot_id)
-            # self.working_node = self.__internal_retrieve_working_node_index()
+            self.working_nodes = get_working_node_index_ver_1(
+                working_nodes_by_bot=working_nodes_by_bot, bot_id=bot_id)
         else:
             self.working_nodes = ()
 
         self.bot_id = bot_id
 
         if points.size > 0:
+            x1 = working_nodes_by_bot
             self.nodes = add_points_ver_0(nodes=self.nodes, points=points,
-                                          nodes_by_point=nodes_by_point)
+                                          nodes_by_point=nodes_by_point,
+                                          working_nodes_by_bot=x1,
+                                          allocator=self.allocator,
+                                          reorder=True)
+            self.__check_working_nodes()
 
     @property
-    def nodes(self) -> np.ndarray:
+    def nodes(self) -> NodeStore:
         """
 
-        :return ndarray: returns numpy array of nodes organized attributes x
-         number
+        :return NodeStore: returns the struct-of-arrays store of nodes with
+         one column per attribute
         """
         return self.__nodes
 
     @nodes.setter
-    def nodes(self, value: np.ndarray) -> None:
+    def nodes(self, value: NodeStore) -> None:
         """
         Sets self.__nodes value
 
-        :param ndarray value:
+        :param NodeStore value:
         """
-        x = value.shape[0]
-        y = value.dtype.type
-        z = NUMPY_INT_LEVELS['ints']
-        if x != NUMBER_OF_ATTRIBUTES:
-            raise ValueError(f'Received {x}, expected {NUMBER_OF_ATTRIBUTES}')
-        elif y not in z:
-            raise TypeError(f"Received {y}, expected one of these {z}")
+        if not isinstance(value, NodeStore):
+            raise TypeError(f"Received {type(value)}, expected {NodeStore}")
         self.__nodes = value
 
     @nodes.deleter
     def nodes(self) -> None:
         """
-        Deletes current nodes by replacing array with an NUMBER_OF_ATTRIBUTES
-         by 1 numpy array.
+        Deletes current nodes by replacing the store with a single empty
+        column.
 
         """
-        self.nodes = np.zeros((NUMBER_OF_ATTRIBUTES, 1), dtype=np.int8)
+        growth_factor = self.allocator.growth_factor
+        coordinate_dtype = self.nodes.coordinate_dtype
+        self.nodes = NodeStore(coordinate_dtype=coordinate_dtype)
+        self.allocator = NodeAllocator(nodes=self.nodes,
+                                       growth_factor=growth_factor)
 
     @property
     def nodes_by_point(self) -> typing.Dict[int, typing.Dict[int, int]]:
@@ -122,6 +173,41 @@ class NodeManagerBitArray:
         """
         self.nodes_by_point = {}
 
+    @property
+    def working_nodes_by_bot(self) -> typing.Dict[int, typing.Tuple[int]]:
+        """
+
+        :return typing.Dict[int, typing.Tuple[int]]: bot id to (head index,)
+         or (head index, tail index)
+        """
+        return self.__working_nodes_by_bot
+
+    @working_nodes_by_bot.setter
+    def working_nodes_by_bot(
+            self, value: typing.Dict[int, typing.Tuple[int]]) -> None:
+        """
+
+        :param typing.Dict[int, typing.Tuple[int]] value:
+        """
+        self.__working_nodes_by_bot = value
+
+    @property
+    def allocator(self) -> NodeAllocator:
+        """
+
+        :return NodeAllocator: free-list allocator for the node array columns,
+         its counters track allocations and resizes
+        """
+        return self.__allocator
+
+    @allocator.setter
+    def allocator(self, value: NodeAllocator) -> None:
+        """
+
+        :param NodeAllocator value:
+        """
+        self.__allocator = value
+
     @property
     def bot_id(self) -> int:
         return self.__bot_id
@@ -155,9 +241,124 @@ class NodeManagerBitArray:
     def working_nodes(self) -> None:
         self.working_nodes = (-1,)
 
+    def retarget(self, bot_id: int) -> 'NodeManagerBitArray':
+        """
+        Points the manager at another bot without rebuilding the node array or
+        the point dictionary, so that one manager can be shared across every
+        agent of a simulation.
+
+        :param int bot_id: Id of the bot whose working nodes are used by the
+            subsequent calls.
+        :returns: The same manager, now working on behalf of bot_id.
+        """
+        self.working_nodes = get_working_node_index_ver_1(
+            working_nodes_by_bot=self.working_nodes_by_bot, bot_id=bot_id)
+        self.bot_id = bot_id
+        return self
+
+    def check_working_nodes(self) -> None:
+        """
+        Verifies the bot to working node table against the node array.
+
+        :raises ValueError: If the table and the node array disagree.
+        """
+        x1, x2 = self.nodes, self.working_nodes_by_bot
+        check_working_nodes_ver_0(nodes=x1, working_nodes_by_bot=x2)
+
+    def compact(self) -> int:
+        """
+        Drops the empty nodes outside of the halo around the particles and
+        shrinks the node array to the nodes that are left. The point
+        dictionary and the bot to working node table are remapped, so
+        node indices handed out before the call are no longer valid.
+
+        :returns: Number of bytes reclaimed.
+        """
+        nodes = self.nodes
+        before = nodes.nbytes
+
+        x1, x2, x3 = self.working_nodes_by_bot, self.nodes_by_point, self.__halo
+        nodes, _ = compact_ver_0(nodes=nodes, working_nodes_by_bot=x1,
+                                 nodes_by_point=x2, halo=x3)
+        self.__rebuild(nodes=nodes)
+
+        reclaimed = before - nodes.nbytes
+        self.reclaimed += reclaimed
+        return reclaimed
+
+    def reorder(self) -> None:
+        """
+        Lays the node columns out along a Morton curve so that lattice
+        neighbors sit close in memory. The point dictionary and the bot to
+        working node table are remapped, so node indices handed out before the
+        call are no longer valid.
+        """
+        x1 = self.working_nodes_by_bot
+        nodes, _ = reorder_ver_0(nodes=self.nodes, working_nodes_by_bot=x1)
+        self.__rebuild(nodes=nodes)
+
+    def curve_order(self) -> typing.List[int]:
+        """
+        :returns: Bot ids sorted along the Morton curve of their heads.
+        """
+        bot_ids = list(self.working_nodes_by_bot)
+        heads = [self.working_nodes_by_bot[i][0] for i in bot_ids]
+        nodes = self.nodes
+        keys = get_morton_keys_ver_0(x=nodes.x[heads], y=nodes.y[heads])
+        return [bot_ids[i] for i in np.argsort(keys, kind='stable').tolist()]
+
+    def relocate(self, points: np.ndarray,
+                 bot_ids: np.ndarray = None) -> None:
+        """
+        Moves every bot to new head and tail positions in one go, for engines
+        that advance the swarm outside of the node manager.
+
+        :param ndarray points: 4 x n array of head x, head y, tail x and tail
+            y of every bot.
+        :param ndarray bot_ids: Id of the bot of every column, the column
+            itself if None.
+        """
+        nodes = self.nodes
+        for working_nodes in self.working_nodes_by_bot.values():
+            for index in working_nodes:
+                get_node_via_index_ver_0(nodes, index).vacate()
+
+        working_nodes_by_bot = self.working_nodes_by_bot
+        working_nodes_by_bot.clear()
+        if bot_ids is None: bot_ids = range(points[0].size)
+
+        item = points.item
+        for column, bot_id in enumerate(np.asarray(bot_ids).tolist()):
+            head_x, head_y = item((0, column)), item((1, column))
+            tail_x, tail_y = item((2, column)), item((3, column))
+
+            if head_x == tail_x and head_y == tail_y:
+                placements = ((head_x, head_y, 3),)
+            else:
+                placements = ((head_x, head_y, 1), (tail_x, tail_y, 2))
+
+            working_nodes = ()
+            for x, y, status in placements:
+                node = self.get_node(x=x, y=y)
+                node.occupy(bot_id=bot_id, status=status)
+                working_nodes += (node.index,)
+            working_nodes_by_bot[bot_id] = working_nodes
+
+        if self.bot_id in self.working_nodes_by_bot:
+            self.working_nodes = self.working_nodes_by_bot[self.bot_id]
+        self.__check_working_nodes()
+
+    def wall_points(self) -> np.ndarray:
+        """
+        :returns: n x 2 array of the points of all walls.
+        """
+        nodes = self.nodes
+        walls = np.where(nodes.get_enabled_type() == 2)[0]
+        return np.stack((nodes.x[walls], nodes.y[walls]), axis=1)
+
     def get_node(
             self, x: typing.Union[int, float], y: typing.Union[int, float],
-    ) -> np.ndarray:
+    ) -> Node:
         nodes_by_point = self.nodes_by_point
         f1 = check_points_existence_ver_0
         exists = f1(nodes_by_point=nodes_by_point, x=x, y=y)
@@ -166,15 +367,16 @@ class NodeManagerBitArray:
             index = f1(x=x, y=y, nodes_by_point=nodes_by_point)
         else:
             f1 = add_point_ver_1
-            x1, x2 = self.nodes, nodes_by_point
-            index, self.nodes = f1(x=x, y=y, nodes=x1, nodes_by_point=x2)
-        return self.nodes[0:, index:index + 1]
+            x1, x2, x3 = self.nodes, nodes_by_point, self.allocator
+            index, self.nodes = f1(x=x, y=y, nodes=x1, nodes_by_point=x2,
+                                   allocator=x3)
+        return get_node_via_index_ver_0(self.nodes, index, nodes_by_point)
 
     def is_occupied(
             self, x: typing.Union[int, float], y: typing.Union[int, float]
     ) -> bool:
         node = self.get_node(x=x, y=y)
-        return True if node[0] == 2 or node[3] else False 
+        return True if node.enabled_type == 2 or node.occupied else False 
 
     def move_to(self, port: int, ) -> bool:
         relative_x, relative_y = NODE_LAYOUT[LAYOUT][port]['relative_point']
@@ -182,8 +384,7 @@ class NodeManagerBitArray:
         if len(working_nodes) == 1:
             nodes = self.nodes
             current_node = get_node_via_index_ver_0(nodes, working_nodes[0])
-            current_x = current_node[(1,), (0,)].item()
-            current_y = current_node[(2,), (0,)].item()
+            current_x, current_y = current_node.x, current_node.y
             target_x, target_y = current_x + relative_x, current_y + relative_y
 
             if self.is_occupied(x=target_x, y=target_y):
@@ -191,17 +392,95 @@ class NodeManagerBitArray:
 
             target_node = self.get_node(x=target_x, y=target_y)
 
-            target_node[(3, 4), (0, 0)] = 1, current_node[(4,), (0,)]
-            target_node[(17,), (0,)] = 1
-            current_node[(17,), (0,)] = 2
-            x1, x2, x3 = target_x, target_y, self.nodes_by_point
-            head_index = get_node_index_ver_0(x=x1, y=x2, nodes_by_point=x3)
+            target_node.occupy(bot_id=current_node.bot_id, status=1)
+            current_node.bot_contraction_status = 2
+            head_index = target_node.index
             self.working_nodes = (head_index, working_nodes[0])
+            self.working_nodes_by_bot[self.bot_id] = self.working_nodes
+            self.__check_working_nodes()
             return True
         raise ValueError("You are trying to move the head while bot is "
                          "expanded, compress this bot first")
 
 
+    def propose(self, port: int) -> int:
+        """
+        Evaluates a move of the contracted bot through port without writing
+        to the node space. Only the target node is checked, the ring around
+        the bot as if expanded onto the target is read by point, so no node
+        is created.
+
+        :param int port: direction of the move.
+        :returns: neighborhood mask of the bot expanded onto the target, see
+            neighborhood_mask, or -1 if the target is occupied or a wall or
+            the bot is expanded.
+        """
+        working_nodes = self.working_nodes
+        if len(working_nodes) != 1:
+            return -1
+
+        nodes = self.nodes
+        nodes_by_point = self.nodes_by_point
+        index = working_nodes[0]
+        target_index = get_neighbor_index_ver_0(nodes=nodes, index=index,
+                                                port=port,
+                                                nodes_by_point=nodes_by_point)
+        if target_index != -1 and (nodes.get_occupied(target_index) or
+                                   nodes.get_enabled_type(target_index) == 2):
+            return -1
+
+        relative_x, relative_y = NODE_LAYOUT[LAYOUT][port]['relative_point']
+        target_x = nodes.x.item(index) + relative_x
+        target_y = nodes.y.item(index) + relative_y
+
+        mask = 0
+        for bit, (from_head, offset) in enumerate(NEIGHBORHOOD_RING):
+            x1 = (port + offset) % 6
+            if from_head:
+                x2, x3 = NODE_LAYOUT[LAYOUT][x1]['relative_point']
+                neighbor = get_node_index_ver_0(x=target_x + x2,
+                                                y=target_y + x3,
+                                                nodes_by_point=nodes_by_point)
+            else:
+                neighbor = get_neighbor_index_ver_0(
+                    nodes=nodes, index=index, port=x1,
+                    nodes_by_point=nodes_by_point)
+            if neighbor != -1 and nodes.get_occupied(neighbor):
+                mask |= 1 << bit
+        return mask
+
+    def commit(self, port: int) -> None:
+        """
+        Moves the contracted bot through port in one go, the write of an
+        accepted proposal. Same as move_to followed by contract_forward.
+
+        :param int port: direction of the move.
+        """
+        working_nodes = self.working_nodes
+        if len(working_nodes) != 1:
+            raise ValueError("You are trying to move the head while bot is "
+                             "expanded, compress this bot first")
+
+        relative_x, relative_y = NODE_LAYOUT[LAYOUT][port]['relative_point']
+        current_node = get_node_via_index_ver_0(self.nodes, working_nodes[0])
+        target_x = current_node.x + relative_x
+        target_y = current_node.y + relative_y
+
+        if self.is_occupied(x=target_x, y=target_y):
+            raise ValueError("The target of the move is not free")
+
+        target_node = self.get_node(x=target_x, y=target_y)
+
+        # the node array may have grown, look the current node up again
+        current_node = get_node_via_index_ver_0(self.nodes, working_nodes[0])
+        target_node.occupy(bot_id=current_node.bot_id, status=3)
+        current_node.vacate()
+
+        self.working_nodes = (target_node.index,)
+        self.working_nodes_by_bot[self.bot_id] = self.working_nodes
+        self.__check_working_nodes()
+        self.__check_compaction()
+
     def contract_forward(self) -> bool:
         working_nodes = self.working_nodes
         if len(working_nodes) == 1:
@@ -209,8 +488,11 @@ class NodeManagerBitArray:
         elif len(working_nodes) == 2:
             x1, x2, x3 = self.nodes, working_nodes[0], working_nodes[1]
             x4, x5 = "forward", contract_ver_0
-            x6 = x5(nodes=x1, head_node_index=x2, tail_node_index=x3, option=x4)
+            x6 = x5(nodes=x1, head_node_index=x2, tail_node_index=x3, option=x4,
+                    working_nodes_by_bot=self.working_nodes_by_bot)
             self.working_nodes = x6
+            self.__check_working_nodes()
+            self.__check_compaction()
             return True
         else:
             raise ValueError("Looks like there is in an issue with the number "
@@ -223,8 +505,11 @@ class NodeManagerBitArray:
         elif len(working_nodes) == 2:
             x1, x2, x3 = self.nodes, working_nodes[0], working_nodes[1]
             x4, x5 = "backward", contract_ver_0
-            x6 = x5(nodes=x1, head_node_index=x2, tail_node_index=x3, option=x4)
+            x6 = x5(nodes=x1, head_node_index=x2, tail_node_index=x3, option=x4,
+                    working_nodes_by_bot=self.working_nodes_by_bot)
             self.working_nodes = x6
+            self.__check_working_nodes()
+            self.__check_compaction()
             return True
         else:
             raise ValueError("Looks like there is in an issue with the number "
@@ -234,6 +519,7 @@ class NodeManagerBitArray:
         # Check compression
         working_nodes = self.working_nodes
         nodes = self.nodes
+        nodes_by_point = self.nodes_by_point
         is_occupied = self.is_occupied
         contracted = len(working_nodes) == 1
         head_tail_empty_ports = list()
@@ -242,7 +528,9 @@ class NodeManagerBitArray:
         if contracted:
 
             # grabs completely empty uncreated node positions
-            neighbors = self.nodes[NEIGHBOR_RANGE, self.working_nodes[0]]
+            neighbors = get_neighbors_ver_0(nodes=nodes,
+                                            index=working_nodes[0],
+                                            nodes_by_point=nodes_by_point)
             empty_ports = set(np.where(neighbors == -1)[0])
 
             # check whether or not existing nodes are empty
@@ -254,9 +542,13 @@ class NodeManagerBitArray:
             head_tail_empty_ports.append(set())
 
         else:
-            head_neighbors = self.nodes[NEIGHBOR_RANGE, self.working_nodes[0]]
+            head_neighbors = get_neighbors_ver_0(nodes=nodes,
+                                                 index=working_nodes[0],
+                                                 nodes_by_point=nodes_by_point)
             head_empty_ports = set(np.where(head_neighbors == -1)[0])
-            tail_neighbors = self.nodes[NEIGHBOR_RANGE, self.working_nodes[1]]
+            tail_neighbors = get_neighbors_ver_0(nodes=nodes,
+                                                 index=working_nodes[1],
+                                                 nodes_by_point=nodes_by_point)
             tail_empty_ports = set(np.where(tail_neighbors == -1)[0])
 
             for i in range(6):
@@ -275,18 +567,18 @@ class NodeManagerBitArray:
         nodes = self.nodes
 
         if len(working_nodes) == 1:
-            node = nodes[0:, working_nodes[0]]
+            index = working_nodes[0]
 
             return np.array(
-                [[node[1], node[2]], [node[1], node[2]]]
+                [[nodes.x[index], nodes.y[index]],
+                 [nodes.x[index], nodes.y[index]]]
             )
         elif len(working_nodes) == 2:
-            head_node = nodes[0:, working_nodes[0]]
-            tail_node = nodes[0:, working_nodes[1]]
+            head_index, tail_index = working_nodes
             return np.array(
                 [
-                    [head_node[1], head_node[2]],
-                    [tail_node[1], tail_node[2]]
+                    [nodes.x[head_index], nodes.y[head_index]],
+                    [nodes.x[tail_index], nodes.y[tail_index]]
                 ]
             )
 
@@ -300,7 +592,8 @@ class NodeManagerBitArray:
             neighbors_set, nodes = get_occupied_neighbors_ver_0(
                 working_node=working_nodes[0],
                 nodes=nodes,
-                nodes_by_point=nodes_by_points)
+                nodes_by_point=nodes_by_points,
+                allocator=self.allocator)
             self.nodes = nodes
             return np.array([neighbors_set, set()])
         else:
@@ -309,12 +602,14 @@ class NodeManagerBitArray:
                 nodes=nodes,
                 nodes_by_point=nodes_by_points,
                 do_not_count=working_nodes[1],
+                allocator=self.allocator,
             )
             tail_neighbors_set, nodes = get_occupied_neighbors_ver_0(
                 working_node=working_nodes[1],
                 nodes=nodes,
                 nodes_by_point=nodes_by_points,
                 do_not_count=working_nodes[0],
+                allocator=self.allocator,
             )
 
             self.nodes = nodes
@@ -326,10 +621,39 @@ class NodeManagerBitArray:
         neighbors_set, nodes = get_occupied_neighbors_ver_0(
             working_node=node_index,
             nodes=nodes,
-            nodes_by_point=nodes_by_point)
+            nodes_by_point=nodes_by_point,
+            allocator=self.allocator)
         self.nodes = nodes
         return neighbors_set
 
+    def neighborhood_mask(self) -> int:
+        """
+        Occupancy of the eight nodes around the expanded bot, bit i is set
+        when node i of NEIGHBORHOOD_RING holds a bot. Walls and nodes that were
+        never created count as empty, no node is created.
+
+        :returns: bitmask in [0, 256)
+        """
+        working_nodes = self.working_nodes
+        if len(working_nodes) != 2:
+            raise ValueError("Only an expanded bot has a neighborhood mask")
+
+        head_index, tail_index = working_nodes
+        nodes = self.nodes
+        nodes_by_point = self.nodes_by_point
+        neighbors = {x1: get_neighbors_ver_0(nodes=nodes, index=x1,
+                                             nodes_by_point=nodes_by_point)
+                     for x1 in working_nodes}
+        port = neighbors[tail_index].tolist().index(head_index)
+
+        mask = 0
+        for bit, (from_head, offset) in enumerate(NEIGHBORHOOD_RING):
+            x1 = head_index if from_head else tail_index
+            index = neighbors[x1].item((port + offset) % 6)
+            if index != -1 and nodes.get_occupied(index):
+                mask |= 1 << bit
+        return mask
+
     def add_wall(self, point: tuple) -> None:
         """
         Adds given points as walls (2) type objects in the node space.
@@ -344,9 +668,8 @@ class NodeManagerBitArray:
         # split points to separate x and y values
         wall_x, wall_y = point
 
-        # Using point (x, y) data, we pull the associated node data and
-        # creates node a node object from it.
-        node = Node(get_node(x=wall_x, y=wall_y))
+        # Using point (x, y) data, we pull a view of the associated node.
+        node = get_node(x=wall_x, y=wall_y)
 
         # if the node is occupied, we can't place a wall here, so we
         # through up an error stating this.
@@ -360,90 +683,48 @@ class NodeManagerBitArray:
     def ping_for_wall(self, port: uint8, depth: uint8) -> uint8:
         """
         Sends a ping in a specified directions that travels across head
-        objects in the same direction for a limited distance.
+        objects in the same direction for a limited distance. Nodes are only
+        read, one that was never created is empty, so no node is created.
 
         :param uint8 port: Specified direction to use
         :param uint8 depth: Number of nodes to travel before signal dies.
-        :returns: uint8 0 - false or 1 - true
+        :returns: distance to the wall, -1 if a bot is hit first or the signal
+            dies
         """
-        # localize necessary components
-        get_node = self.get_node  # TODO: rewrite method to utilize node class.
-        get_node_data = self.__get_node_data
-
-        # Grab the node associated with the head position
-        head = self.__get_working_nodes()[0]
-
-        # Grab directional points relative to origin.
+        nodes = self.nodes
+        nodes_by_point = self.nodes_by_point
         relative_x, relative_y = get_relative_points_direction(port)
 
-        # Initialize signals of readability
-        nothing = 0
-        wall = 1
-        signal = 2
-
-        # Flag to signal that a wall was found during search or a signal was
-        # felt.
-        found_something = nothing
+        # start from the head of the bot
+        index = self.working_nodes[0]
+        x, y = nodes.x.item(index), nodes.y.item(index)
 
-        # Used to travel backwards and update nodes if wall was found.
-        node_stack = []
-
-        # Walks through the specified number of nodes (depth) from origin in the
-        # direction specified (port).
-        k = 0
         for k in range(depth):
-            # Add current position to stack.
-            node_stack.append(head)
-
-            # Grab neighbor index associated with the port.
-            neighbor_index = head.get_neighbor_index(port=port)
+            x, y = x + relative_x, y + relative_y
+            index = get_node_index_ver_0(x=x, y=y,
+                                         nodes_by_point=nodes_by_point)
+            if index == -1:
+                continue
 
-            # Initialize signals of readability.
-            node_not_created = -1
-
-            # Check if the node at the neighbor index has been created.
-            if neighbor_index == node_not_created:
-                # Since the node has not been created, we create the node by
-                # using get_node.
-
-                # create the neighbor node x value
-                next_x = head.x + relative_x
-
-                # create the neighbor node y value
-                next_y = head.y + relative_y
-
-                # create node by using get_node with updated x and y values. We
-                # then covert the node data provided by get_node to create a
-                # Node object.
-                head = Node(node_data=get_node(x=next_x, y=next_y))
-            else:
-                # Since the neighbor has been created, we just grab the
-                # neighbor's node data and create a Node object.
-                head = Node(node_data=get_node_data(index=neighbor_index))
-
-            # print(f"{head.x}, {head.y}, {head.is_wall()}")
-
-            # Checks if current node is a wall.
-            if head.is_wall():
-                # Marks that we found a wall and breaks search.
+            if nodes.get_enabled_type(index) == 2:
                 return k + 1
 
-            if head.occupied: 
-               return -1
+            if nodes.get_occupied(index):
+                return -1
 
-        # ...
         return -1
 
     def __get_node_data(
-            self, index: UNSIGNED_INT) -> ndarray:
+            self, index: UNSIGNED_INT) -> Node:
         """
         Grabs all node data at a specified index.
 
         :param Union[uint8, uint16, uint32, uint64] index: Column in the node
-            ndarray where the node is found.
-        :returns: ndarray filled with node data.
+            store where the node is found.
+        :returns: Node view of the node data.
         """
-        return self.__nodes[0:, index:index + 1]
+        x1 = self.__nodes_by_point
+        return get_node_via_index_ver_0(self.__nodes, index, x1)
 
     def __get_working_nodes(self) -> List[Node]:
         """
@@ -458,7 +739,7 @@ class NodeManagerBitArray:
         indices = self.__get_working_nodes_indices()
 
         # Create array of Node objects and return it.
-        return [Node(node_data=get_node_data(index=i)) for i in indices]
+        return [get_node_data(index=i) for i in indices]
 
     def __get_working_nodes_indices(self) -> Tuple[UNSIGNED_INT, UNSIGNED_INT]:
         """
@@ -466,39 +747,54 @@ class NodeManagerBitArray:
 
         :returns: Pair of ints as a tuple.
         """
-        # localize necessary components
-        nodes = self.nodes
-        bot_id = self.bot_id
-
-        # Grab positions (indices) where the bot id appears in the bot id field
-        indices = where(nodes[4] == bot_id)[0]
-
-        # Check if no indices are returned because this means a bot with that
-        # particular id is not present in the environment
-        if indices.size == 0:
-            raise Exception("Bot does not appear to be on any existing node")
+        # Look the bot up in the bot to working node table, this raises if the
+        # bot is not present in the environment
+        indices = get_working_node_index_ver_1(
+            working_nodes_by_bot=self.working_nodes_by_bot, bot_id=self.bot_id)
 
         # If the bot is contracted only one index should be preset.
-        elif indices.size == 1:
+        if len(indices) == 1:
             return indices[0], indices[0]
 
-        # If the bot is expanded the number of nodes occupied should be two,
-        # therefore the number of indices should be two.
-        elif indices.size == 2:
-            # Grab the head/tail/contracted flag in the nodes at the indices
-            # given
-            head_or_tail_statuses = nodes[17][indices]
+        # If the bot is expanded the table already holds head and tail in
+        # order.
+        return indices[0], indices[1]
 
-            # Check if the first number in the head/tail array is head (1)
-            if head_or_tail_statuses[0] == 1:
-                # return head and tail in current order
-                return indices[0], indices[1]
+    def __rebuild(self, nodes: NodeStore) -> None:
+        """
+        Takes over a store whose columns were moved, refreshing everything
+        that depends on column indices.
+        """
+        self.nodes = nodes
+        self.nodes_by_point = nodes_by_point = {}
+        map_node_array_ver_0(nodes=nodes, nodes_by_point=nodes_by_point)
+        self.allocator.reset(nodes=nodes)
 
-            # Check failed, so the first index belongs to the tail.
-            # Return flip-flop version of indices.
-            return indices[1], indices[0]
+        if self.bot_id in self.working_nodes_by_bot:
+            self.working_nodes = self.working_nodes_by_bot[self.bot_id]
+        self.__check_working_nodes()
 
-        # If none of the previous conditions were hit, then the bot recorded to
-        # be spread across too many nodes.
-        else:
-            raise Exception("Bot is located on too many nodes")
+    def __check_compaction(self) -> None:
+        """
+        Compacts the node array once the empty to occupied node ratio passes
+        the compaction ratio. The ratio is only looked at after the node array
+        had to grow, which keeps the check amortized O(1).
+        """
+        resizes = self.allocator.resizes
+        if self.__compaction_ratio is None or \
+                resizes == self.__compaction_check:
+            return
+        self.__compaction_check = resizes
+
+        nodes = self.nodes
+        occupied = int(np.count_nonzero(nodes.get_occupied()))
+        empty = int(np.count_nonzero(nodes.get_enabled_type() == 1)) - occupied
+        if empty > self.__compaction_ratio * max(occupied, 1):
+            self.compact()
+
+    def __check_working_nodes(self) -> None:
+        """
+        Runs check_working_nodes when the manager was built with validate set.
+        """
+        if self.__validate:
+            self.check_working_nodes()
@@ -1,6 +1,9 @@
 import numpy as np
 import typing
 
+from amoebot.elements.node.core import Node
+from amoebot.elements.node.store import NodeStore, INDEX_DTYPE
+
 from numpy import iinfo, int8, int16, int32, int64, uint8, uint16, uint32, \
     uint64
 from typing import Union
@@ -14,8 +17,16 @@ NUMPY_INT_LEVELS = {
     'int32': (-2147483648, 2147483647)
 }
 
-NUMBER_OF_ATTRIBUTES = 18
 LAYOUT = 1
+
+# shift and mask of every step that spreads 32 bits over the even bits of 64
+MORTON_MASKS = (
+    (16, 0x0000FFFF0000FFFF),
+    (8, 0x00FF00FF00FF00FF),
+    (4, 0x0F0F0F0F0F0F0F0F),
+    (2, 0x3333333333333333),
+    (1, 0x5555555555555555),
+)
 NODE_LAYOUT = {
     0: {  # Horizontal Layout
         0: {'relative_point': (-2, 0), 'direction': 'w'},
@@ -36,18 +47,25 @@ NODE_LAYOUT = {
 
 }
 
-NEIGHBOR_RANGE = np.arange(5, 11, dtype=int)
-
 VERTICAL_LAYOUT = False
 
+# the eight nodes around an expanded bot whose head lies on port p of its
+# tail, in cyclic order, as (taken from the head, port offset from p); nodes
+# 0 and 4 neighbor both the head and the tail
+NEIGHBORHOOD_RING = (
+    (True, -2), (True, -1), (True, 0), (True, 1), (True, 2),
+    (False, 2), (False, 3), (False, 4),
+)
+
 
 def add_point_ver_0(
         x: typing.Union[int, float],
         y: typing.Union[int, float],
         bot_id: int,
         current_index: int,
-        nodes: np.ndarray,
+        nodes: NodeStore,
         nodes_by_point,
+        status: int = 3,
 ):
     """
     Used with initial array set up. add_points checks and reconfigures the size
@@ -59,15 +77,15 @@ def add_point_ver_0(
     :param current_index:
     :param nodes:
     :param nodes_by_point:
+    :param status: head (1), tail (2) or contracted (3) contraction status.
     :return:
     """
     if check_points_existence_ver_0(nodes_by_point=nodes_by_point, x=x, y=y):
         return current_index
 
     x1 = current_index
-    nodes[0:, x1:x1 + 1] = create_node_ver_0(x=x, y=y, bot_id=bot_id)
-    x1, x2, x3 = current_index, nodes_by_point, nodes
-    link_existing_nodes_ver_0(current_index=x1, nodes_by_point=x2, nodes=x3)
+    create_node_ver_0(nodes=nodes, index=x1, x=x, y=y, bot_id=bot_id)
+    nodes.set_contraction(x1, status)
     x2 = nodes_by_point
     insert_point_into_dict_ver_0(x=x, y=y, current_index=x1, nodes_by_point=x2)
     return current_index + 1
@@ -76,8 +94,9 @@ def add_point_ver_0(
 def add_point_ver_1(
         x: typing.Union[int, float],
         y: typing.Union[int, float],
-        nodes: np.ndarray,
+        nodes: NodeStore,
         nodes_by_point,
+        allocator=None,
 ):
     """
     add point without adding bot to the point, does not check points existence,
@@ -87,34 +106,48 @@ def add_point_ver_1(
     :param y:
     :param nodes:
     :param nodes_by_point:
+    :param allocator: NodeAllocator handing out the column, when given the
+        node array is not scanned for an empty column.
     :return:
     """
-    current_index = get_current_index_ver_0(nodes)
+    if allocator is not None:
+        current_index, nodes = allocator.allocate(nodes=nodes)
 
-    if current_index == -1:
-        nodes = increase_array_size_ver_0(size=nodes[0].size + 1, nodes=nodes)
+    else:
         current_index = get_current_index_ver_0(nodes)
 
+        if current_index == -1:
+            x1 = nodes.size + 1
+            nodes = increase_array_size_ver_0(size=x1, nodes=nodes)
+            current_index = get_current_index_ver_0(nodes)
+
     x1 = current_index
-    nodes[0:, x1:x1 + 1] = create_node_ver_1(x=x, y=y)
-    x1, x2, x3 = current_index, nodes_by_point, nodes
-    link_existing_nodes_ver_0(current_index=x1, nodes_by_point=x2, nodes=x3)
+    create_node_ver_1(nodes=nodes, index=x1, x=x, y=y)
     x2 = nodes_by_point
     insert_point_into_dict_ver_0(x=x, y=y, current_index=x1, nodes_by_point=x2)
     return current_index, nodes
 
 
-def add_points_ver_0(nodes: np.ndarray, points: np.ndarray,
+def add_points_ver_0(nodes: NodeStore, points: np.ndarray,
                      nodes_by_point: typing.Dict[
-                         int, typing.Dict[int, int]]) -> np.ndarray:
+                         int, typing.Dict[int, int]],
+                     working_nodes_by_bot: typing.Dict[
+                         int, typing.Tuple[int]] = None,
+                     allocator=None, reorder: bool = False) -> NodeStore:
     points_size = points[0].size
 
-    current_index = get_current_index_ver_0(nodes=nodes)
-    nodes_size = nodes[0].size
+    if allocator is not None:
+        # room for a head and a tail per bot, grown in one go
+        nodes = allocator.reserve(nodes=nodes, size=2 * points_size)
+        current_index = -1
 
-    if nodes_size - current_index < points_size:
-        size = current_index + 1 + points_size
-        nodes = increase_array_size_ver_0(size=size, nodes=nodes)
+    else:
+        current_index = get_current_index_ver_0(nodes=nodes)
+        nodes_size = nodes.size
+
+        if nodes_size - current_index < points_size:
+            size = current_index + 1 + points_size
+            nodes = increase_array_size_ver_0(size=size, nodes=nodes)
     # nodes_by_point = nodes_by_point
 
     item = points.item
@@ -123,37 +156,80 @@ def add_points_ver_0(nodes: np.ndarray, points: np.ndarray,
         tail_x, tail_y, bot_id = item((2, i)), item((3, i)), i
 
         if head_x == tail_x and head_y == tail_y:
-            current_index = add_point_ver_0(
-                x=head_x,
-                y=head_y,
-                bot_id=bot_id,
-                current_index=current_index,
-                nodes=nodes,
-                nodes_by_point=nodes_by_point
-            )
+            placements = ((head_x, head_y, 3),)
         else:
+            placements = ((head_x, head_y, 1), (tail_x, tail_y, 2))
+
+        for x, y, status in placements:
+            x1 = nodes_by_point
+            exists = check_points_existence_ver_0(nodes_by_point=x1, x=x, y=y)
+            if allocator is not None and not exists:
+                current_index, nodes = allocator.allocate(nodes=nodes)
+
             current_index = add_point_ver_0(
-                x=head_x,
-                y=head_y,
-                bot_id=bot_id,
-                current_index=current_index,
-                nodes=nodes,
-                nodes_by_point=nodes_by_point
-            )
-            current_index = add_point_ver_0(
-                x=tail_x,
-                y=tail_y,
+                x=x,
+                y=y,
                 bot_id=bot_id,
                 current_index=current_index,
                 nodes=nodes,
-                nodes_by_point=nodes_by_point
+                nodes_by_point=nodes_by_point,
+                status=status,
             )
 
+        if working_nodes_by_bot is not None:
+            x1 = nodes_by_point
+            head_index = get_node_index_ver_0(x=head_x, y=head_y,
+                                              nodes_by_point=x1)
+            tail_index = get_node_index_ver_0(x=tail_x, y=tail_y,
+                                              nodes_by_point=x1)
+            x2 = (head_index,) if head_index == tail_index else \
+                (head_index, tail_index)
+            working_nodes_by_bot[bot_id] = x2
+
+    # lay the columns out along the curve once every bot is placed
+    if reorder and working_nodes_by_bot is not None:
+        nodes, _ = reorder_ver_0(nodes=nodes,
+                                 working_nodes_by_bot=working_nodes_by_bot)
+        nodes_by_point.clear()
+        map_node_array_ver_0(nodes=nodes, nodes_by_point=nodes_by_point)
+        if allocator is not None:
+            allocator.reset(nodes=nodes)
+
     return nodes
 
 
-def check_for_null_space_ver_0(working_node, nodes):
-    neighbors = nodes[NEIGHBOR_RANGE, working_node]
+def check_working_nodes_ver_0(
+        nodes: NodeStore,
+        working_nodes_by_bot: typing.Dict[int, typing.Tuple[int]],
+) -> None:
+    """
+    Verifies the bot to working node table against the bot id and contraction
+    columns of the node store. This is a full scan and is meant for tests and
+    debugging only.
+
+    :param nodes:
+    :param working_nodes_by_bot:
+    :return:
+    """
+    active = np.where(nodes.get_enabled_type() != 0)[0]
+    bot_ids = nodes.bot_id[active]
+    bot_ids = set(bot_ids[bot_ids != -1].tolist())
+
+    if bot_ids != set(working_nodes_by_bot):
+        raise ValueError(f"Working node table holds bots "
+                         f"{sorted(working_nodes_by_bot)}, node array holds "
+                         f"bots {sorted(bot_ids)}")
+
+    for bot_id, working_nodes in working_nodes_by_bot.items():
+        expected = get_working_node_index_ver_0(nodes=nodes, bot_id=bot_id)
+        if tuple(working_nodes) != expected:
+            raise ValueError(f"Working node table has {working_nodes} for bot "
+                             f"{bot_id}, node array has {expected}")
+
+
+def check_for_null_space_ver_0(working_node, nodes, nodes_by_point):
+    neighbors = get_neighbors_ver_0(nodes=nodes, index=working_node,
+                                    nodes_by_point=nodes_by_point)
     null_spaces = np.where(neighbors == -1)[0]
 
     return null_spaces
@@ -170,50 +246,127 @@ def check_points_existence_ver_0(
     return False
 
 
-def contract_ver_0(nodes, head_node_index, tail_node_index, option):
+def compact_ver_0(
+        nodes: NodeStore,
+        working_nodes_by_bot: typing.Dict[int, typing.Tuple[int]],
+        nodes_by_point: typing.Dict[int, typing.Dict[int, int]],
+        halo: int = 1,
+) -> typing.Tuple[NodeStore, np.ndarray]:
+    """
+    Drops every empty node that is further than halo steps away from all
+    particles. Walls and occupied nodes are always kept, inactive columns are
+    always dropped. Dropped nodes are simply created again should a particle
+    come back.
+
+    :param nodes:
+    :param working_nodes_by_bot: Remapped in place.
+    :param nodes_by_point: Point dictionary of nodes, not remapped.
+    :param halo: Number of neighbor steps around particles that keeps its
+        nodes.
+    :return: The compacted store and the old to new index map, -1 for dropped
+        nodes.
+    """
+    enabled_type = nodes.get_enabled_type()
+    occupied = nodes.get_occupied() == 1
+    keep = (enabled_type == 2) | occupied
+
+    # breadth first over existing nodes, one ring of the halo per step
+    reached = occupied.copy()
+    frontier = np.where(occupied)[0]
+    for _ in range(halo):
+        x1 = nodes_by_point
+        neighbors = np.array([get_neighbors_ver_0(nodes=nodes, index=i,
+                                                  nodes_by_point=x1)
+                              for i in frontier.tolist()], dtype=INDEX_DTYPE)
+        neighbors = neighbors.ravel()
+        neighbors = np.unique(neighbors[neighbors != -1])
+        frontier = neighbors[~reached[neighbors]]
+        reached[frontier] = True
+    keep |= reached & (enabled_type != 0)
+
+    return permute_ver_0(nodes=nodes, working_nodes_by_bot=working_nodes_by_bot,
+                         order=np.where(keep)[0])
+
+
+def contract_ver_0(nodes, head_node_index, tail_node_index, option,
+                   working_nodes_by_bot=None):
     head_node = get_node_via_index_ver_0(nodes, head_node_index)
     tail_node = get_node_via_index_ver_0(nodes, tail_node_index)
+    bot_id = head_node.bot_id
 
     if option == "forward":
-        tail_node[(3, 4, 17), (0, 0, 0)] = 0, -1, 0
-        head_node[17] = 3
-        return (head_node_index,)
+        tail_node.vacate()
+        head_node.bot_contraction_status = 3
+        working_nodes = (head_node_index,)
+
+    elif option == "backward":
+        head_node.vacate()
+        tail_node.bot_contraction_status = 3
+        working_nodes = (tail_node_index,)
 
-    if option == "backward":
-        head_node[(3, 4, 17), (0, 0, 0)] = 0, -1, 0
-        tail_node[17] = 3
-        return (tail_node_index,)
+    else:
+        return None
+
+    if working_nodes_by_bot is not None:
+        working_nodes_by_bot[bot_id] = working_nodes
+    return working_nodes
 
 
 def create_node_ver_0(
+        nodes: NodeStore,
+        index: int,
         x: typing.Union[int, float],
         y: typing.Union[int, float],
         bot_id: int,
 ):
-    new_node = np.zeros([NUMBER_OF_ATTRIBUTES, 1])
-    new_node[(0, 3), (0, 0)] += 1
-    new_node[(1, 2, 4, 17), (0, 0, 0, 0)] = x, y, bot_id, 3
-    new_node[5:11, 0] += -1
-    return new_node
+    create_node_ver_1(nodes=nodes, index=index, x=x, y=y)
+    nodes.set_occupied(index, 1)
+    nodes.set_contraction(index, 3)
+    nodes.bot_id[index] = bot_id
 
 
 def create_node_ver_1(
+        nodes: NodeStore,
+        index: int,
         x: typing.Union[int, float],
         y: typing.Union[int, float],
 ):
-    new_node = np.zeros([NUMBER_OF_ATTRIBUTES, 1])
-    new_node[(0,), (0,)] += 1
-    new_node[(1, 2,), (0, 0,)] = x, y
-    new_node[4:11, 0] += -1
-    return new_node
+    nodes.clear(index)
+    nodes.set_enabled_type(index, 1)
+    nodes.x[index], nodes.y[index] = x, y
 
 
-def get_current_index_ver_0(nodes: np.array):
-    open_spots = np.where(nodes[0] == 0)[0]
+def get_current_index_ver_0(nodes: NodeStore):
+    open_spots = np.where(nodes.get_enabled_type() == 0)[0]
 
     return -1 if open_spots.size == 0 else open_spots.item(0)
 
 
+def get_morton_keys_ver_0(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Z-order (Morton) keys of lattice points, points close on the lattice get
+    close keys. Co-ordinates are shifted to start at 0 first, so they may be
+    negative.
+
+    :param x:
+    :param y:
+    :return: uint64 key per point.
+    """
+    x = np.asarray(x, dtype=np.int64)
+    y = np.asarray(y, dtype=np.int64)
+    if x.size == 0:
+        return np.array([], dtype=np.uint64)
+
+    def spread(v):
+        # puts a zero bit between every bit of the lower 32 bits
+        v = (v - v.min()).astype(np.uint64) & np.uint64(0xFFFFFFFF)
+        for shift, mask in MORTON_MASKS:
+            v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+        return v
+
+    return spread(x) | (spread(y) << np.uint64(1))
+
+
 def get_node_index_ver_0(
         x: typing.Union[int, float],
         y: typing.Union[int, float],
@@ -226,22 +379,67 @@ def get_node_index_ver_0(
     return -1
 
 
-def get_node_via_index_ver_0(nodes, index):
-    return nodes[0:, index:index + 1]
+def get_neighbor_index_ver_0(
+        nodes: NodeStore,
+        index: int,
+        port: int,
+        nodes_by_point: typing.Dict[int, typing.Dict[int, int]],
+) -> int:
+    """
+    Index of the neighbor on port of a node. The store keeps no neighbor
+    links, so the neighbor is looked up by point.
+
+    :param nodes:
+    :param index:
+    :param port:
+    :param nodes_by_point:
+    :return: -1 when the neighbor was not created.
+    """
+    r_x, r_y = NODE_LAYOUT[LAYOUT][port]['relative_point']
+    x, y = nodes.x.item(index) + r_x, nodes.y.item(index) + r_y
+    return get_node_index_ver_0(x=x, y=y, nodes_by_point=nodes_by_point)
+
+
+def get_neighbors_ver_0(
+        nodes: NodeStore,
+        index: int,
+        nodes_by_point: typing.Dict[int, typing.Dict[int, int]],
+) -> np.ndarray:
+    """
+    Indices of the six neighbors of a node, in port order.
+
+    :param nodes:
+    :param index:
+    :param nodes_by_point:
+    :return: int array of length 6, -1 for neighbors that were not created.
+    """
+    x1, x2 = nodes.x.item(index), nodes.y.item(index)
+    neighbors = np.empty(6, dtype=INDEX_DTYPE)
+    for k, v in NODE_LAYOUT[LAYOUT].items():
+        r_x, r_y = v['relative_point']
+        neighbors[k] = get_node_index_ver_0(x=x1 + r_x, y=x2 + r_y,
+                                            nodes_by_point=nodes_by_point)
+    return neighbors
+
+
+def get_node_via_index_ver_0(nodes, index, nodes_by_point=None):
+    return Node(nodes=nodes, index=index, nodes_by_point=nodes_by_point)
 
 
 def get_occupied_neighbors_ver_0(
-        working_node, nodes, nodes_by_point, do_not_count=None):
+        working_node, nodes, nodes_by_point, do_not_count=None, allocator=None):
     null_spaces = check_for_null_space_ver_0(
-        working_node=working_node, nodes=nodes)
+        working_node=working_node, nodes=nodes, nodes_by_point=nodes_by_point)
     if null_spaces.size != 0:
         nodes = fill_null_space_ver_0(
             null_spaces=null_spaces,
             nodes=nodes,
             working_node=working_node,
-            nodes_by_point=nodes_by_point)
-    neighbors = nodes[NEIGHBOR_RANGE, working_node]
-    occupied = neighbors[np.where(nodes[3, neighbors] == 1)]
+            nodes_by_point=nodes_by_point,
+            allocator=allocator)
+    neighbors = get_neighbors_ver_0(nodes=nodes, index=working_node,
+                                    nodes_by_point=nodes_by_point)
+    occupied = neighbors[np.where(nodes.get_occupied(neighbors) == 1)]
     neighbors_set = set(occupied)
     if do_not_count is not None:
         neighbors_set.remove(do_not_count)
@@ -257,15 +455,15 @@ def get_relative_points_direction(port: uint8):
     return NODE_LAYOUT[LAYOUT][port]['relative_point']
 
 
-def get_working_node_index_ver_0(nodes: np.ndarray, bot_id: int) -> tuple:
-    index = np.where(nodes[4] == bot_id)[0]
+def get_working_node_index_ver_0(nodes: NodeStore, bot_id: int) -> tuple:
+    index = np.where(nodes.bot_id == bot_id)[0]
 
     if index.size == 0:
         raise ValueError("Bot does not appear to be on any existing node")
     elif index.size == 1:
         return (index.item(0),)
     elif index.size == 2:
-        head_tail_results = nodes[17][index]
+        head_tail_results = nodes.get_contraction(index)
         head_test = head_tail_results.item(0)
         tail_test = head_tail_results.item(1)
         if head_test == 1:
@@ -275,24 +473,55 @@ def get_working_node_index_ver_0(nodes: np.ndarray, bot_id: int) -> tuple:
         raise ValueError("Bot is located on too many nodes")
 
 
-def fill_null_space_ver_0(null_spaces, nodes, working_node, nodes_by_point):
-    node = nodes[0:, working_node]
+def get_working_node_index_ver_1(
+        working_nodes_by_bot: typing.Dict[int, typing.Tuple[int]],
+        bot_id: int,
+) -> tuple:
+    """
+    Constant time counterpart of get_working_node_index_ver_0 that reads the
+    bot to working node table instead of scanning row 4 of the node array.
+
+    :param working_nodes_by_bot:
+    :param bot_id:
+    :return: (head_index,) for contracted bots, (head_index, tail_index) for
+        expanded ones.
+    """
+    if bot_id not in working_nodes_by_bot:
+        raise ValueError("Bot does not appear to be on any existing node")
+    return working_nodes_by_bot[bot_id]
+
+
+def fill_null_space_ver_0(null_spaces, nodes, working_node, nodes_by_point,
+                          allocator=None):
+    x1, y1 = nodes.x.item(working_node), nodes.y.item(working_node)
+    if allocator is not None:
+        nodes = allocator.reserve(nodes=nodes, size=null_spaces.size)
     for i in range(null_spaces.size):
         r_x, r_y = NODE_LAYOUT[LAYOUT][null_spaces.item(i)]['relative_point']
-        x, y = node.item(1) + r_x, node.item(2) + r_y
-        _, nodes = add_point_ver_1(
-            x=x, y=y, nodes=nodes, nodes_by_point=nodes_by_point)
+        x, y = x1 + r_x, y1 + r_y
+        _, nodes = add_point_ver_1(x=x, y=y, nodes=nodes,
+                                   nodes_by_point=nodes_by_point,
+                                   allocator=allocator)
     return nodes
 
 
-def increase_array_size_ver_0(nodes: np.ndarray, size: int, ):
+def increase_array_size_ver_0(nodes: NodeStore, size: int, ):
     binary_str = len(np.binary_repr(size))
-    twod_size = [NUMBER_OF_ATTRIBUTES, 2 ** binary_str]
-    new_array = np.zeros(twod_size, dtype=np.int16)
-    new_array[4:11, 0:] -= 1
+    nodes.resize(size=2 ** binary_str)
+    return nodes
 
-    new_array[0:, 0:nodes[0].size] = nodes
-    return new_array
+
+def increase_array_size_ver_1(nodes: NodeStore, size: int, ):
+    """
+    Reallocates the node store to exactly size columns, the growth policy is
+    left to the caller.
+
+    :param nodes:
+    :param size:
+    :return:
+    """
+    nodes.resize(size=size)
+    return nodes
 
 
 def insert_point_into_dict_ver_0(
@@ -312,44 +541,100 @@ def is_neighbor_occupied(nodes, empty_ports, i, neighbors, is_occupied):
 
         # grab existing node
         neighbor_index = neighbors.item(i)
-        neighbor_node = nodes[
-                        0:, neighbor_index:neighbor_index + 1
-                        ]
-        neighbor_x = neighbor_node.item(1)
-        neighbor_y = neighbor_node.item(2)
+        neighbor_x = nodes.x.item(neighbor_index)
+        neighbor_y = nodes.y.item(neighbor_index)
 
         # check if neighbor node is occupided
         if not is_occupied(x=neighbor_x, y=neighbor_y):
             empty_ports.add(i)
 
 
-def link_existing_nodes_ver_0(
-        nodes: np.ndarray, current_index: int, nodes_by_point: dict
-):
-    current_x, current_y = nodes[(1, 2), (current_index, current_index)]
-    current_layout = NODE_LAYOUT[LAYOUT]
-    for k, v in current_layout.items():
-        relative_point = v['relative_point']
-        x1, x2 = current_x + relative_point[0], current_y + relative_point[1]
-        x3 = nodes_by_point
-        neighbor_index = get_node_index_ver_0(x=x1, y=x2, nodes_by_point=x3)
-        exists = neighbor_index != -1
-        if exists:
-            x1, x2 = NEIGHBOR_RANGE[k], NEIGHBOR_RANGE[(k + 3) % 6]
-            x3, x4 = current_index, neighbor_index
-            nodes[(x1, x2), (x3, x4)] = x4, x3
-
-
-def map_node_array_ver_0(nodes: np.ndarray, nodes_by_point: typing.Dict[
+def map_working_nodes_ver_0(
+        nodes: NodeStore,
+        working_nodes_by_bot: typing.Dict[int, typing.Tuple[int]],
+) -> None:
+    """
+    Builds the bot to working node table from the bot id and contraction
+    columns of an existing node store in a single pass.
+
+    :param nodes:
+    :param working_nodes_by_bot:
+    :return:
+    """
+    bot_ids = nodes.bot_id
+    contraction = nodes.get_contraction()
+    for current_index in np.where(nodes.get_enabled_type() != 0)[0].tolist():
+        bot_id = bot_ids.item(current_index)
+        if bot_id == -1:
+            continue
+
+        if bot_id not in working_nodes_by_bot:
+            working_nodes_by_bot[bot_id] = (current_index,)
+        elif contraction.item(current_index) == 1:
+            working_nodes_by_bot[bot_id] += (current_index,)
+            working_nodes_by_bot[bot_id] = working_nodes_by_bot[bot_id][::-1]
+        else:
+            working_nodes_by_bot[bot_id] += (current_index,)
+
+
+def map_node_array_ver_0(nodes: NodeStore, nodes_by_point: typing.Dict[
     int, typing.Dict[int, int]]) -> None:
-    number_of_nodes = get_current_index_ver_0(nodes=nodes)
-    if number_of_nodes == -1:
-        number_of_nodes = nodes[0].size
+    active = np.where(nodes.get_enabled_type() != 0)[0].tolist()
 
-    item = nodes.item
-    for current_index in range(number_of_nodes):
+    x_item, y_item = nodes.x.item, nodes.y.item
+    for current_index in active:
         x1, x2 = current_index, nodes_by_point
-        x = item((1, x1))
-        y = item((2, x1))
+        x = x_item(x1)
+        y = y_item(x1)
         x3 = insert_point_into_dict_ver_0
         x3(x=x, y=y, nodes_by_point=x2, current_index=x1)
+
+
+def permute_ver_0(
+        nodes: NodeStore,
+        working_nodes_by_bot: typing.Dict[int, typing.Tuple[int]],
+        order: np.ndarray,
+) -> typing.Tuple[NodeStore, np.ndarray]:
+    """
+    Rebuilds the store with column order[i] moved to column i. Columns left
+    out of order are dropped.
+
+    :param nodes:
+    :param working_nodes_by_bot: Remapped in place.
+    :param order: Old indices of the columns that are kept, in their new
+        order.
+    :return: The new store and the old to new index map, -1 for dropped
+        columns.
+    """
+    mapping = np.full(nodes.size, -1, dtype=INDEX_DTYPE)
+    mapping[order] = np.arange(order.size)
+    permuted = nodes.take(order)
+
+    for bot_id, working_nodes in working_nodes_by_bot.items():
+        working_nodes_by_bot[bot_id] = tuple(mapping.item(i)
+                                             for i in working_nodes)
+
+    return permuted, mapping
+
+
+def reorder_ver_0(
+        nodes: NodeStore,
+        working_nodes_by_bot: typing.Dict[int, typing.Tuple[int]],
+) -> typing.Tuple[NodeStore, np.ndarray]:
+    """
+    Sorts the active columns along the Morton curve of their points, so that
+    lattice neighbors tend to share cache lines. Inactive columns go to the
+    end and the capacity is unchanged.
+
+    :param nodes:
+    :param working_nodes_by_bot: Remapped in place.
+    :return: The reordered store and the old to new index map.
+    """
+    enabled_type = nodes.get_enabled_type()
+    active = np.where(enabled_type != 0)[0]
+    inactive = np.where(enabled_type == 0)[0]
+
+    keys = get_morton_keys_ver_0(x=nodes.x[active], y=nodes.y[active])
+    order = np.concatenate((active[np.argsort(keys, kind='stable')], inactive))
+    return permute_ver_0(nodes=nodes, working_nodes_by_bot=working_nodes_by_bot,
+                         order=order)
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+
+""" elements/node/store.py
+"""
+
+import json
+import numpy as np
+import typing
+
+from pathlib import Path
+
+COORDINATE_DTYPE = np.int32
+INDEX_DTYPE = np.int32
+BOT_ID_DTYPE = np.int32
+
+# layout of the flags byte: enabled type in bits 0-1 (inactive (0), node (1),
+# wall (2)), occupied in bit 2 and bot contraction status in bits 3-4 (none
+# (0), head (1), tail (2), contracted (3)).
+TYPE_MASK = 0b00011
+OCCUPIED_SHIFT = 2
+OCCUPIED_MASK = 0b00100
+CONTRACTION_SHIFT = 3
+CONTRACTION_MASK = 0b11000
+
+INDEX = typing.Union[int, np.ndarray, slice]
+
+# value of every column in an empty node
+EMPTY = {'x': 0, 'y': 0, 'flags': 0, 'bot_id': -1, 'signals': 0}
+
+# layout file written next to the column files of a MemmapNodeStore
+LAYOUT_FILE = 'nodes.json'
+
+
+class NodeStore:
+    __slots__ = [
+        'x',
+        'y',
+        'flags',
+        'bot_id',
+        'signals',
+        '__weakref__',
+    ]
+
+    def __init__(self, size: int = 1, coordinate_dtype: type = COORDINATE_DTYPE):
+        """
+        Struct-of-arrays storage for the node space. Every attribute lives in
+        its own contiguous, typed column indexed by node index:
+
+        x, y: int32 (or int64, see coordinate_dtype) lattice co-ordinates.
+        flags: uint8 enabled type, occupied and contraction status.
+        bot_id: int32 id of the occupying bot, -1 when empty.
+        signals: uint8 with the signal of port k in bit k.
+
+        Neighbor links are not stored, a neighbor is found by looking its
+        point up in the point dictionary of the node manager.
+
+        :param int size: Number of node columns to allocate.
+        :param type coordinate_dtype: Signed integer type of x and y, chosen
+            once per configuration with utils.limits.coordinate_dtype.
+        """
+        self.x = np.zeros(size, dtype=coordinate_dtype)
+        self.y = np.zeros(size, dtype=coordinate_dtype)
+        self.flags = np.zeros(size, dtype=np.uint8)
+        self.bot_id = np.full(size, -1, dtype=BOT_ID_DTYPE)
+        self.signals = np.zeros(size, dtype=np.uint8)
+
+    @property
+    def size(self) -> int:
+        """
+        :returns: Number of allocated node columns, used or not.
+        """
+        return self.x.size
+
+    @property
+    def coordinate_dtype(self) -> type:
+        """
+        :returns: Type of the x and y columns.
+        """
+        return self.x.dtype.type
+
+    @property
+    def nbytes(self) -> int:
+        """
+        :returns: Bytes held by all columns.
+        """
+        return sum(getattr(self, k).nbytes for k in self.columns())
+
+    @classmethod
+    def columns(cls) -> typing.Tuple[str]:
+        """
+        :returns: Names of the column attributes.
+        """
+        return tuple(k for k in NodeStore.__slots__ if k != '__weakref__')
+
+    @staticmethod
+    def bytes_per_node() -> int:
+        """
+        :returns: Bytes one node takes across all columns, the same for every
+            kind of store.
+        """
+        return NodeStore(size=1).nbytes
+
+    def copy(self) -> 'NodeStore':
+        """
+        :returns: A deep copy of the store.
+        """
+        new_store = NodeStore(size=0)
+        for k in self.columns():
+            setattr(new_store, k, getattr(self, k).copy())
+        return new_store
+
+    def take(self, index: INDEX) -> 'NodeStore':
+        """
+        Copies the selected columns into a new store, in the given order.
+
+        :param index: Array of indices or slice.
+        :returns: A new store holding only the selected nodes.
+        """
+        new_store = NodeStore(size=0)
+        for k in self.columns():
+            setattr(new_store, k, getattr(self, k)[..., index].copy())
+        return new_store
+
+    def resize(self, size: int) -> None:
+        """
+        Reallocates every column to size nodes, new columns are empty.
+
+        :param int size: New number of node columns, must not be smaller than
+            the current one.
+        """
+        old_size = self.size
+        if size < old_size:
+            raise ValueError(f"Can not shrink node store from {old_size} to "
+                             f"{size} columns")
+
+        new_store = NodeStore(size=size,
+                              coordinate_dtype=self.coordinate_dtype)
+        for k in self.columns():
+            getattr(new_store, k)[..., 0:old_size] = getattr(self, k)
+            setattr(self, k, getattr(new_store, k))
+
+    def clear(self, index: INDEX) -> None:
+        """
+        Resets nodes to the empty, inactive state.
+
+        :param index: Node index, array of indices or slice.
+        """
+        self.x[index] = 0
+        self.y[index] = 0
+        self.flags[index] = 0
+        self.bot_id[index] = -1
+        self.signals[index] = 0
+
+    def get_enabled_type(self, index: INDEX = slice(None)):
+        """
+        :param index: Node index, array of indices or slice, the whole column
+            by default.
+        :returns: Inactive (0), node (1) or wall (2).
+        """
+        return self.flags[index] & TYPE_MASK
+
+    def set_enabled_type(self, index: INDEX, value: int) -> None:
+        """
+        :param index: Node index, array of indices or slice.
+        :param int value: Inactive (0), node (1) or wall (2).
+        """
+        self.flags[index] = (self.flags[index] & (0xFF ^ TYPE_MASK)) | value
+
+    def get_occupied(self, index: INDEX = slice(None)):
+        """
+        :param index: Node index, array of indices or slice, the whole column
+            by default.
+        :returns: 1 if a bot sits on the node, else 0.
+        """
+        return (self.flags[index] & OCCUPIED_MASK) >> OCCUPIED_SHIFT
+
+    def set_occupied(self, index: INDEX, value: int) -> None:
+        """
+        :param index: Node index, array of indices or slice.
+        :param int value: 1 if a bot sits on the node, else 0.
+        """
+        self.flags[index] = (self.flags[index] & (0xFF ^ OCCUPIED_MASK)) | \
+            (value << OCCUPIED_SHIFT)
+
+    def get_contraction(self, index: INDEX = slice(None)):
+        """
+        :param index: Node index, array of indices or slice, the whole column
+            by default.
+        :returns: None (0), head (1), tail (2) or contracted (3).
+        """
+        return (self.flags[index] & CONTRACTION_MASK) >> CONTRACTION_SHIFT
+
+    def set_contraction(self, index: INDEX, value: int) -> None:
+        """
+        :param index: Node index, array of indices or slice.
+        :param int value: None (0), head (1), tail (2) or contracted (3).
+        """
+        self.flags[index] = (self.flags[index] & (0xFF ^ CONTRACTION_MASK)) | \
+            (value << CONTRACTION_SHIFT)
+
+    def get_signal(self, index: INDEX, port: int):
+        """
+        :param index: Node index, array of indices or slice.
+        :param int port: Direction of the signal.
+        :returns: false (0) or true (1)
+        """
+        return (self.signals[index] >> port) & 1
+
+    def set_signal(self, index: INDEX, port: int, value: int) -> None:
+        """
+        :param index: Node index, array of indices or slice.
+        :param int port: Direction of the signal.
+        :param int value: false (0) or true (1)
+        """
+        self.signals[index] = (self.signals[index] & (0xFF ^ (1 << port))) | \
+            (value << port)
+
+
+class MemmapNodeStore(NodeStore):
+    __slots__ = [
+        'directory',
+    ]
+
+    def __init__(self, directory: typing.Union[str, Path], size: int = 1,
+                 coordinate_dtype: type = COORDINATE_DTYPE):
+        """
+        NodeStore whose columns are numpy.memmap files, one per column, in
+        directory, so the node space may outgrow physical memory and outlive
+        the process. Growing the store only extends the files. Existing files
+        in directory are overwritten, use open to continue with them.
+
+        :param directory: Directory for the column files, created if needed.
+        :param int size: Number of node columns to allocate.
+        :param type coordinate_dtype: Signed integer type of x and y.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self.__map(size=size, mode='w+', coordinate_dtype=coordinate_dtype)
+        self.__fill(start=0)
+        self.flush()
+
+    @classmethod
+    def open(cls, directory: typing.Union[str, Path]) -> 'MemmapNodeStore':
+        """
+        Maps the column files of an earlier store back in without copying
+        them, for example to inspect the environment of a crashed run.
+
+        :param directory: Directory holding the column files.
+        :returns: The store, writes go to the files.
+        """
+        directory = Path(directory)
+        with open(directory / LAYOUT_FILE, 'r') as f:
+            layout = json.load(f)
+
+        store = cls.__new__(cls)
+        store.directory = directory
+        store.__map(size=layout['size'], mode='r+',
+                    coordinate_dtype=np.dtype(layout['coordinate_dtype']).type)
+        return store
+
+    def flush(self) -> None:
+        """
+        Writes pending changes of every column and the layout to disk.
+        """
+        for k in self.columns():
+            getattr(self, k).flush()
+
+        with open(self.directory / LAYOUT_FILE, 'w') as f:
+            json.dump({'size': self.size,
+                       'coordinate_dtype': np.dtype(self.coordinate_dtype).name},
+                      f)
+
+    def resize(self, size: int) -> None:
+        """
+        Grows every column file to size nodes in place, new columns are
+        empty.
+
+        :param int size: New number of node columns, must not be smaller than
+            the current one.
+        """
+        old_size = self.size
+        if size < old_size:
+            raise ValueError(f"Can not shrink node store from {old_size} to "
+                             f"{size} columns")
+
+        self.__remap(size=size)
+        self.__fill(start=old_size)
+        self.flush()
+
+    def take(self, index: INDEX) -> 'MemmapNodeStore':
+        """
+        Keeps only the selected columns, in the given order, and shrinks the
+        files to match. Unlike NodeStore.take this rewrites the store in place
+        since the files are the store.
+
+        :param index: Array of indices or slice.
+        :returns: The same store.
+        """
+        taken = NodeStore.take(self, index)
+        size = taken.size
+
+        # a file can not be mapped empty, so at least one column is kept
+        self.__remap(size=max(size, 1))
+        self.__fill(start=0)
+        for k in self.columns():
+            getattr(self, k)[..., :size] = getattr(taken, k)
+        self.flush()
+        return self
+
+    def copy(self) -> NodeStore:
+        """
+        :returns: An in-memory copy of the store.
+        """
+        new_store = NodeStore(size=0, coordinate_dtype=self.coordinate_dtype)
+        for k in self.columns():
+            setattr(new_store, k, np.array(getattr(self, k)))
+        return new_store
+
+    def __map(self, size: int, mode: str, coordinate_dtype: type) -> None:
+        template = NodeStore(size=0, coordinate_dtype=coordinate_dtype)
+        for k in self.columns():
+            column = getattr(template, k)
+            shape = column.shape[:-1] + (size,)
+            setattr(self, k, np.memmap(self.directory / f'{k}.bin',
+                                       dtype=column.dtype, mode=mode,
+                                       shape=shape, order='F'))
+
+    def __remap(self, size: int) -> None:
+        coordinate_dtype = self.coordinate_dtype
+
+        # release the maps before the files change length under them
+        for k in self.columns():
+            getattr(self, k).flush()
+            setattr(self, k, None)
+
+        template = NodeStore(size=size, coordinate_dtype=coordinate_dtype)
+        for k in self.columns():
+            with open(self.directory / f'{k}.bin', 'r+b') as f:
+                f.truncate(getattr(template, k).nbytes)
+
+        self.__map(size=size, mode='r+', coordinate_dtype=coordinate_dtype)
+
+    def __fill(self, start: int) -> None:
+        for k in self.columns():
+            getattr(self, k)[..., start:] = EMPTY[k]
@@ -4,9 +4,13 @@
 """
 
 from .bot.agent import Agent
+from .bot.batch import check_key_range
 from .bot.manager import AmoebotManager
 from ..utils.exceptions import InitializationError
+from ..utils.limits import coordinate_dtype
 from amoebot.elements.node.manager import NodeManagerBitArray
+from amoebot.elements.node.lattice import NodeManagerLattice, extent_of
+from amoebot.elements.node.store import MemmapNodeStore, BOT_ID_DTYPE
 
 import time
 import json
@@ -65,6 +69,18 @@ class StateGenerator(object):
 
             config_num (str) default: None :: identifier number for the json 
                             configuration file.
+            extent (tuple) default: None :: (x_min, y_min, x_max, y_max) of a 
+                            bounded arena; when given (here or as "extent" in 
+                            the configuration file) nodes are kept in a dense 
+                            `NodeManagerLattice` instead of a 
+                            `NodeManagerBitArray`.
+            backend (str) default: None :: node backend, one of "bit_array", 
+                            "memmap" or "lattice"; "memmap" keeps the node 
+                            array in memory-mapped files under 
+                            `.dumps/run-<config_num>/nodes`, a lattice without 
+                            an extent is unbounded and stored in 64 x 64 blocks 
+                            that are allocated as the swarm spreads out. Also 
+                            read from "backend" in the configuration file.
         """
 
         # random placemet when no config_num is assigned
@@ -84,7 +100,10 @@ class StateGenerator(object):
         else:
             self.config_num = config_num
             # _ = self._generate_init0(config_num=config_num)
-            self.manager, config0 = self._config0_placement()
+            self.manager, config0 = self._config0_placement(
+                                                extent=kwargs.get('extent'),
+                                                backend=kwargs.get('backend')
+                                            )
 
     def write(self, config0: list):
         r"""
@@ -122,7 +141,7 @@ class StateGenerator(object):
 
         return config_num
 
-    def _collect_amoebot_states(self, bot: object) -> dict:
+    def _collect_amoebot_states(self, bot: Agent) -> dict:
         r""" 
         Return state for a single amoebot
 
@@ -131,9 +150,6 @@ class StateGenerator(object):
         
         Return (dict): state dictionary for given object of class `Amoebot`.
         """
-        # unpickle the byte-object for reading
-        bot = Agent.unpickled(bot)
-
         state = dict(
             head_pos=bot.head.tolist(),
             tail_pos=bot.tail.tolist()
@@ -162,26 +178,32 @@ class StateGenerator(object):
 
         # add bot to the list at random node position
         for ix, position in enumerate(node_manager.grid_points[rand_ixs]):
-            manager._add_bot(np.uint8(ix), head=position)
+            manager._add_bot(BOT_ID_DTYPE(ix), head=position)
 
         # collect state information from the amoebot manager
-        vec_collector = np.vectorize(self._collect_amoebot_states)
-        config0 = vec_collector(list(manager.amoebots.values()))
+        config0 = [self._collect_amoebot_states(bot) 
+                                    for bot in manager.amoebots.values()]
 
-        return manager, config0.tolist()
+        return manager, config0
 
-    def _config0_placement(self) -> (AmoebotManager, list):
+    def _config0_placement(self, extent: tuple = None, 
+                           backend: str = None) -> (AmoebotManager, list):
         r"""
         Collect state information from source place bots on the grid. 
 
         Attributes
-            node_manager (NodeManager) :: reference to `NodeManager` object.
+            extent (tuple) default: None :: (x_min, y_min, x_max, y_max) of a 
+                            bounded arena, overridden by an "extent" entry in 
+                            the configuration file.
+            backend (str) default: None :: one of "bit_array", "memmap" or 
+                            "lattice", 
+                            overridden by a "backend" entry in the 
+                            configuration file; a given extent implies 
+                            "lattice".
 
         Return (AmoebotManager): object handler for manager class
         """
 
-        manager = AmoebotManager(config_num=self.config_num)
-
         try:
             config0 = config0_reader(self.config_num)
 
@@ -190,29 +212,68 @@ class StateGenerator(object):
                 f"Configuration file looks incorrect."
             )
 
+        # the co-ordinate type is fixed once for the whole configuration
+        extent = config0.get('extent', extent)
+        dtype = coordinate_dtype(
+            extent_of(config0['bots'] + config0['walls']) if extent is None \
+                else extent
+        )
+
+        manager = AmoebotManager(config_num=self.config_num, 
+                                 coordinate_dtype=dtype)
+
         # creates a placeholder for the head and tail positions
-        points = np.zeros([4, len(config0['bots'])])
+        points = np.zeros([4, len(config0['bots'])], dtype=dtype)
 
         # add bot to the list at known position
         for ix, bot in enumerate(config0['bots']):  # ix corresponds to bot_id
             head_x, head_y = bot
             
             manager._add_bot(
-                np.uint8(ix),
-                head=np.array([head_x, head_y], dtype=np.uint8),
-                tail=np.array([head_x, head_y], dtype=np.uint8)
+                BOT_ID_DTYPE(ix),
+                head=np.array([head_x, head_y], dtype=dtype),
+                tail=np.array([head_x, head_y], dtype=dtype)
             )
 
             # Adds head and tail position to corresponding point positions
             positions = (head_x, head_y, head_x, head_y)
             points[(0, 1, 2, 3), (ix, ix, ix, ix)] = positions
 
-        nm = NodeManagerBitArray(points=points)
+        # the lattice is dense on a known extent and chunked otherwise
+        backend = config0.get('backend', backend) or \
+            ('bit_array' if extent is None else 'lattice')
+
+        if backend == 'bit_array':
+            nm = NodeManagerBitArray(points=points, coordinate_dtype=dtype)
+        elif backend == 'memmap':
+            # reopen later with MemmapNodeStore.open on the same directory
+            nodes = MemmapNodeStore(
+                directory=Path(STORE) / f'run-{self.config_num}' / 'nodes',
+                coordinate_dtype=dtype
+            )
+            nm = NodeManagerBitArray(points=points, nodes=nodes)
+        elif backend == 'lattice':
+            # the lattice keeps co-ordinates as packed keys and flat indices
+            # of no fixed dtype, so the extent is held to their range instead
+            x1 = np.asarray(config0['bots'] + config0['walls'],
+                            dtype=np.int64).reshape(-1, 2)
+            if extent is not None:
+                x2 = np.asarray(extent, dtype=np.int64).reshape(2, 2)
+                x1 = np.concatenate((x1, x2))
+            check_key_range(x1, remedy="use the `bit_array` or `memmap` "
+                                       "backend")
+
+            nm = NodeManagerLattice(
+                extent=None if extent is None else tuple(extent), points=points
+            )
+        else:
+            raise InitializationError(f"Unknown node backend `{backend}`.")
 
         for wall in config0['walls']:
             wall_x, wall_y = wall
             nm.add_wall(point=(wall_x, wall_y))
 
-        manager.load_env(value=nm.nodes)
+        # the manager owns this node manager for the rest of the simulation
+        manager.load_env(value=nm)
 
         return manager, config0
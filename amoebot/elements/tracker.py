@@ -4,62 +4,716 @@
 """
 
 from ..utils.exceptions import InitializationError
+from .node.store import COORDINATE_DTYPE
+from .trajectory import CHUNK_FRAMES, TRAJECTORY_FILE, POSITION_DTYPE
+from .trajectory import position_dtype
+from .trajectory import TrajectoryReader, TrajectoryWriter, to_frames
+from .trajectory import ParticleIndex, write_particle_index
 
+import os
 import json
+import atexit
+import threading
 import numpy as np
 from pathlib import Path
+from itertools import islice
+from collections import deque
 
 STORE = './.dumps'
 
+# append-only stream of frames, one JSON document per line
+TRACKS_FILE = 'tracks.jsonl'
+
+# frame number and byte offset of every keyframe of the stream, int64 pairs
+INDEX_FILE = 'tracks.index'
+
+# the former single JSON array, still read when no stream exists
+LEGACY_TRACKS_FILE = 'tracks.json'
+
+# full frames are written this often, only the particles that moved between
+KEYFRAME_EVERY = 50
+
+# output formats of the tracker
+TRACK_FORMATS = ('jsonl', 'binary')
+
+# frames waiting for the writer thread of a `QueuedTracker`
+QUEUE_FRAMES = 8
+
+# what a `QueuedTracker` does with a frame when its queue is full
+BACKPRESSURE = ('block', 'drop', 'coalesce')
+
+# particle-major copy of the frames, built after the run
+PARTICLE_INDEX_FILE = 'particles.npy'
+
+# frames held in memory at a time while the particle index is built
+PARTICLE_BLOCK_BYTES = 1 << 26
+
 class StateTracker(object):
-    r""" 
-    Keep track of particle states (configurations) in the current execution. 
-    Write state information to JSON file for rendering.
+    r"""
+    Keep track of particle states (configurations) in the current execution.
+    Every state is appended to a JSON Lines file as one frame, earlier frames
+    are never read back or rewritten.
+
+    Every `keyframe_every` frames a full keyframe is written, in between a
+    frame only holds the row, head and tail of the particles that moved since
+    the frame before. The offset of every keyframe goes to an index next to
+    the stream so `TrackReader` can seek to any frame.
+
+    With `fmt` "binary" the frames go to a chunked `TrajectoryWriter`
+    container instead, written a chunk at a time.
 
     Attributes
         config_num (str) :: identifier number for the json configuration file.
+        fmt (str) :: output format, one of `TRACK_FORMATS`.
+        statefile (Path) :: path to the stream of frames.
+        indexfile (Path) :: path to the keyframe index.
+        trajectoryfile (Path) :: path to the binary container.
+        coordinate_dtype (type) :: signed integer type of the co-ordinates in
+                        the binary container.
+        keyframe_every (int) :: write a keyframe every this many frames, only
+                        full frames in the former format when None.
+        flush_every (int) :: hand the frames to the OS every this many frames,
+                        a binary container is written a chunk at a time.
+        fsync_every (int) :: force the frames to disk every this many frames,
+                        never when None.
+        n_frames (int) :: number of frames written so far.
     """
-    def __init__(self, config_num:str):
+    def __init__(
+                    self,
+                    config_num:str,
+                    fmt:str='jsonl',
+                    keyframe_every:int=KEYFRAME_EVERY,
+                    flush_every:int=1,
+                    fsync_every:int=None,
+                    chunk_frames:int=CHUNK_FRAMES,
+                    codec:str='zlib',
+                    coordinate_dtype:type=COORDINATE_DTYPE
+                ):
         r"""
         Attributes
-            config_num (str) :: identifier number for the json configuration 
+            config_num (str) :: identifier number for the json configuration
                             file.
+            fmt (str) default: 'jsonl' :: output format, one of
+                            `TRACK_FORMATS`.
+            keyframe_every (int) default: KEYFRAME_EVERY :: write a keyframe
+                            every this many frames, only full frames in the
+                            former format when None.
+            flush_every (int) default: 1 :: hand the frames to the OS every
+                            this many frames.
+            fsync_every (int) default: None :: force the frames to disk every
+                            this many frames, leave it to the OS when None.
+            chunk_frames (int) default: CHUNK_FRAMES :: frames per chunk of
+                            the binary container.
+            codec (str) default: 'zlib' :: compression of the binary
+                            container, "zlib" or "lzma".
+            coordinate_dtype (type) default: COORDINATE_DTYPE :: signed
+                            integer type of the co-ordinates in the binary
+                            container, that of the particle table.
         """
+        if fmt not in TRACK_FORMATS:
+            raise InitializationError(
+                f"unknown tracker format `{fmt}`, use one of {TRACK_FORMATS}."
+            )
 
         # identifying number for current run, created by `StateGenerator`
         self.config_num: str = config_num
+        self.fmt = fmt
+
+        # complete path to the state file and its index
+        rundir = Path(STORE) / Path(f'run-{config_num}')
+        self.statefile = rundir / TRACKS_FILE
+        self.indexfile = rundir / INDEX_FILE
+        self.trajectoryfile = rundir / TRAJECTORY_FILE
+        self.chunk_frames, self.codec = chunk_frames, codec
+        self.coordinate_dtype = coordinate_dtype
+
+        self.keyframe_every = keyframe_every
+        self.flush_every = flush_every
+        self.fsync_every = fsync_every
+        self.n_frames = 0
+
+        # opened on the first frame
+        self._file = None
+        self._index = None
+        self._writer = None
+
+        # number of the next frame in the stream and positions of the last
+        self._frame = 0
+        self._last = None
 
-    def update(self, config:list):
+    def update(self, config:list, rnd:int=None):
         r"""
-        Update the state tracker file when called.
+        Append the current state as a new frame.
 
         Attributes
-            config (list[dict]) :: list containing current system configuation.
+            config (list[dict]) :: list containing current system configuation,
+                            or an n x 4 array of head x, head y, tail x and
+                            tail y of every particle.
+            rnd (int) default: None :: round of the state, kept by the binary
+                            container only.
         """
+        if self.fmt == 'binary':
+            if self._writer is None:
+                self._writer = TrajectoryWriter(
+                                    self.trajectoryfile,
+                                    chunk_frames=self.chunk_frames,
+                                    codec=self.codec,
+                                    coordinate_dtype=self.coordinate_dtype
+                                )
+            self._writer.append(_positions(config), rnd=rnd)
+            self.n_frames += 1
 
-        # complete path to the state file
-        statefile = Path(STORE) / Path(f'run-{self.config_num}/tracks.json')
+            if self.fsync_every and self.n_frames % self.fsync_every == 0:
+                self.flush(fsync=True)
+            return
 
-        # read data from json file if it exists
-        if statefile.exists():
-            with open(statefile, 'r') as f:
-                tracks = json.load(f)
+        if self._file is None: self._open()
 
+        positions = _positions(config)
+        last, every = self._last, self.keyframe_every
+
+        if every is None or last is None or last.shape != positions.shape or \
+                self.n_frames % every == 0:
+            x1 = np.array([self._frame, self._file.tell()], dtype=np.int64)
+            if every is None:
+                record = config if isinstance(config, list) else \
+                                                        _frame(positions)
+            else: record = dict(k=positions.tolist())
         else:
-            # tracks the most recent state change in sequential order
-            tracks = list()
+            x1 = None
+            rows = np.flatnonzero(np.any(positions != last, axis=1))
+            record = dict(d=np.column_stack((rows, positions[rows])).tolist())
+
+        x2 = json.dumps(record, separators=(',', ':')) + '\n'
+        self._file.write(x2.encode())
+        if x1 is not None: self._index.write(x1.tobytes())
 
-        # insert into the tracks list
-        tracks.append(config)
+        self._last = positions
+        self._frame += 1
+        self.n_frames += 1
 
-        # append state information to the json file
-        with open(statefile, 'w') as f: 
-            json.dump(tracks, f, indent=4)
+        if self.fsync_every and self.n_frames % self.fsync_every == 0:
+            self.flush(fsync=True)
+        elif self.flush_every and self.n_frames % self.flush_every == 0:
+            self.flush()
+
+    def flush(self, fsync:bool=False):
+        r"""
+        Hand the buffered frames to the OS.
+
+        Attributes
+            fsync (bool) default: False :: also force them to disk.
+        """
+        if self._writer is not None: self._writer.flush(fsync=fsync)
+        if self._file is None: return
+
+        for f in (self._file, self._index):
+            f.flush()
+            if fsync: os.fsync(f.fileno())
+
+    def close(self):
+        r"""
+        Flush the stream to disk and close it, a later `update` reopens it.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+        if self._file is None: return
+
+        self.flush(fsync=True)
+        self._file.close()
+        self._index.close()
+        self._file = self._index = None
+
+    def _open(self):
+        r"""
+        Open the stream and its index for appending, after a crash both are
+        cut back to the last complete frame.
+        """
+        self.statefile.parent.mkdir(parents=True, exist_ok=True)
+        _drop_partial_frame(self.statefile)
+
+        # continue the frame count and the index of an earlier stream
+        reader = TrackReader(self.statefile.parent)
+        self._frame = len(reader)
+        reader.keyframes.tofile(self.indexfile)
+
+        # the next frame follows a stream of unknown state, a keyframe
+        self._last = None
+        self._file = open(self.statefile, 'ab')
+        self._index = open(self.indexfile, 'ab')
 
     def checkpoint_terminal_state(self):
         r"""
-        Similar to the `StateGenerator.write`, this function checkpoints the 
-        terminal state of current execution that can be loaded later for 
+        Similar to the `StateGenerator.write`, this function checkpoints the
+        terminal state of current execution that can be loaded later for
         re-useability.
         """
         raise NotImplementedError
+
+class QueuedTracker(object):
+    r"""
+    Hand the frames of a `StateTracker` to a writer thread through a bounded
+    queue, so the simulation only pays for copying the positions and the
+    encoding and file writes happen off its thread. Frames are written in
+    the order they are queued.
+
+    When the queue is full, `backpressure` decides what happens to a new
+    frame: "block" waits for the writer, "drop" discards it, and "coalesce"
+    puts it in place of the newest frame still waiting, so the latest state
+    always reaches the tracker. Frames still queued are written when the
+    tracker is closed, at the latest when the interpreter exits.
+
+    Attributes
+        tracker (StateTracker) :: tracker the frames are written to.
+        maxsize (int) :: number of frames the queue holds.
+        backpressure (str) :: policy for a full queue, one of `BACKPRESSURE`.
+        n_dropped (int) :: number of frames discarded or replaced so far.
+    """
+    def __init__(
+                    self,
+                    tracker:StateTracker,
+                    maxsize:int=QUEUE_FRAMES,
+                    backpressure:str='block'
+                ):
+        r"""
+        Attributes
+            tracker (StateTracker) :: tracker the frames are written to.
+            maxsize (int) default: QUEUE_FRAMES :: number of frames the queue
+                            holds.
+            backpressure (str) default: 'block' :: policy for a full queue,
+                            one of `BACKPRESSURE`.
+        """
+        if backpressure not in BACKPRESSURE:
+            raise InitializationError(
+                f"unknown backpressure `{backpressure}`, use one of "
+                f"{BACKPRESSURE}."
+            )
+        if maxsize < 1:
+            raise InitializationError("the tracker queue needs a frame.")
+
+        self.tracker = tracker
+        self.maxsize, self.backpressure = maxsize, backpressure
+        self.n_dropped = 0
+
+        self._frames = deque()
+        self._cond = threading.Condition()
+        self._busy = self._closing = False
+        self._error = None
+
+        # started on the first frame, and again after it failed
+        self._thread = None
+
+    def __getattr__(self, name:str):
+        # paths and settings of the wrapped tracker; read through __dict__ so
+        # that an instance without one, e.g. while unpickling, does not recurse
+        tracker = self.__dict__.get('tracker')
+        if tracker is None:
+            raise AttributeError(f"{type(self).__name__!r} object has no "
+                                 f"attribute {name!r}")
+        return getattr(tracker, name)
+
+    def update(self, config, rnd:int=None):
+        r"""
+        Queue a copy of the current state as a new frame.
+
+        Attributes
+            config (numpy.ndarray) :: n x 4 array of head x, head y, tail x
+                            and tail y of every particle, or a list of dicts
+                            as taken by `StateTracker.update`.
+            rnd (int) default: None :: round of the state.
+        """
+        frame = (_positions(config), rnd)
+
+        with self._cond:
+            self._raise()
+            if self._thread is None or not self._thread.is_alive():
+                self._start()
+
+            if len(self._frames) >= self.maxsize:
+                if self.backpressure == 'drop':
+                    self.n_dropped += 1
+                    return
+                if self.backpressure == 'coalesce':
+                    self._frames[-1] = frame
+                    self.n_dropped += 1
+                    return
+
+                self._cond.wait_for(lambda: self._error is not None or
+                                        len(self._frames) < self.maxsize)
+                self._raise()
+
+            self._frames.append(frame)
+            self._cond.notify_all()
+
+    def flush(self, fsync:bool=False):
+        r"""
+        Wait for the queued frames to be written, then flush the tracker.
+
+        Attributes
+            fsync (bool) default: False :: also force them to disk.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._error is not None or
+                                    not (self._frames or self._busy))
+            self._raise()
+            self.tracker.flush(fsync=fsync)
+
+    def close(self):
+        r"""
+        Write the queued frames, stop the writer thread and close the tracker,
+        a later `update` starts them again.
+        """
+        if self._thread is not None:
+            with self._cond:
+                self._closing = True
+                self._cond.notify_all()
+            self._thread.join()
+            self._thread = None
+            atexit.unregister(self.close)
+
+        self.tracker.close()
+        with self._cond: self._raise()
+
+    def _start(self):
+        self._closing = False
+        self._thread = threading.Thread(target=self._write, daemon=True,
+                                        name=f'tracker-{self.config_num}')
+        self._thread.start()
+
+        # daemon threads are stopped at exit, the queue is written first
+        atexit.unregister(self.close)
+        atexit.register(self.close)
+
+    def _write(self):
+        r"""
+        Writer thread, takes frames off the queue until the tracker closes.
+        """
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._frames or self._closing)
+                if not self._frames: return
+                positions, rnd = self._frames.popleft()
+                self._busy = True
+                self._cond.notify_all()
+
+            try:
+                self.tracker.update(positions, rnd=rnd)
+            except Exception as e:
+                with self._cond:
+                    self._error = e
+                    self._frames.clear()
+                    self._busy = False
+                    self._cond.notify_all()
+                return
+
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def _raise(self):
+        r"""
+        Raise an error of the writer thread in the caller, once.
+        """
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+def _drop_partial_frame(statefile:Path, block:int=1 << 16):
+    r"""
+    Cut a frame left unfinished by a crash off the end of the stream, so the
+    next frame starts on a line of its own.
+    """
+    if not statefile.exists(): return
+
+    with open(statefile, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+
+        # walk back to the last complete line
+        x1 = end
+        while x1 > 0:
+            start = max(x1 - block, 0)
+            f.seek(start)
+            x2 = f.read(x1 - start).rfind(b'\n')
+            if x2 != -1:
+                x1 = start + x2 + 1
+                break
+            x1 = start
+
+        if x1 != end: f.truncate(x1)
+
+def _positions(config:list) -> np.ndarray:
+    r"""
+    Return (numpy.ndarray): n x 4 array of head x, head y, tail x and tail y
+                    of every particle of a frame.
+    """
+    if isinstance(config, np.ndarray):
+        return config.astype(np.int64).reshape(-1, 4)
+
+    x1 = [state['head_pos'] + state['tail_pos'] for state in config]
+    return np.array(x1, dtype=np.int64).reshape(-1, 4)
+
+def _frame(positions:np.ndarray) -> list:
+    r"""
+    Return (list[dict]): the frame of an n x 4 position array.
+    """
+    return [dict(head_pos=p[:2], tail_pos=p[2:]) for p in positions.tolist()]
+
+class TrackReader(object):
+    r"""
+    Random access to the frames of a stream written by `StateTracker`. A
+    frame is rebuilt from the nearest keyframe before it by replaying the
+    changes in between, found through the keyframe index or, if there is
+    none, by scanning the stream once.
+
+    Attributes
+        statefile (Path) :: path to the stream of frames.
+        keyframes (numpy.ndarray) :: k x 2 array of frame number and byte
+                        offset of every keyframe.
+    """
+    def __init__(self, rundir:Path):
+        r"""
+        Attributes
+            rundir (Path) :: directory of the run under the dump store.
+        """
+        rundir = Path(rundir)
+        self.statefile = rundir / TRACKS_FILE
+
+        size = self.statefile.stat().st_size if self.statefile.exists() else 0
+        indexfile = rundir / INDEX_FILE
+
+        if indexfile.exists():
+            keyframes = np.fromfile(indexfile, dtype=np.int64)
+            keyframes = keyframes[:keyframes.size // 2 * 2].reshape(-1, 2)
+
+            # an entry may outlive the frame it points to after a crash
+            keyframes = keyframes[keyframes[:, 1] < size]
+        else:
+            keyframes = self._scan()
+
+        # an index missing its first keyframe belongs to another stream
+        if keyframes.size and keyframes[0, 1] != 0: keyframes = self._scan()
+        self.keyframes = keyframes
+
+        # frames from the last keyframe on
+        self._n_frames = 0
+        if keyframes.size:
+            with open(self.statefile, 'rb') as f:
+                f.seek(keyframes[-1, 1])
+                x1 = sum(1 for line in f if line.endswith(b'\n'))
+            self._n_frames = int(keyframes[-1, 0]) + x1
+
+    def __len__(self) -> int:
+        return self._n_frames
+
+    def __iter__(self):
+        r"""
+        Decode every frame in order, in one pass over the stream.
+        """
+        for positions in self.iter_positions(): yield _frame(positions)
+
+    def iter_positions(self):
+        r"""
+        Decode every frame in order as an n x 4 position array, in one pass
+        over the stream.
+        """
+        if not len(self): return
+
+        with open(self.statefile, 'rb') as f:
+            positions = None
+            for _, line in zip(range(len(self)), f):
+                positions = _decode(line, positions)
+                yield positions
+
+    def positions(self, frame:int) -> np.ndarray:
+        r"""
+        Attributes
+            frame (int) :: number of the frame, negative counts from the end.
+
+        Return (numpy.ndarray): n x 4 array of head x, head y, tail x and
+                        tail y of every particle in the frame.
+        """
+        frame = frame + len(self) if frame < 0 else frame
+        if not 0 <= frame < len(self):
+            raise IndexError(f"frame {frame} is not in the stream.")
+
+        # nearest keyframe at or before the frame
+        x1 = np.searchsorted(self.keyframes[:, 0], frame, side='right') - 1
+        first, offset = self.keyframes[x1].tolist()
+
+        with open(self.statefile, 'rb') as f:
+            f.seek(offset)
+            positions = None
+            for _ in range(frame - first + 1):
+                positions = _decode(f.readline(), positions)
+
+        return positions
+
+    def frame(self, frame:int) -> list:
+        r"""
+        Attributes
+            frame (int) :: number of the frame, negative counts from the end.
+
+        Return (list[dict]): head and tail position of every particle in the
+                        frame.
+        """
+        return _frame(self.positions(frame))
+
+    def _scan(self) -> np.ndarray:
+        r"""
+        Return (numpy.ndarray): frame number and byte offset of every keyframe,
+                        found by reading the stream without decoding it.
+        """
+        keyframes, offset = list(), 0
+        if self.statefile.exists():
+            with open(self.statefile, 'rb') as f:
+                for frame, line in enumerate(f):
+                    if not line.endswith(b'\n'): break
+                    if not line.startswith(b'{"d"'):
+                        keyframes.append((frame, offset))
+                    offset += len(line)
+
+        return np.array(keyframes, dtype=np.int64).reshape(-1, 2)
+
+def _decode(line:bytes, positions:np.ndarray) -> np.ndarray:
+    r"""
+    Return (numpy.ndarray): the positions after applying one line of the
+                    stream to the positions of the frame before.
+    """
+    record = json.loads(line)
+
+    # a full frame in the former format
+    if isinstance(record, list): return _positions(record)
+
+    if 'k' in record:
+        return np.array(record['k'], dtype=np.int64).reshape(-1, 4)
+
+    positions = positions.copy()
+    x1 = np.array(record['d'], dtype=np.int64).reshape(-1, 5)
+    positions[x1[:, 0]] = x1[:, 1:]
+    return positions
+
+def read_tracks(rundir:Path, start:int=None, stop:int=None) -> list:
+    r"""
+    Reassemble the list of frames of a run, as once held by `tracks.json`,
+    from the binary container if there is one, else from the stream.
+
+    Attributes
+        rundir (Path) :: directory of the run under the dump store.
+        start (int) default: None :: first frame, from the first if None.
+        stop (int) default: None :: frame after the last, to the end if None.
+
+    Return (list[list[dict]]): the frames in the order they were written.
+    """
+    rundir = Path(rundir)
+
+    # only the chunks of the requested frames are decompressed
+    if (rundir / TRAJECTORY_FILE).exists():
+        reader = TrajectoryReader(rundir / TRAJECTORY_FILE)
+        return to_frames(reader.read(start, stop))
+
+    statefile = rundir / TRACKS_FILE
+    if not statefile.exists():
+        with open(rundir / LEGACY_TRACKS_FILE, 'r') as f:
+            return json.load(f)[start:stop]
+
+    # a frame cut short by a crash is dropped
+    reader = TrackReader(rundir)
+    start, stop, _ = slice(start, stop).indices(len(reader))
+    return list(islice(reader, start, stop))
+
+def build_particle_index(rundir:Path, block_frames:int=None,
+                         coordinate_dtype:type=None) -> Path:
+    r"""
+    Write the particle-major index of a run, from the binary container if
+    there is one, else from the stream, a block of frames at a time.
+
+    Attributes
+        rundir (Path) :: directory of the run under the dump store.
+        block_frames (int) default: None :: frames transposed at a time, as
+                        many as fit in `PARTICLE_BLOCK_BYTES` if None.
+        coordinate_dtype (type) default: None :: signed integer type of the
+                        index, that of the container if None; a stream
+                        records none, its index is int64 only if int32 does
+                        not hold it.
+
+    Return (Path): path to the index.
+    """
+    rundir = Path(rundir)
+
+    if (rundir / TRAJECTORY_FILE).exists():
+        reader = TrajectoryReader(rundir / TRAJECTORY_FILE)
+        dtype = position_dtype(coordinate_dtype or reader.coordinate_dtype)
+        return _write_particle_index(rundir, reader, dtype, block_frames)
+
+    reader = TrackReader(rundir)
+    if coordinate_dtype is not None:
+        dtype = position_dtype(coordinate_dtype)
+        return _write_particle_index(rundir, reader, dtype, block_frames)
+
+    try:
+        return _write_particle_index(rundir, reader, POSITION_DTYPE,
+                                     block_frames)
+    except OverflowError:
+        return _write_particle_index(rundir, reader, position_dtype(np.int64),
+                                     block_frames)
+
+def _write_particle_index(rundir:Path, reader:object, dtype:np.dtype,
+                          block_frames:int=None) -> Path:
+    r"""
+    Return (Path): path to the particle index of a run, written from a
+                    `TrajectoryReader` or a `TrackReader` with records of
+                    `dtype`.
+    """
+    if isinstance(reader, TrajectoryReader):
+        n_particles, n_frames = reader.n_particles, len(reader)
+        source = None
+    else:
+        n_frames = len(reader)
+        n_particles = len(reader.positions(0)) if n_frames else 0
+        source = reader.iter_positions()
+
+    if block_frames is None:
+        x1 = max(n_particles, 1) * dtype.itemsize
+        block_frames = max(PARTICLE_BLOCK_BYTES // x1, 1)
+
+        # whole chunks of the container are decompressed at a time
+        if source is None:
+            x2 = reader.chunk_frames
+            block_frames = max(block_frames // x2, 1) * x2
+
+    def blocks():
+        for start in range(0, n_frames, block_frames):
+            if source is None:
+                yield reader.read(start, start + block_frames)
+            else:
+                yield np.stack(list(islice(source, block_frames)))
+
+    return write_particle_index(rundir / PARTICLE_INDEX_FILE, blocks(),
+                                n_particles, n_frames, dtype=dtype)
+
+def particle_trajectory(rundir:Path, bot_id:int, start:int=None,
+                        stop:int=None) -> np.ndarray:
+    r"""
+    History of one particle of a run, read from the particle index, which is
+    built first if it is missing or older than the frames.
+
+    Attributes
+        rundir (Path) :: directory of the run under the dump store.
+        bot_id (int) :: row of the particle in the frames.
+        start (int) default: None :: first frame, from the first if None.
+        stop (int) default: None :: frame after the last, to the end if None.
+
+    Return (numpy.ndarray): frames x 4 array of head x, head y, tail x and
+                    tail y of the particle, a view of the memory map.
+    """
+    rundir = Path(rundir)
+    path = rundir / PARTICLE_INDEX_FILE
+
+    x1 = [rundir / TRAJECTORY_FILE, rundir / TRACKS_FILE]
+    x2 = max((f.stat().st_mtime for f in x1 if f.exists()), default=0)
+    if not path.exists() or path.stat().st_mtime < x2:
+        build_particle_index(rundir)
+
+    return ParticleIndex(path).trajectory(bot_id, start, stop)
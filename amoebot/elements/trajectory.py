@@ -0,0 +1,539 @@
+# -*- coding: utf-8 -*-
+
+""" elements/trajectory.py
+
+Chunked binary trajectory container. Every frame is one fixed-width record
+of positions per particle; frames are grouped into chunks that are compressed
+on their own with `zlib` or `lzma`, and a footer at the end of the file maps
+frames and round numbers to the byte offsets of their chunks. A reader maps
+the file into memory and only decompresses the chunks it is asked for.
+
+Layout
+
+    header :: magic, number of particles, frames per chunk, codec, type of
+                the co-ordinates
+    chunk :: magic, number of frames, first round, payload size, the round
+                number of every frame, the compressed records
+    footer :: the chunk table, the round number of every frame, and a trailer
+                with the offset of the chunk table and the number of chunks
+                and frames
+
+A chunk is appended over the old footer and a new footer is written after
+it, if the footer is lost the chunks are found again by walking their
+headers.
+"""
+
+from ..utils.exceptions import ShapeError
+from .node.store import COORDINATE_DTYPE
+
+import os
+import lzma
+import zlib
+import struct
+import numpy as np
+from pathlib import Path
+
+# binary container next to the run's other dumps
+TRAJECTORY_FILE = 'tracks.bin'
+
+def position_dtype(coordinate_dtype:type=COORDINATE_DTYPE) -> np.dtype:
+    r"""
+    Return (numpy.dtype): head and tail of one particle in one frame, little
+                    endian on disk.
+    """
+    x1 = np.dtype(coordinate_dtype).newbyteorder('<')
+    return np.dtype([('head_pos', x1, (2,)), ('tail_pos', x1, (2,))])
+
+# positions of the default co-ordinate type
+POSITION_DTYPE = position_dtype()
+
+# frames compressed together
+CHUNK_FRAMES = 64
+
+CODECS = {
+    'zlib': (zlib.compress, zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+_HEADER = struct.Struct('<8sqq8s8s')
+_CHUNK = struct.Struct('<4sqqq')
+_TRAILER = struct.Struct('<qqq8s')
+
+_MAGIC, _CHUNK_MAGIC, _FOOTER_MAGIC = b'AMTRAJ02', b'CHNK', b'AMTRAJIX'
+
+# containers of the first version hold int32 co-ordinates only
+_HEADER_V1, _MAGIC_V1 = struct.Struct('<8sqq8s'), b'AMTRAJ01'
+
+# one row of the chunk table
+CHUNK_DTYPE = np.dtype([('frame', '<i8'), ('first_round', '<i8'),
+                        ('last_round', '<i8'), ('n_frames', '<i8'),
+                        ('offset', '<i8'), ('nbytes', '<i8')])
+
+class TrajectoryReader(object):
+    r"""
+    Read access to a trajectory container. The file is memory mapped, the
+    chunk table and round numbers are read from the footer, and only the
+    chunks that hold the requested frames are decompressed.
+
+    Attributes
+
+        path (Path) :: path to the container.
+        n_particles (int) :: number of particles per frame.
+        chunk_frames (int) :: frames per chunk.
+        codec (str) :: compression of the chunks, one of `CODECS`.
+        coordinate_dtype (type) :: signed integer type of the co-ordinates.
+        dtype (numpy.dtype) :: record of one particle in one frame.
+        chunks (numpy.ndarray) :: the chunk table, of `CHUNK_DTYPE`.
+        rounds (numpy.ndarray) :: round number of every frame.
+    """
+
+    def __init__(self, path:Path):
+        r"""
+        Attributes
+
+            path (Path) :: path to the container.
+        """
+        self.path = Path(path)
+        size = self.path.stat().st_size
+        if size < _HEADER_V1.size:
+            raise ShapeError(f"{self.path} is too short for a trajectory.")
+
+        self._map = np.memmap(self.path, dtype=np.uint8, mode='r')
+
+        magic = self._map[:8].tobytes()
+        if magic == _MAGIC and size >= _HEADER.size:
+            _, n_particles, chunk_frames, codec, coordinate = \
+                                _HEADER.unpack(self._map[:_HEADER.size])
+            self._start = _HEADER.size
+        elif magic == _MAGIC_V1:
+            _, n_particles, chunk_frames, codec = \
+                                _HEADER_V1.unpack(self._map[:_HEADER_V1.size])
+            coordinate, self._start = b'int32', _HEADER_V1.size
+        else:
+            raise ShapeError(f"{self.path} is not a trajectory container.")
+
+        self.n_particles, self.chunk_frames = n_particles, chunk_frames
+        self.codec = codec.rstrip(b'\0').decode()
+        self.coordinate_dtype = np.dtype(coordinate.rstrip(b'\0').decode()).type
+        self.dtype = position_dtype(self.coordinate_dtype)
+
+        footer = self._footer()
+        self.chunks, self.rounds = footer if footer else self._walk()
+
+    def __len__(self) -> int:
+        return self.rounds.size
+
+    @property
+    def end(self) -> int:
+        r"""
+        Return (int): byte offset right after the last chunk.
+        """
+        if not self.chunks.size: return self._start
+        last = self.chunks[-1]
+        return int(last['offset'] + last['nbytes'])
+
+    def read(self, start:int=0, stop:int=None) -> np.ndarray:
+        r"""
+        Decode a range of frames.
+
+        Attributes
+
+            start (int) default: 0 :: first frame.
+            stop (int) default: None :: frame after the last, every frame to
+                            the end if None.
+
+        Return (numpy.ndarray): frames x particles array of `dtype`.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        out = np.empty((max(stop - start, 0), self.n_particles),
+                       dtype=self.dtype)
+        if stop <= start: return out
+
+        frames = self.chunks['frame']
+        first = np.searchsorted(frames, start, side='right') - 1
+        last = np.searchsorted(frames, stop, side='left')
+
+        decompress = CODECS[self.codec][1]
+        for chunk in self.chunks[first:last]:
+            x1, x2 = int(chunk['offset']), int(chunk['nbytes'])
+            x3 = x1 + _CHUNK.size + 8 * int(chunk['n_frames'])
+            records = np.frombuffer(decompress(self._map[x3:x1 + x2]),
+                                    dtype=self.dtype)
+            records = records.reshape(-1, self.n_particles)
+
+            # overlap of the chunk with the requested range
+            lo = max(start, int(chunk['frame']))
+            hi = min(stop, int(chunk['frame']) + records.shape[0])
+            x4 = int(chunk['frame'])
+            out[lo - start:hi - start] = records[lo - x4:hi - x4]
+
+        return out
+
+    def frame(self, frame:int) -> list:
+        r"""
+        Attributes
+
+            frame (int) :: number of the frame, negative counts from the end.
+
+        Return (list[dict]): head and tail position of every particle in the
+                        frame, as written to the tracker.
+        """
+        frame = frame + len(self) if frame < 0 else frame
+        if not 0 <= frame < len(self):
+            raise IndexError(f"frame {frame} is not in the trajectory.")
+        return to_frames(self.read(frame, frame + 1))[0]
+
+    def frame_of_round(self, rnd:int) -> int:
+        r"""
+        Attributes
+
+            rnd (int) :: round number.
+
+        Return (int): number of the last frame recorded at or before the round.
+        """
+        frame = int(np.searchsorted(self.rounds, rnd, side='right')) - 1
+        if frame < 0: raise IndexError(f"no frame at or before round {rnd}.")
+        return frame
+
+    def close(self):
+        r"""
+        Release the memory map.
+        """
+        self._map = None
+
+    def _footer(self) -> tuple:
+        r"""
+        Return (tuple): the chunk table and round numbers from the footer, None
+                        if there is no valid footer.
+        """
+        mm = self._map
+        if mm.size < self._start + _TRAILER.size: return None
+
+        x3 = mm[mm.size - _TRAILER.size:]
+        offset, n_chunks, n_frames, magic = _TRAILER.unpack(x3)
+        x1 = offset + n_chunks * CHUNK_DTYPE.itemsize + 8 * n_frames
+        if magic != _FOOTER_MAGIC or x1 + _TRAILER.size != mm.size:
+            return None
+
+        x2 = offset + n_chunks * CHUNK_DTYPE.itemsize
+        chunks = np.frombuffer(mm[offset:x2], dtype=CHUNK_DTYPE)
+        rounds = np.frombuffer(mm[x2:x1], dtype='<i8')
+        return chunks, rounds
+
+    def _walk(self) -> tuple:
+        r"""
+        Return (tuple): the chunk table and round numbers found by walking the
+                        chunk headers, up to the first incomplete chunk.
+        """
+        mm = self._map
+        chunks, rounds = list(), list()
+        offset, frame = self._start, 0
+
+        while offset + _CHUNK.size <= mm.size:
+            magic, n_frames, first_round, nbytes = \
+                            _CHUNK.unpack(mm[offset:offset + _CHUNK.size])
+            if magic != _CHUNK_MAGIC or offset + nbytes > mm.size: break
+
+            x1 = offset + _CHUNK.size
+            x2 = np.frombuffer(mm[x1:x1 + 8 * n_frames], dtype='<i8')
+            chunks.append((frame, first_round, x2[-1], n_frames, offset,
+                           nbytes))
+            rounds.append(x2)
+
+            offset += nbytes
+            frame += n_frames
+
+        rounds = np.concatenate(rounds) if rounds else np.zeros(0, '<i8')
+        return np.array(chunks, dtype=CHUNK_DTYPE), rounds
+
+class TrajectoryWriter(object):
+    r"""
+    Append frames to a trajectory container. Frames are held back until a
+    chunk is full, `flush` writes a partial chunk too.
+
+    Attributes
+
+        path (Path) :: path to the container.
+        n_particles (int) :: number of particles per frame, taken from the
+                        first frame of a new container.
+        chunk_frames (int) :: frames per chunk.
+        codec (str) :: compression of the chunks, one of `CODECS`.
+        coordinate_dtype (type) :: signed integer type of the co-ordinates.
+        n_frames (int) :: number of frames in the container and held back.
+    """
+
+    def __init__(self, path:Path, chunk_frames:int=CHUNK_FRAMES,
+                 codec:str='zlib', coordinate_dtype:type=COORDINATE_DTYPE):
+        r"""
+        Attributes
+
+            path (Path) :: path to the container, frames are appended to it
+                            if it exists.
+            chunk_frames (int) default: CHUNK_FRAMES :: frames per chunk of a
+                            new container.
+            codec (str) default: 'zlib' :: compression of a new container,
+                            one of `CODECS`.
+            coordinate_dtype (type) default: COORDINATE_DTYPE :: signed
+                            integer type of the co-ordinates of a new
+                            container, int64 for configurations beyond the
+                            int32 range.
+        """
+        if codec not in CODECS:
+            raise ValueError(
+                f"unknown codec `{codec}`, use one of {list(CODECS)}."
+            )
+
+        self.path = Path(path)
+        self.chunk_frames, self.codec = chunk_frames, codec
+        self.coordinate_dtype = np.dtype(coordinate_dtype).type
+        self.n_particles = None
+
+        self._chunks = np.zeros(0, dtype=CHUNK_DTYPE)
+        self._rounds = np.zeros(0, dtype='<i8')
+        self._end = None
+        self._pending, self._pending_rounds = list(), list()
+        self._file = None
+
+        if self.path.exists() and self.path.stat().st_size:
+            reader = TrajectoryReader(self.path)
+            self.n_particles = reader.n_particles
+            self.chunk_frames, self.codec = reader.chunk_frames, reader.codec
+            self.coordinate_dtype = reader.coordinate_dtype
+            self._chunks = reader.chunks.copy()
+            self._rounds = reader.rounds.copy()
+            self._end = reader.end
+            reader.close()
+
+    @property
+    def n_frames(self) -> int:
+        return self._rounds.size + len(self._pending)
+
+    def append(self, positions:np.ndarray, rnd:int=None):
+        r"""
+        Add a frame.
+
+        Attributes
+
+            positions (numpy.ndarray) :: n x 4 array of head x, head y, tail x
+                            and tail y of every particle, or n position
+                            records.
+            rnd (int) default: None :: round number of the frame, the frame
+                            number if None.
+        """
+        records = to_records(positions, dtype=position_dtype(
+                                                        self.coordinate_dtype))
+        if self.n_particles is None: self.n_particles = records.shape[0]
+        if records.shape[0] != self.n_particles:
+            raise ShapeError(
+                f"frame of {records.shape[0]} particles in a trajectory of "
+                f"{self.n_particles}."
+            )
+
+        self._pending_rounds.append(self.n_frames if rnd is None else rnd)
+        self._pending.append(records)
+        if len(self._pending) == self.chunk_frames: self.flush()
+
+    def flush(self, fsync:bool=False):
+        r"""
+        Write the frames held back as a chunk, and the footer after it.
+
+        Attributes
+
+            fsync (bool) default: False :: also force them to disk.
+        """
+        if not self._pending:
+            if fsync and self._file is not None: os.fsync(self._file.fileno())
+            return
+
+        if self._file is None: self._open()
+        f = self._file
+
+        payload = CODECS[self.codec][0](np.concatenate(self._pending).tobytes())
+        rounds = np.array(self._pending_rounds, dtype='<i8')
+        nbytes = _CHUNK.size + rounds.nbytes + len(payload)
+
+        chunk = np.array([(self._rounds.size, rounds[0], rounds[-1],
+                           rounds.size, self._end, nbytes)], dtype=CHUNK_DTYPE)
+
+        f.seek(self._end)
+        f.write(_CHUNK.pack(_CHUNK_MAGIC, rounds.size, rounds[0], nbytes))
+        f.write(rounds.tobytes())
+        f.write(payload)
+
+        self._chunks = np.concatenate((self._chunks, chunk))
+        self._rounds = np.concatenate((self._rounds, rounds))
+        self._end += nbytes
+        self._pending, self._pending_rounds = list(), list()
+
+        # the footer after the last chunk
+        f.write(self._chunks.tobytes())
+        f.write(self._rounds.tobytes())
+        f.write(_TRAILER.pack(self._end, self._chunks.size, self._rounds.size,
+                              _FOOTER_MAGIC))
+        f.truncate()
+        f.flush()
+        if fsync: os.fsync(f.fileno())
+
+    def close(self):
+        r"""
+        Write the frames held back and close the file.
+        """
+        self.flush(fsync=True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self):
+        if self._end is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'wb') as f:
+                f.write(_HEADER.pack(
+                    _MAGIC, self.n_particles, self.chunk_frames,
+                    self.codec.encode(),
+                    np.dtype(self.coordinate_dtype).name.encode()
+                ))
+            self._end = _HEADER.size
+
+        self._file = open(self.path, 'rb+')
+
+def to_records(positions:np.ndarray,
+               dtype:np.dtype=POSITION_DTYPE) -> np.ndarray:
+    r"""
+    Attributes
+
+        positions (numpy.ndarray) :: n x 4 array of head x, head y, tail x and
+                        tail y, or position records.
+        dtype (numpy.dtype) default: POSITION_DTYPE :: record type, from
+                        `position_dtype`.
+
+    Return (numpy.ndarray): n records of `dtype`, co-ordinates that do not fit
+                    its type raise an OverflowError instead of wrapping.
+    """
+    if positions.dtype == dtype: return positions
+
+    # position records of another type are checked like plain arrays
+    if positions.dtype.names:
+        positions = np.concatenate((positions['head_pos'],
+                                    positions['tail_pos']), axis=-1)
+
+    x1 = np.asarray(positions).reshape(-1, 4)
+    x2 = np.iinfo(dtype['head_pos'].base)
+    if x1.size and (x1.min() < x2.min or x1.max() > x2.max):
+        raise OverflowError(
+            f"co-ordinates in [{x1.min()}, {x1.max()}] do not fit "
+            f"{dtype['head_pos'].base.name}, record them as int64."
+        )
+
+    records = np.empty(x1.shape[0], dtype=dtype)
+    records['head_pos'], records['tail_pos'] = x1[:, :2], x1[:, 2:]
+    return records
+
+def to_frames(records:np.ndarray) -> list:
+    r"""
+    Return (list[list[dict]]): frames as written to the tracker, from a
+                    frames x particles array of position records.
+    """
+    heads, tails = records['head_pos'].tolist(), records['tail_pos'].tolist()
+    return [[dict(head_pos=h, tail_pos=t) for h, t in zip(x1, x2)]
+                                                for x1, x2 in zip(heads, tails)]
+
+class ParticleIndex(object):
+    r"""
+    Particle-major copy of a trajectory, one contiguous row of positions per
+    particle, so the history of a single particle is one read from a memory
+    map instead of a decode of every frame. Row i holds the particle of row i
+    of the frames, which is bot id i for runs set up by `StateGenerator`.
+
+    Attributes
+
+        path (Path) :: path to the index.
+        positions (numpy.memmap) :: particles x frames array of position
+                        records, of the co-ordinate type they were written
+                        with.
+    """
+
+    def __init__(self, path:Path):
+        r"""
+        Attributes
+
+            path (Path) :: path to the index.
+        """
+        self.path = Path(path)
+        self.positions = np.load(self.path, mmap_mode='r')
+        x1 = self.positions.dtype
+        if x1.names != ('head_pos', 'tail_pos') or self.positions.ndim != 2:
+            raise ShapeError(f"{self.path} is not a particle index.")
+
+    def __len__(self) -> int:
+        return self.positions.shape[1]
+
+    @property
+    def n_particles(self) -> int:
+        return self.positions.shape[0]
+
+    def trajectory(self, bot_id:int, start:int=None,
+                   stop:int=None) -> np.ndarray:
+        r"""
+        Attributes
+
+            bot_id (int) :: row of the particle.
+            start (int) default: None :: first frame, from the first if None.
+            stop (int) default: None :: frame after the last, to the end if
+                            None.
+
+        Return (numpy.ndarray): frames x 4 array of head x, head y, tail x
+                        and tail y of the particle, a view of the memory map.
+        """
+        if not -self.n_particles <= bot_id < self.n_particles:
+            raise IndexError(f"particle {bot_id} is not in the index.")
+
+        x1 = self.positions[bot_id, start:stop]
+        return x1.view(x1.dtype['head_pos'].base).reshape(-1, 4)
+
+    def close(self):
+        r"""
+        Release the memory map.
+        """
+        self.positions = None
+
+def write_particle_index(path:Path, blocks, n_particles:int,
+                         n_frames:int, dtype:np.dtype=POSITION_DTYPE) -> Path:
+    r"""
+    Transpose frame-major blocks into a particle index on disk, one block at
+    a time so the trajectory never has to fit in memory.
+
+    Attributes
+
+        path (Path) :: path to the index, replaced if it exists.
+        blocks (iterable) :: consecutive frames x particles arrays of
+                        position records, or frames x particles x 4 arrays.
+        n_particles (int) :: number of particles per frame.
+        n_frames (int) :: number of frames in all blocks together.
+        dtype (numpy.dtype) default: POSITION_DTYPE :: record type of the
+                        index, from `position_dtype`.
+
+    Return (Path): path to the index.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # written next to the index and moved over it once complete
+    x1 = path.with_name(path.name + '.part')
+    out = np.lib.format.open_memmap(x1, mode='w+', dtype=dtype,
+                                    shape=(n_particles, n_frames))
+
+    frame = 0
+    for block in blocks:
+        block = to_records(block, dtype=dtype).reshape(-1, n_particles)
+        if frame + block.shape[0] > n_frames:
+            raise ShapeError(f"more than {n_frames} frames in the blocks.")
+        out[:, frame:frame + block.shape[0]] = block.T
+        frame += block.shape[0]
+
+    if frame != n_frames:
+        raise ShapeError(f"{frame} frames in the blocks, {n_frames} expected.")
+
+    out.flush()
+    del out
+    os.replace(x1, path)
+    return path
@@ -9,6 +9,7 @@ import psutil
 from amoebot.utils.trigrid import make_triangular_grid
 from amoebot.elements.node.manager import NodeManagerBitArray
 from amoebot.elements.stategen import StateGenerator
+from amoebot.elements.tracker import QUEUE_FRAMES, QueuedTracker, StateTracker
 
 # number of cpu cores available
 N_CORES = psutil.cpu_count(logical=True)
@@ -35,7 +36,12 @@ class AmoebotSimulator(object):
                     max_rnds:int=1000, 
                     n_bots:int=2, 
                     n_cores:int=N_CORES, 
-                    config_num:str=None
+                    config_num:str=None,
+                    extent:tuple=None,
+                    backend:str=None,
+                    track_format:str=None,
+                    track_backpressure:str='block',
+                    track_queue:int=QUEUE_FRAMES
                 ):
         r"""
         Attributes
@@ -53,21 +59,118 @@ class AmoebotSimulator(object):
                                 configuration file with the initial system 
                                 state. If not provided, randomly plave `n_bots` 
                                 on the grid.
+            extent (tuple) default: None :: (x_min, y_min, x_max, y_max) of a 
+                                bounded arena, selects the dense lattice node 
+                                backend when given.
+            backend (str) default: None :: node backend, "bit_array", 
+                                "memmap" or "lattice"; "memmap" keeps nodes in 
+                                files under the run's dump directory, a 
+                                lattice without an extent grows in blocks with 
+                                the swarm.
+            track_format (str) default: None :: format of the tracked states,
+                                "jsonl" or "binary", the tracker's default if 
+                                None.
+            track_backpressure (str) default: 'block' :: what to do with a 
+                                tracked state when the tracker queue is full,
+                                "block", "drop" or "coalesce".
+            track_queue (int) default: QUEUE_FRAMES :: number of tracked 
+                                states waiting to be written.
         """
 
         # generate the amoebot states and create storage dumps
         if config_num:
-            self.generator = StateGenerator(config_num=config_num)
+            self.generator = StateGenerator(config_num=config_num, 
+                                            extent=extent, 
+                                            backend=backend)
         else: raise NotImplementedError
 
+        manager = self.generator.manager
+        manager.tracker.close()
+
+        x1 = StateTracker(config_num, fmt=track_format or 'jsonl', 
+                          coordinate_dtype=manager.amoebots.coordinate_dtype)
+        manager.tracker = QueuedTracker(x1, maxsize=track_queue, 
+                                        backpressure=track_backpressure)
+
         self.algorithm = algorithm
         self.max_rnds = max_rnds
         self.n_cores = n_cores
 
-    def exec_sequential(self, time_it:bool=True) -> float:
+    def exec_sequential(
+                            self, 
+                            time_it:bool=True, 
+                            reorder_every:int=None,
+                            curve_order:bool=False
+                        ) -> float:
         r""" 
         Execute algorithm(s) sequentially.
 
+        Attributes
+
+            time_it (bool) default: True :: set to True if execution is timed.
+            reorder_every (int) default: None :: reorder the node array along 
+                                a space-filling curve every this many rounds.
+            curve_order (bool) default: False :: activate particles in curve 
+                                order within randomly ordered blocks.
+        
+        Returns (float): total execution if `time_it` is True.
+        """
+        if time_it: t0 = time.time()
+
+        x1, x2 = self.max_rnds, self.algorithm
+        self.generator.manager.exec_sequential(max_rnds=x1, algorithm=x2,
+                                               reorder_every=reorder_every,
+                                               curve_order=curve_order)
+
+        if time_it:
+            return time.time() - t0
+
+    def exec_batch(self, time_it:bool=True, coloured:bool=False) -> float:
+        r""" 
+        Execute algorithm(s) with the vectorized batch engine, available for 
+        "random_move" and "compress".
+
+        Attributes
+
+            time_it (bool) default: True :: set to True if execution is timed.
+            coloured (bool) default: False :: play rounds in colour classes of
+                            non-interfering particles.
+        
+        Returns (float): total execution if `time_it` is True.
+        """
+        if time_it: t0 = time.time()
+
+        x1, x2 = self.max_rnds, self.algorithm
+        self.generator.manager.exec_batch(max_rnds=x1, algorithm=x2,
+                                          coloured=coloured)
+
+        if time_it:
+            return time.time() - t0
+
+    def exec_kinetic(self, time_it:bool=True) -> float:
+        r""" 
+        Execute algorithm(s) with the rejection-free engine, available for 
+        "compress" and "mzsolve".
+
+        Attributes
+
+            time_it (bool) default: True :: set to True if execution is timed.
+        
+        Returns (float): total execution if `time_it` is True.
+        """
+        if time_it: t0 = time.time()
+
+        x1, x2 = self.max_rnds, self.algorithm
+        self.generator.manager.exec_kinetic(max_rnds=x1, algorithm=x2)
+
+        if time_it:
+            return time.time() - t0
+
+    def exec_poisson(self, time_it:bool=True) -> float:
+        r""" 
+        Execute algorithm(s) in continuous time with a Poisson clock per 
+        particle, `max_rnds` is taken as the simulated time.
+
         Attributes
 
             time_it (bool) default: True :: set to True if execution is timed.
@@ -77,7 +180,7 @@ class AmoebotSimulator(object):
         if time_it: t0 = time.time()
 
         x1, x2 = self.max_rnds, self.algorithm
-        self.generator.manager.exec_sequential(max_rnds=x1, algorithm=x2)
+        self.generator.manager.exec_poisson(max_time=x1, algorithm=x2)
 
         if time_it:
             return time.time() - t0
@@ -1,4 +1,4 @@
-from numpy import int8, int16, int32, uint8, uint16, uint32, uint64
+from numpy import int8, int16, int32, int64, uint8, uint16, uint32, uint64
 
 int_limits = {int8(8): [int8(-128), int8(127)],
               int8(16): [int16(-32768), int16(32767)],
@@ -22,4 +22,26 @@ def increment_index(ix:object) -> object:
     elif ix < lo_32: ix += uint32(1)
     else: ix += uint64(1)
 
-    return ix
\ No newline at end of file
+    return ix
+
+def coordinate_dtype(extent:tuple) -> type:
+    r"""
+    Pick the signed integer type for lattice co-ordinates once for a whole
+    configuration, so that nothing downstream has to branch on the range.
+
+    Attributes
+        extent (tuple) :: (x_min, y_min, x_max, y_max) of the configuration.
+
+    Returns (type): numpy.int32 if the extent, with a margin for the walk to
+                    grow, fits into 32 bits else numpy.int64.
+    """
+    lower, upper = int_limits[int8(32)]
+
+    # particles may walk far past the initial configuration
+    x_min, y_min, x_max, y_max = (int(v) for v in extent)
+    margin = max(x_max - x_min, y_max - y_min, 1)
+
+    if min(x_min, y_min) - margin >= lower and \
+            max(x_max, y_max) + margin <= upper:
+        return int32
+    return int64
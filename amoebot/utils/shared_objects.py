@@ -3,115 +3,285 @@
 """ shared_objects.py
 """
 
-import pickle
 import numpy as np
 from pathlib import Path
+from multiprocessing import shared_memory
 
 STORE = './.dumps'
 
+def payload_dtype(width:int) -> np.dtype:
+    r"""
+    Return (numpy.dtype): record of a byte payload of up to `width` bytes, its
+                    length and the raw bytes, kept as is.
+    """
+    return np.dtype([('length', np.int64), ('payload', np.uint8, (width,))])
+
+def _is_payload(dtype:np.dtype) -> bool:
+    return dtype.names == ('length', 'payload')
+
 class SharedObjects(object):
     r"""
-    A class for custom shared memory objects for data dumps that can be indexed, 
-    pickled and unpickled much like Redis. Useful in true multiprocessing 
-    implementations.
+    A class for custom shared memory objects for data dumps that can be indexed
+    much like Redis. Every key owns one fixed-size record in a single array, so
+    reading or writing one key costs the same no matter how many keys there
+    are. The array lives in process memory, or in a
+    `multiprocessing.shared_memory` block that worker processes attach to
+    without copying. Nothing touches the disk until `flush` is called.
+
+    Records are rows of a structured numpy dtype; a dictionary of bytes (for
+    example pickled objects) is stored as length-prefixed payloads in slots
+    of a fixed width instead, a payload that outgrows its slot is refused.
 
     Attributes
 
-        sharedfile (Path) :: path to the shared data dump.
+        sharedfile (Path) :: path to the flushed data dump.
         keys (list) :: keys of the data dictionary.
+        records (numpy.ndarray) :: one record per key, in the order of `keys`.
+        shm (SharedMemory) :: shared memory block backing `records`, None in
+                        single-process mode.
     """
-    def __init__(self, config_num:str, data:dict=None):
+    def __init__(
+                    self,
+                    config_num:str,
+                    data:object=None,
+                    shared:bool=False,
+                    slot_bytes:int=None
+                ):
         r"""
         Attributes
 
             config_num (str) :: identifier number for the configuration.
-            data (dict) :: the data dictionary to be stored.
+            data (dict or numpy.ndarray) :: the data dictionary to be stored,
+                            or a structured array keyed by row number.
+            shared (bool) default: False :: if True, place the records in a
+                            shared memory block that other processes can
+                            attach to with `attach`.
+            slot_bytes (int) default: None :: width of the slot of a bytes
+                            value, the longest value if None.
         """
         # keys in the shared dictionary
         self.keys = None
-        
-        # complete path to the shared file
-        self.sharedfile = Path(STORE) / Path(f'run-{config_num}/shared.pickle')
+        self.records = None
+        self.shm = None
+        self._index = dict()
+        self._shared = shared
+
+        # complete path to the flushed dump
+        self.sharedfile = Path(STORE) / Path(f'run-{config_num}/shared.npz')
+
+        if data is not None: self.save(data, slot_bytes=slot_bytes)
 
-        if data is not None: self.save(data)
+    @property
+    def handle(self) -> tuple:
+        r"""
+        Return (tuple): picklable handle a worker process passes to `attach`.
+        """
+        if self.shm is None:
+            raise ValueError("only shared stores can be attached to.")
+        return (self.shm.name, self.records.dtype, self.keys, self.sharedfile)
 
-    def save(self, data:dict):
+    @classmethod
+    def attach(cls, handle:tuple) -> 'SharedObjects':
         r"""
-        Save the data dictionary to pre-specified data dump.
+        Attach to the records of a shared store from another process, without
+        copying them.
 
         Attributes
 
-            data (dict) :: the data dictionary to be stored.
+            handle (tuple) :: the `handle` of the shared store.
         """
+        name, dtype, keys, sharedfile = handle
+
+        store = cls.__new__(cls)
+        store.sharedfile = sharedfile
+        store._shared = True
+        store.shm = shared_memory.SharedMemory(name=name)
+        store._set_records(
+            np.ndarray((len(keys),), dtype=dtype, buffer=store.shm.buf), keys
+        )
+        return store
+
+    @classmethod
+    def from_file(cls, config_num:str, shared:bool=False) -> 'SharedObjects':
+        r"""
+        Restore a store from its last `flush`.
 
-        with open(self.sharedfile, 'wb') as f:
-            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
-
-        self.keys = list(data.keys())
-
-        # mark for garbage collection
-        del data
+        Attributes
 
-    def load(self) -> list:
-        r"""
-        Load the data values from the dump as as a list.
+            config_num (str) :: identifier number for the configuration.
+            shared (bool) default: False :: place the records in shared memory.
         """
-
+        store = cls(config_num, shared=shared)
         try:
-            with open(self.sharedfile, 'rb') as f:
-                sh_data = pickle.load(f)
-
-            return sh_data
-
+            with np.load(store.sharedfile, allow_pickle=False) as dump:
+                store._place(dump['records'], dump['keys'].tolist())
         except FileNotFoundError:
             raise FileNotFoundError(
-                f"could not find {self.sharedfile}, call `save` before `load`."
+                f"could not find {store.sharedfile}, call `flush` first."
             )
+        return store
 
-    def iwrite(self, key:np.uint8, data:object):
+    def save(self, data:object, slot_bytes:int=None):
         r"""
-        Indexed write to the data.
+        Place the data dictionary into the records, replacing earlier data.
 
         Attributes
 
-            key (numpy.uint8) :: the key to index into the data dictionary.
-            data (object) :: object to be written into index position given by
-                            `key`.
+            data (dict or numpy.ndarray) :: the data dictionary to be stored,
+                        or a structured array keyed by row number.
+            slot_bytes (int) default: None :: width of the slot of a bytes
+                        value, the longest value if None.
+
+        Raises TypeError for values that only an object array holds, such as
+        dictionaries or None.
         """
+        if isinstance(data, np.ndarray):
+            keys, records = list(range(data.shape[0])), data
+        else:
+            keys = list(data.keys())
+            values = list(data.values())
+
+            # variable length payloads share slots of the longest one
+            if values and isinstance(values[0], bytes):
+                width = max(len(v) for v in values)
+                if slot_bytes is not None:
+                    if slot_bytes < width:
+                        raise ValueError(
+                            f"a value of {width} bytes does not fit slots "
+                            f"of {slot_bytes}."
+                        )
+                    width = slot_bytes
+
+                records = np.zeros(len(values), dtype=payload_dtype(width))
+                for record, value in zip(records, values):
+                    self._pack(record, value)
+            else:
+                records = np.array(values)
+
+        # shared memory holds raw bytes, object references do not survive it
+        if records.dtype.hasobject:
+            raise TypeError(
+                f"values of {records.dtype} records can not be shared, "
+                f"store them as bytes."
+            )
 
-        try:
-            with open(self.sharedfile, 'rb') as f:
-                sh_data = pickle.load(f)
-            sh_data[key] = data
-            with open(self.sharedfile, 'wb') as f:
-                pickle.dump(sh_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._place(records, keys)
 
-            # mark for garbage collection
-            del sh_data
+        # mark for garbage collection
+        del data
 
-        except FileNotFoundError:
-            raise FileNotFoundError(
-                f"could not find {self.sharedfile}, call `save` before `iwrite`."
-            )
+    def load(self) -> dict:
+        r"""
+        Load the data values as a dictionary.
+        """
+        if self.records is None:
+            raise ValueError("call `save` before `load`.")
+        if _is_payload(self.records.dtype):
+            return {k: self._unpack(r) for k, r in zip(self.keys, self.records)}
+        return dict(zip(self.keys, self.records))
 
-    def ifetch(self, key:np.uint8) -> object:
+    def iwrite(self, key:int, data:object):
         r"""
-        Indexed read from the data.
+        Indexed write to the data, O(1) in the number of keys.
 
         Attributes
 
-            key (numpy.uint8) :: the key to index into the data dictionary.
+            key (int) :: the key to index into the data dictionary, a bot
+                            identifier of any width.
+            data (object) :: record to be written into index position given by
+                            `key`, it must fit the record dtype or the slot
+                            of a bytes value.
         """
         try:
-            with open(self.sharedfile, 'rb') as f:
-                sh_data = pickle.load(f)
+            ix = self._index[key]
+        except KeyError:
+            raise KeyError(f"{key} is not in the store, call `save` with it.")
 
-            return sh_data[key]
-        except FileNotFoundError:
-            raise FileNotFoundError(
-                f"could not find {self.sharedfile}, call `save` before `iread.`"
-            )
+        if _is_payload(self.records.dtype) and isinstance(data, bytes):
+            self._pack(self.records[ix], data)
+        else:
+            self.records[ix] = data
+
+    def ifetch(self, key:int) -> object:
+        r"""
+        Indexed read from the data, O(1) in the number of keys. Structured
+        records come back as views into the store, bytes values as copies.
+
+        Attributes
+
+            key (int) :: the key to index into the data dictionary, a bot
+                            identifier of any width.
+        """
+        try:
+            record = self.records[self._index[key]]
+        except KeyError:
+            raise KeyError(f"{key} is not in the store, call `save` with it.")
 
+        if _is_payload(self.records.dtype): return self._unpack(record)
+        return record
 
+    def flush(self):
+        r"""
+        Persist the records and keys to `sharedfile`.
+        """
+        self.sharedfile.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.sharedfile, 'wb') as f:
+            np.savez(f, records=self.records, keys=np.array(self.keys))
+
+    def close(self):
+        r"""
+        Detach from the shared memory block, the owner should `unlink` too.
+        """
+        if self.shm is not None:
+            self.records = None
+            self.shm.close()
 
+    def unlink(self):
+        r"""
+        Free the shared memory block once every process has closed it.
+        """
+        if self.shm is not None:
+            self.shm.unlink()
+
+    @staticmethod
+    def _pack(record:np.void, value:bytes):
+        r"""
+        Write a bytes value into its slot, refusing one that does not fit.
+        """
+        width = record['payload'].size
+        if len(value) > width:
+            raise ValueError(
+                f"a value of {len(value)} bytes does not fit its slot of "
+                f"{width}, save the store again with larger `slot_bytes`."
+            )
 
+        record['length'] = len(value)
+        record['payload'][:len(value)] = np.frombuffer(value, dtype=np.uint8)
+
+    @staticmethod
+    def _unpack(record:np.void) -> bytes:
+        return record['payload'][:record['length']].tobytes()
+
+    def _place(self, records:np.ndarray, keys:list):
+        if self.shm is not None:
+            self.close()
+            self.unlink()
+            self.shm = None
+
+        if self._shared:
+            self.shm = shared_memory.SharedMemory(
+                                        create=True, size=max(records.nbytes, 1)
+                                    )
+            shared = np.ndarray(records.shape, dtype=records.dtype,
+                                buffer=self.shm.buf)
+            shared[...] = records
+            records = shared
+        else:
+            records = records.copy()
+
+        self._set_records(records, keys)
+
+    def _set_records(self, records:np.ndarray, keys:list):
+        self.records = records
+        self.keys = list(keys)
+        self._index = {k: ix for ix, k in enumerate(self.keys)}
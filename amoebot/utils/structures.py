@@ -88,4 +88,78 @@ class PersistentStore(object):
         # create a unique file for every run using config_num
         save_as = f'run-{self.config_num}'
 
-        self.save_as = f'{save_as}.pkl' 
\ No newline at end of file
+        self.save_as = f'{save_as}.pkl'
+
+
+class SumTree(object):
+    r"""
+    Binary tree over non-negative weights where every inner node holds the sum
+    of its children. Setting a weight and drawing an index in proportion to
+    the weights both cost O(log n). Inner sums are recomputed from the
+    children on every update, so no rounding error builds up.
+
+    Attributes
+
+        size (int) :: number of weights.
+        capacity (int) :: number of leaves, the next power of two.
+    """
+
+    def __init__(self, size:int, weights:list=None):
+        r"""
+        Attributes
+
+            size (int) :: number of weights.
+            weights (list) default: None :: initial weights, all 0 if None.
+        """
+        self.size = size
+        self.capacity = capacity = 1 << max(size - 1, 0).bit_length()
+
+        # leaves first, then every level up to the root at index 1
+        levels = [[0.] * capacity]
+        if weights is not None: levels[0][:size] = map(float, weights)
+        while len(levels[-1]) > 1:
+            below = levels[-1]
+            levels.append([below[i] + below[i + 1] 
+                                    for i in range(0, len(below), 2)])
+
+        self._tree = [0.]
+        for level in reversed(levels): self._tree.extend(level)
+
+    @property
+    def total(self) -> float:
+        return self._tree[1]
+
+    def __getitem__(self, index:int) -> float:
+        return self._tree[index + self.capacity]
+
+    def __setitem__(self, index:int, weight:float):
+        tree = self._tree
+        i = index + self.capacity
+        tree[i] = weight
+
+        i >>= 1
+        while i:
+            tree[i] = tree[2 * i] + tree[2 * i + 1]
+            i >>= 1
+
+    def find(self, u:float) -> int:
+        r"""
+        Attributes
+
+            u (float) :: a value in [0, `total`).
+
+        Return (int): index i of the weight with prefix sum up to i - 1 at most
+                        `u` and up to i above it.
+        """
+        tree, capacity = self._tree, self.capacity
+
+        i = 1
+        while i < capacity:
+            i <<= 1
+            if u >= tree[i]:
+                u -= tree[i]
+                i += 1
+
+        # rounding can step onto an empty leaf right of the last weight
+        while tree[i] == 0. and i > capacity: i -= 1
+        return i - capacity
@@ -3,7 +3,7 @@
 """ trigrid.py
 """
 
-from .limits import int_limits, uint_limits
+from .limits import int_limits, uint_limits, coordinate_dtype
 
 import numpy as np
 
@@ -121,7 +121,12 @@ def uint_grid_points(
                                   dtype='uint64') for row in range(nrows)])
     return grid
 
-def make_triangular_grid(x:int, y:int=None, origin:object=None) -> np.array:
+def make_triangular_grid(
+                            x:int, 
+                            y:int=None, 
+                            origin:object=None, 
+                            dtype:type=None
+                        ) -> np.array:
     r"""
     Generate points on the triangular grid.
 
@@ -131,6 +136,9 @@ def make_triangular_grid(x:int, y:int=None, origin:object=None) -> np.array:
                         to `x` if None.
         origin (list or numpy.array) default: None :: anchor point for the grid,
                         typically a corner point
+        dtype (type) default: None :: signed integer type of the points, 
+                        picked from the extent of the grid with 
+                        `coordinate_dtype` if None.
     
     Returns (numpy.array): list of points on the triangular grid.
     """
@@ -165,24 +173,16 @@ def make_triangular_grid(x:int, y:int=None, origin:object=None) -> np.array:
     end_point_x = origin[0] + (x * 2)
     end_point_y = origin[1] + y
 
-    # start x is negative
-    if start_point_x < 0:
-
-        # produce signed x components of the grid
-        grid_x = int_grid_points(start=start_point_x, end=end_point_x, 
-                                nrows=y, component='x')
-    # start x is positive
-    else:
-        # produce unsigned x components of the grid
-        grid_x = uint_grid_points(start=start_point_x, end=end_point_x, 
-                                nrows=y, component='x')
-
-    if start_point_y < 0:
-        grid_y = int_grid_points(start=start_point_y, end=end_point_y, 
-                                nrows=y, component='y', ncols=x)
-    else:
-        grid_y = uint_grid_points(start=start_point_y, end=end_point_y, 
-                                nrows=y, component='y', ncols=x)
+    # one signed type for both components, chosen from the whole extent so
+    # that large grids do not wrap around
+    if dtype is None:
+        dtype = coordinate_dtype((start_point_x, start_point_y, 
+                                  end_point_x, end_point_y))
+
+    grid_x = np.array([np.arange(start_point_x, end_point_x, 2, dtype=dtype) 
+                                                        for _ in range(y)])
+    grid_y = np.array([np.full(x, start_point_y + row, dtype=dtype) 
+                                                        for row in range(y)])
 
     # offset odd columns by one
     for row in range(y):
@@ -2,32 +2,40 @@ from django.http import JsonResponse
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 import os
+import shutil
 
 import json
 from pathlib import Path
 from amoebot.simulator import AmoebotSimulator
+from amoebot.elements.tracker import read_tracks
 
 # the hidden file dump
 STORE = './.dumps'
 
 
-def _fetch_run(dir_name: str) -> tuple:
+def _fetch_run(dir_name: str, start: int = None, stop: int = None) -> tuple:
     r"""
     """
 
     # complete path to the state files
     config0file = Path(STORE) / Path(dir_name) / Path('init0.json')
-    tracks_file = Path(STORE) / Path(dir_name) / Path('tracks.json')
 
     with open(config0file, 'r') as f:
         config0 = json.load(f)
 
-    with open(tracks_file, 'r') as f:
-        tracks = json.load(f)
+    tracks = read_tracks(Path(STORE) / Path(dir_name), start=start, stop=stop)
 
     return (config0, tracks)
 
 
+def _frame_range(request: object) -> dict:
+    r""" optional `start` and `stop` frames of the query string
+    """
+    return {
+        k: int(request.GET[k]) for k in ('start', 'stop') if k in request.GET
+    }
+
+
 def index(request: object):
     r""" render index page from template
     """
@@ -38,7 +46,7 @@ def history(request: object, run: str) -> object:
     r"""
     """
     if request.method == 'GET':
-        config0, tracks = _fetch_run(dir_name=run)
+        config0, tracks = _fetch_run(dir_name=run, **_frame_range(request))
         response = dict(
             config0=config0,
             tracks=tracks
@@ -62,15 +70,21 @@ def _check_run_existence(run):
 
 def _empty_run_data(run):
     for e in (Path(STORE) / Path(run)).iterdir():
-        if e.name != "init0.json":
+        if e.name == "init0.json":
+            continue
+        # the memmap node backend keeps its files in a `nodes` directory
+        if e.is_dir():
+            shutil.rmtree(e)
+        else:
             os.remove(e)
 
 
-def _run_algorithm(algorithm, config_number, rounds=None):
+def _run_algorithm(algorithm, config_number, rounds=None, track_format=None):
     sim = AmoebotSimulator(
         max_rnds=rounds,
         config_num=config_number,
-        algorithm=algorithm
+        algorithm=algorithm,
+        track_format=track_format
     )
     sim.exec_sequential(time_it=True)
 
@@ -79,7 +93,7 @@ def _run_algorithm(algorithm, config_number, rounds=None):
 def algorithms(request: object, run: str = None) -> object:
     if request.method == 'GET':
         if run:
-            config0, tracks = _fetch_run(dir_name=run)
+            config0, tracks = _fetch_run(dir_name=run, **_frame_range(request))
             response = dict(
                 config0=config0,
                 tracks=tracks
@@ -96,6 +110,7 @@ def algorithms(request: object, run: str = None) -> object:
         rounds = 5000
         if "rounds" in data:
             rounds = data.pop("rounds")
+        track_format = data.pop("format", None)
         run_name = "run-" + config_number
         dir_path = Path(STORE) / Path(run_name)
         if _check_run_existence(run_name):
@@ -107,7 +122,8 @@ def algorithms(request: object, run: str = None) -> object:
             json.dump(data, json_file)
 
         _run_algorithm(
-            algorithm=algorithm_name, config_number=config_number, rounds=rounds
+            algorithm=algorithm_name, config_number=config_number,
+            rounds=rounds, track_format=track_format
         )
 
         config0, tracks = _fetch_run(dir_name=run_name)
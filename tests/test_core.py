@@ -36,6 +36,41 @@ def test_trigrid_large():
 
     assert True
 
+def test_trigrid_wide_coordinates():
+    r""" test that grids past the int32 range keep their co-ordinates
+    """
+    import numpy as np
+    from amoebot.utils.trigrid import make_triangular_grid
+
+    origin = [3 * 10 ** 9, -(3 * 10 ** 9)]
+    points = make_triangular_grid(4, 3, origin=origin)
+
+    assert points.dtype == np.int64
+    assert points[0, 0].tolist() == [origin[1], origin[0]]
+    assert points[2, 3].tolist() == [origin[1] + 2, origin[0] + 6]
+
+def test_wide_configuration_backends(tmp_path, monkeypatch):
+    r""" test that a configuration past the int32 range runs on int64 node
+    stores and is refused by the lattice backend, whose keys cannot hold it
+    """
+    import json
+    import numpy as np
+    from amoebot.elements.stategen import StateGenerator
+    from amoebot.utils.exceptions import InitializationError
+
+    far = 3 * 10 ** 9
+    monkeypatch.chdir(tmp_path)
+    run = tmp_path / '.dumps' / 'run-wide'
+    run.mkdir(parents=True)
+    with open(run / 'init0.json', 'w') as f:
+        json.dump(dict(bots=[[far, far], [far + 1, far + 1]], walls=[]), f)
+
+    manager = StateGenerator(config_num='wide', backend='bit_array').manager
+    assert manager.amoebots.head_x.dtype == np.int64
+
+    with pytest.raises(InitializationError):
+        StateGenerator(config_num='wide', backend='lattice')
+
 def test_nodemanager_add_single_node():
     r"""
     """
@@ -84,3 +119,737 @@ def test_algorithm_sequential():
     r"""
     """
     assert True
+
+def test_particle_table_views():
+    r""" test that agents read and write their row of the particle table
+    """
+    import numpy as np
+    from amoebot.elements.bot.table import ParticleTable
+
+    table = ParticleTable(capacity=1)
+    for ix in range(5):
+        table.add(ix, head=np.array([ix, ix]))
+
+    agent = table[3]
+    agent.head = np.array([4, 6])
+    agent.cflag = 1
+    agent.h_neighbor_status[2] = 0
+
+    assert len(table) == 5 and table.capacity >= 5
+    assert (table.head_x[3], table.head_y[3]) == (4, 6)
+    assert not agent._is_contracted
+    assert table[3].cflag == 1
+    assert table[3].open_ports().tolist() == [2]
+    assert table[3]._getid() == 3
+    assert ParticleTable.bytes_per_particle() < 64
+
+def test_bot_ids_past_uint8(tmp_path, monkeypatch):
+    r""" test that 100k particles keep distinct identifiers end to end
+    """
+    import json
+    import numpy as np
+    from amoebot.elements.stategen import StateGenerator
+
+    n_bots, width = 100_000, 400
+    bots = [[x, 2 * (ix // width) + x % 2] 
+                for ix, x in enumerate(np.arange(n_bots) % width)]
+    bots = np.array(bots).tolist()
+
+    monkeypatch.chdir(tmp_path)
+    run = tmp_path / '.dumps' / 'run-wide'
+    run.mkdir(parents=True)
+    with open(run / 'init0.json', 'w') as f:
+        json.dump(dict(bots=bots, walls=[]), f)
+
+    manager = StateGenerator(config_num='wide').manager
+    table = manager.amoebots
+
+    assert len(table) == n_bots
+    assert np.array_equal(table.bot_id[:n_bots], np.arange(n_bots))
+
+    last = table[n_bots - 1]
+    assert last._getid() == n_bots - 1
+    assert last.head.tolist() == bots[-1]
+
+    nm = manager._AmoebotManager__nmap.retarget(bot_id=n_bots - 1)
+    assert nm.current_position()[0].tolist() == bots[-1]
+    assert nm.nodes.bot_id[nm.working_nodes[0]] == n_bots - 1
+
+    states = table.states()
+    assert len(states) == n_bots and states[-1]['head_pos'] == bots[-1]
+
+def test_shared_objects_records(tmp_path, monkeypatch):
+    r""" test indexed access, shared attachment and flushing of the store
+    """
+    import pickle
+    import numpy as np
+    from amoebot.elements.bot.table import ParticleTable
+    from amoebot.utils.shared_objects import SharedObjects
+
+    table = ParticleTable()
+    for ix in range(300):
+        table.add(ix, head=np.array([ix, ix]))
+
+    monkeypatch.chdir(tmp_path)
+    store = SharedObjects('shm', data=table.records(), shared=True)
+    worker = SharedObjects.attach(store.handle)
+
+    record = worker.ifetch(299)
+    record['cflag'] = 1
+    assert store.ifetch(299)['cflag'] == 1
+
+    store.iwrite(5, store.ifetch(299))
+    assert worker.ifetch(5)['head_x'] == 299
+
+    store.flush()
+    worker.close()
+    table.load_records(store.records)
+    store.close()
+    store.unlink()
+
+    assert table[5].head.tolist() == [299, 299]
+    restored = SharedObjects.from_file('shm')
+    assert restored.ifetch(299)['cflag'] == 1
+
+    pickles = SharedObjects('bytes', data={0: b'ab', 1: b'abcd'})
+    pickles.iwrite(0, b'xyz')
+    assert pickles.ifetch(0) == b'xyz' and pickles.ifetch(1) == b'abcd'
+
+    # trailing NUL bytes of binary payloads survive the store
+    pickles.iwrite(1, b'ab\x00\x00')
+    assert pickles.ifetch(1) == b'ab\x00\x00'
+    assert pickles.load() == {0: b'xyz', 1: b'ab\x00\x00'}
+
+    # a payload larger than its slot is refused, not cut off
+    with pytest.raises(ValueError):
+        pickles.iwrite(0, b'abcde')
+    assert pickles.ifetch(0) == b'xyz'
+
+    grown = pickle.dumps(list(range(50)))
+    pickles = SharedObjects('bytes', data={0: pickle.dumps([])},
+                            slot_bytes=len(grown))
+    pickles.iwrite(0, grown)
+    assert pickle.loads(pickles.ifetch(0)) == list(range(50))
+
+    # values that only an object array holds are refused, not pickled
+    with pytest.raises(TypeError):
+        SharedObjects('optional', data={0: None, 1: 2})
+    with pytest.raises(TypeError):
+        SharedObjects('objects', data={0: {'a': 1}, 1: {'b': 2}})
+
+def test_batch_engines_refuse_unpackable_points():
+    r""" test that the batch engines refuse co-ordinates whose packed keys
+    would collide, even when the int64 columns hold them
+    """
+    import numpy as np
+    from amoebot.elements.bot.batch import CompressEngine
+    from amoebot.elements.bot.kinetic import CompressKineticEngine
+    from amoebot.elements.bot.table import ParticleTable
+    from amoebot.elements.node.chunked import BIAS
+    from amoebot.utils.exceptions import InitializationError
+
+    for x in (BIAS - 4, -BIAS):
+        table = ParticleTable(coordinate_dtype=np.int64)
+        table.add(0, head=np.array([x, 0]))
+        table.add(1, head=np.array([x + 2, 0]))
+        for engine_cls in (CompressEngine, CompressKineticEngine):
+            with pytest.raises(InitializationError):
+                engine_cls(table)
+
+    table = ParticleTable(coordinate_dtype=np.int64)
+    table.add(0, head=np.array([BIAS // 2, 0]))
+    CompressEngine(table)
+
+def test_batch_random_move_matches_sequential():
+    r""" test that a batch round equals the sequential round it stands for
+    """
+    import numpy as np
+    from amoebot.elements.bot.batch import RandomMoveEngine
+    from amoebot.elements.bot.table import ParticleTable
+    from amoebot.elements.node.manager import NodeManagerBitArray
+
+    # a tight block of particles so that conflicts are common
+    n_bots = 60
+    bots = [[x, 2 * (ix // 6) + x % 2] for ix, x in 
+                                        enumerate(np.arange(n_bots) % 6)]
+    walls = np.array([[-1, y] for y in range(-1, 30, 2)])
+
+    table = ParticleTable()
+    points = np.zeros((4, n_bots), dtype=np.int64)
+    for ix, (x, y) in enumerate(bots):
+        table.add(ix, head=np.array([x, y]))
+        points[:, ix] = x, y, x, y
+
+    nm = NodeManagerBitArray(points=points)
+    for wall in walls.tolist(): nm.add_wall(point=tuple(wall))
+    engine = RandomMoveEngine(table, walls=nm.wall_points())
+
+    for seed in range(20):
+        # replay the draws of the engine on the node manager, bot by bot
+        expanded = [len(nm.working_nodes_by_bot[ix]) == 2 
+                                                for ix in range(n_bots)]
+        contracted = [ix for ix in range(n_bots) if not expanded[ix]]
+
+        np.random.seed(seed)
+        rank = np.random.permutation(n_bots)
+        ports = dict(zip(contracted, 
+                         np.random.randint(6, size=len(contracted)).tolist()))
+
+        for ix in np.argsort(rank).tolist():
+            nm.retarget(bot_id=ix)
+            if expanded[ix]: nm.contract_forward()
+            else: nm.move_to(port=ports[ix])
+
+        np.random.seed(seed)
+        engine.step()
+
+        for ix in range(n_bots):
+            head, tail = nm.retarget(bot_id=ix).current_position().tolist()
+            assert table[ix].head.tolist() == head
+            assert table[ix].tail.tolist() == tail
+
+def test_compression_lookup_matches_graph_search():
+    r""" test the compression tables against the graph search on every
+    neighbourhood
+    """
+    import numpy as np
+    from amoebot.elements.bot.batch import RELATIVE_POINTS
+    from amoebot.elements.bot.functional import \
+        _verify_compression_property_1, _verify_compression_property_2
+    from amoebot.elements.bot.lookup import PROPERTY, HOLE_SAFE, EDGE_DELTA
+    from amoebot.elements.node.lattice import NodeManagerLattice
+    from amoebot.elements.node.manager import NodeManagerBitArray
+    from amoebot.elements.node.manager_utils import NEIGHBORHOOD_RING
+
+    for port in range(6):
+        head = RELATIVE_POINTS[port]
+        ring = [(head if from_head else 0) + RELATIVE_POINTS[(port + o) % 6]
+                                    for from_head, o in NEIGHBORHOOD_RING]
+
+        for mask in range(len(PROPERTY)):
+            bots = [np.zeros(2)] + [ring[i] for i in range(8) if mask >> i & 1]
+            points = np.array([[x, y, x, y] for x, y in bots]).T
+
+            for nm in (NodeManagerBitArray(points=points),
+                       NodeManagerLattice(points=points)):
+                assert nm.retarget(bot_id=0).move_to(port=port)
+                assert nm.neighborhood_mask() == mask
+
+                h_neighbors, t_neighbors = nm.get_occupied_neighbors()
+                e_head, e_tail = len(h_neighbors), len(t_neighbors)
+                assert EDGE_DELTA[mask] == e_head - e_tail
+                assert HOLE_SAFE[mask] == (e_tail != 5)
+
+                f = _verify_compression_property_1 if \
+                    h_neighbors & t_neighbors else \
+                    _verify_compression_property_2
+                assert PROPERTY[mask] == bool(f(nm, h_neighbors, t_neighbors))
+
+def test_batch_compress_matches_sequential():
+    r""" test that a batch compression round equals the sequential round it
+    stands for
+    """
+    import numpy as np
+    from amoebot.elements.bot.batch import CompressEngine
+    from amoebot.elements.bot.lookup import ADMISSIBLE, EDGE_DELTA
+    from amoebot.elements.bot.table import ParticleTable
+    from amoebot.elements.node.manager import NodeManagerBitArray
+
+    n_bots, width, tau = 100, 10, .4
+    bots = [[x, 2 * (ix // width) + x % 2] for ix, x in 
+                                        enumerate(np.arange(n_bots) % width)]
+
+    table = ParticleTable()
+    points = np.zeros((4, n_bots), dtype=np.int64)
+    for ix, (x, y) in enumerate(bots):
+        table.add(ix, head=np.array([x, y]))
+        table.tau[ix] = tau
+        points[:, ix] = x, y, x, y
+
+    nm = NodeManagerBitArray(points=points)
+    for y in range(-1, 2 * n_bots // width, 2): nm.add_wall(point=(-1, y))
+    engine = CompressEngine(table, walls=nm.wall_points())
+    _lambda = np.exp(1 / np.float64(table.tau[0]))
+
+    for seed in range(10):
+        # replay the draws of the engine on the node manager, bot by bot
+        np.random.seed(seed)
+        rank = np.random.permutation(n_bots)
+        ports = np.random.randint(6, size=n_bots)
+        q = np.random.uniform(size=n_bots)
+
+        for ix in np.argsort(rank).tolist():
+            nm.retarget(bot_id=ix)
+            if not nm.move_to(port=ports[ix]): continue
+
+            mask = nm.neighborhood_mask()
+            if ADMISSIBLE[mask] and q[ix] < _lambda ** EDGE_DELTA[mask]: 
+                nm.contract_forward()
+            else: 
+                nm.contract_backward()
+
+        np.random.seed(seed)
+        engine.step()
+
+        for ix in range(n_bots):
+            head, tail = nm.retarget(bot_id=ix).current_position().tolist()
+            assert table[ix].head.tolist() == head
+            assert table[ix].tail.tolist() == tail
+
+def test_poisson_clock_parks_frozen_particles(tmp_path, monkeypatch):
+    r""" test that a particle with no valid move is activated once and then
+    parked, while the others keep moving in continuous time
+    """
+    import json
+    import numpy as np
+    from amoebot.elements.bot.manager import AmoebotManager
+    from amoebot.elements.stategen import StateGenerator
+
+    # bot 0 is walled in on all sides, bot 1 is free
+    bots = [[0, 0], [20, 0]]
+    walls = [[-1, 1], [0, 2], [1, 1], [1, -1], [0, -2], [-1, -1]]
+
+    monkeypatch.chdir(tmp_path)
+    run = tmp_path / '.dumps' / 'run-clock'
+    run.mkdir(parents=True)
+    with open(run / 'init0.json', 'w') as f:
+        json.dump(dict(bots=bots, walls=walls), f)
+
+    manager = StateGenerator(config_num='clock').manager
+
+    activations = {0: 0, 1: 0}
+    exec_one_step = AmoebotManager._exec_one_step
+    def counted(self, amoebot_t, **kwargs):
+        activations[int(amoebot_t[0])] += 1
+        return exec_one_step(self, amoebot_t, **kwargs)
+    monkeypatch.setattr(AmoebotManager, '_exec_one_step', counted)
+
+    np.random.seed(0)
+    manager.exec_poisson(max_time=50., algorithm='random_move')
+
+    assert activations[0] == 1 and activations[1] > 25
+    assert manager.amoebots[0].head.tolist() == [0, 0]
+
+    for ix in range(2):
+        nm = manager._AmoebotManager__nmap.retarget(bot_id=ix)
+        agent = manager.amoebots[ix]
+        head, tail = nm.current_position().tolist()
+        assert [agent.head.tolist(), agent.tail.tolist()] == [head, tail]
+
+def test_coloured_rounds_match_sequential_statistics():
+    r""" test that colour classes are far enough apart and that coloured 
+    rounds agree with sequential rounds in distribution
+    """
+    import numpy as np
+    from amoebot.elements.bot.batch import COLOUR_SPACING, RandomMoveEngine
+    from amoebot.elements.bot.batch import lattice_colours
+    from amoebot.elements.bot.table import ParticleTable
+
+    x, y = np.mgrid[-8:8, -16:16].reshape(2, -1)
+    x, y = x[(x + y) % 2 == 0], y[(x + y) % 2 == 0]
+    colours = lattice_colours(x, y)
+
+    # hexagonal distance between every pair of points of one colour
+    dx, dr = x[:, None] - x, ((y - x) // 2)[:, None] - (y - x) // 2
+    distance = (np.abs(dx) + np.abs(dr) + np.abs(dx + dr)) // 2
+    same = (colours[:, None] == colours) & (distance > 0)
+    assert distance[same].min() >= COLOUR_SPACING
+
+    n_bots, n_rnds, n_runs = 20, 30, 30
+    displacement = {False: list(), True: list()}
+    for coloured in displacement:
+        for seed in range(n_runs):
+            np.random.seed(seed)
+            table = ParticleTable()
+            for ix in range(n_bots): table.add(ix, head=np.array([0, 2 * ix]))
+
+            engine = RandomMoveEngine(table, coloured=coloured)
+            for _ in range(n_rnds): engine.step()
+
+            dx = table.head_x[:n_bots].astype(np.float64)
+            dy = table.head_y[:n_bots] - 2. * np.arange(n_bots)
+            displacement[coloured].append(np.mean(dx ** 2 + dy ** 2))
+
+    # mean squared displacement within four standard errors
+    x1, x2 = np.array(displacement[False]), np.array(displacement[True])
+    error = np.sqrt((x1.var(ddof=1) + x2.var(ddof=1)) / n_runs)
+    assert abs(x1.mean() - x2.mean()) < 4 * error
+
+def test_async_domains_partition_and_run(tmp_path, monkeypatch):
+    r""" test that strips split the particles into non-interfering interiors
+    and a halo, and that a multi-process run keeps the nodes consistent
+    """
+    import json
+    import numpy as np
+    from amoebot.elements.bot.domain import HALO, halo_rows, interior_rows
+    from amoebot.elements.bot.domain import strip_bounds
+    from amoebot.elements.stategen import StateGenerator
+
+    n_bots, width = 400, 20
+    bots = [[x, 2 * (ix // width) + x % 2] 
+                for ix, x in enumerate(np.arange(n_bots) % width)]
+    walls = [[-3 + y % 2, y] for y in range(-4, 44)]
+
+    monkeypatch.chdir(tmp_path)
+    run = tmp_path / '.dumps' / 'run-domains'
+    run.mkdir(parents=True)
+    with open(run / 'init0.json', 'w') as f:
+        json.dump(dict(bots=np.array(bots).tolist(), walls=walls), f)
+
+    manager = StateGenerator(config_num='domains').manager
+    table = manager.amoebots
+
+    strips = strip_bounds(table, N_CORES)
+    interiors = [interior_rows(table, lo, hi) for lo, hi in strips]
+    rows = np.concatenate(interiors + [halo_rows(table, strips)])
+    assert np.array_equal(np.sort(rows), np.arange(n_bots))
+
+    # interiors of neighbouring strips are at least two halos apart
+    for left, right in zip(interiors, interiors[1:]):
+        if left.size and right.size:
+            x1 = table.head_x[right].min() - table.head_x[left].max()
+            assert x1 >= 2 * HALO
+
+    np.random.seed(0)
+    manager.exec_async(n_cores=N_CORES, max_rnds=5, algorithm='compress')
+
+    points = set()
+    nm = manager._AmoebotManager__nmap
+    for ix in range(n_bots):
+        agent = table[ix]
+        head, tail = agent.head.tolist(), agent.tail.tolist()
+        assert nm.retarget(bot_id=ix).current_position().tolist() == \
+                                                                [head, tail]
+        points |= {tuple(head), tuple(tail)}
+
+    assert len(points) == n_bots
+    assert not points & {tuple(wall) for wall in walls}
+
+def test_async_strips_commute_across_boundaries(tmp_path, monkeypatch):
+    r""" test that strips with particles straddling their common edge give
+    the same round whether played side by side or one after the other
+    """
+    import numpy as np
+    from amoebot.elements.bot import domain
+    from amoebot.elements.bot.batch import CompressEngine
+    from amoebot.elements.bot.table import ParticleTable
+    from amoebot.utils.shared_objects import SharedObjects
+
+    monkeypatch.chdir(tmp_path)
+    np.random.seed(1)
+
+    # a loose swarm where every move has room, cut down the middle
+    points = [(x, y) for x in range(24) for y in range(24) if (x + y) % 2 == 0]
+    chosen = np.random.choice(len(points), size=120, replace=False)
+    table = ParticleTable()
+    for ix, row in enumerate(chosen.tolist()):
+        table.add(ix, head=np.array(points[row]))
+        table.tau[ix] = .2
+    walls = np.zeros((0, 2), dtype=np.int64)
+
+    strips = [(-10, 12), (12, 40)]
+    x1 = table.records()
+    straddling = (np.abs(x1['head_x'] - 12) <= domain.REACH).sum()
+    assert straddling > 10
+
+    def play(order, start, seeds):
+        store = SharedObjects('strips', data=start.copy(), shared=True)
+        domain.attach_worker(store.handle, CompressEngine, walls)
+        for ix in order: domain.advance_strip(*strips[ix], seeds[ix])
+        records = store.records.copy()
+        store.close()
+        store.unlink()
+        return records
+
+    for rnd in range(20):
+        seeds = [2 * rnd, 2 * rnd + 1]
+        forward = play([0, 1], x1, seeds)
+        backward = play([1, 0], x1, seeds)
+
+        # every strip on its own from the same start
+        apart = x1.copy()
+        for ix, (lo, hi) in enumerate(strips):
+            x2 = play([ix], x1, seeds)
+            rows = domain.interior_rows(ParticleTable.from_records(x1), lo, hi)
+            apart[rows] = x2[rows]
+
+        for name in ('head_x', 'head_y', 'tail_x', 'tail_y'):
+            assert np.array_equal(forward[name], backward[name])
+            assert np.array_equal(forward[name], apart[name])
+        x1 = forward
+
+    assert not np.array_equal(x1, table.records())
+
+def test_kinetic_engine_tracks_acceptance():
+    r""" test that the rejection-free engines keep every acceptance
+    probability up to date as particles move
+    """
+    import numpy as np
+    from amoebot.elements.bot.kinetic import CompressKineticEngine
+    from amoebot.elements.bot.kinetic import MazeSolveKineticEngine
+    from amoebot.elements.bot.lookup import ADMISSIBLE, EDGE_DELTA
+    from amoebot.elements.bot.table import ParticleTable
+    from amoebot.elements.node.manager import NodeManagerBitArray
+
+    n_bots, width = 60, 6
+    bots = [[x, 2 * (ix // width) + x % 2] for ix, x in 
+                                        enumerate(np.arange(n_bots) % width)]
+    walls = np.array([[-3 + y % 2, y] for y in range(-20, 40)])
+
+    for engine_cls in (CompressKineticEngine, MazeSolveKineticEngine):
+        table = ParticleTable()
+        for ix, (x, y) in enumerate(bots):
+            table.add(ix, head=np.array([x, y]))
+            table.tau[ix] = .4
+
+        np.random.seed(0)
+        engine = engine_cls(table, walls=walls)
+        for _ in range(20): engine.step()
+        assert engine.moves > 0
+
+        # the incremental weights equal those of a fresh engine
+        fresh = engine_cls(table, walls=walls)
+        for entry in range(6 * n_bots):
+            assert engine.tree[entry] == fresh.tree[entry]
+
+        # and follow the proposals of the node manager
+        nm = NodeManagerBitArray(points=engine.points())
+        for wall in walls.tolist(): nm.add_wall(point=tuple(wall))
+        _lambda = np.exp(1 / np.float64(table.tau[0]))
+
+        for ix in range(n_bots):
+            nm.retarget(bot_id=ix)
+            for port in range(6):
+                mask = nm.propose(port=port)
+                if mask == -1 or not ADMISSIBLE[mask]:
+                    assert engine.tree[6 * ix + port] == 0.
+                elif engine_cls is CompressKineticEngine:
+                    weight = min(1., _lambda ** EDGE_DELTA[mask])
+                    assert np.isclose(engine.tree[6 * ix + port], weight)
+                else:
+                    k = nm.ping_for_wall(port, depth=engine.depth + 1)
+                    assert engine._ping(ix, port) == (k - 1 if k != -1 else -1)
+
+def test_tracker_streams_frames(tmp_path, monkeypatch):
+    r""" test that frames are appended as a stream and read back in order
+    """
+    import json
+    from amoebot.elements.tracker import StateTracker, read_tracks
+
+    monkeypatch.chdir(tmp_path)
+    frames = [[dict(head_pos=[i, 0], tail_pos=[i, 0])] for i in range(5)]
+
+    tracker = StateTracker('stream', fsync_every=2)
+    for frame in frames: tracker.update(frame)
+
+    rundir = tmp_path / '.dumps' / 'run-stream'
+    assert read_tracks(rundir) == frames
+
+    # a frame cut short is dropped, the stream resumes after a reopen
+    tracker.close()
+    with open(tracker.statefile, 'a') as f: f.write('[{"head_pos"')
+    assert read_tracks(rundir) == frames
+
+    tracker.update(frames[0])
+    assert read_tracks(rundir) == frames + frames[:1]
+    tracker.close()
+
+    # runs recorded before the stream still load
+    (rundir / 'tracks.jsonl').unlink()
+    with open(rundir / 'tracks.json', 'w') as f: json.dump(frames, f)
+    assert read_tracks(rundir) == frames
+
+def test_tracker_seeks_keyframes(tmp_path, monkeypatch):
+    r""" test that any frame of a delta-encoded stream is rebuilt from its
+    nearest keyframe, with or without the index
+    """
+    import numpy as np
+    from amoebot.elements.tracker import INDEX_FILE, StateTracker, TrackReader
+
+    monkeypatch.chdir(tmp_path)
+    np.random.seed(0)
+
+    positions = np.zeros((20, 4), dtype=np.int64)
+    frames = list()
+    tracker = StateTracker('delta', keyframe_every=4)
+    for _ in range(11):
+        moved = np.random.choice(20, size=3, replace=False)
+        positions[moved] += np.random.randint(-2, 3, size=(3, 1))
+        frames.append([dict(head_pos=p[:2], tail_pos=p[2:]) 
+                                            for p in positions.tolist()])
+        tracker.update(frames[-1])
+    tracker.close()
+
+    rundir = tmp_path / '.dumps' / 'run-delta'
+    reader = TrackReader(rundir)
+    assert reader.keyframes[:, 0].tolist() == [0, 4, 8]
+    assert [reader.frame(i) for i in range(11)] == frames
+
+    # appending after a restart continues the frame numbers
+    tracker.update(frames[0])
+    tracker.close()
+    assert TrackReader(rundir).keyframes[:, 0].tolist() == [0, 4, 8, 11]
+
+    (rundir / INDEX_FILE).unlink()
+    reader = TrackReader(rundir)
+    assert len(reader) == 12 and reader.frame(-1) == frames[0]
+    assert reader.frame(6) == frames[6]
+
+def test_trajectory_container_reads_ranges(tmp_path):
+    r""" test that the chunked container decodes any range of frames, maps
+    rounds to frames and survives a lost footer
+    """
+    import numpy as np
+    from amoebot.elements.trajectory import TrajectoryReader, TrajectoryWriter
+
+    np.random.seed(0)
+    frames = np.random.randint(-50, 50, size=(23, 10, 4))
+    path = tmp_path / 'tracks.bin'
+
+    for codec in ('zlib', 'lzma'):
+        path.unlink(missing_ok=True)
+        writer = TrajectoryWriter(path, chunk_frames=4, codec=codec)
+        for ix, positions in enumerate(frames[:10]):
+            writer.append(positions, rnd=100 * ix)
+        writer.close()
+
+        # frames are appended to an existing container
+        writer = TrajectoryWriter(path)
+        for ix, positions in enumerate(frames[10:], 10):
+            writer.append(positions, rnd=100 * ix)
+        writer.close()
+
+        reader = TrajectoryReader(path)
+        assert len(reader) == 23 and reader.codec == codec
+        for start, stop in ((0, 23), (3, 9), (22, 23), (5, 5)):
+            records = reader.read(start, stop)
+            assert np.array_equal(records['head_pos'],
+                                  frames[start:stop, :, :2])
+            assert np.array_equal(records['tail_pos'],
+                                  frames[start:stop, :, 2:])
+        assert reader.frame_of_round(1250) == 12
+        reader.close()
+
+        # without its footer the chunks are found by walking them
+        with open(path, 'rb+') as f: f.truncate(path.stat().st_size - 1)
+        reader = TrajectoryReader(path)
+        assert len(reader) == 23
+        assert reader.frame(-1)[0]['head_pos'] == frames[-1, 0, :2].tolist()
+
+def test_trajectory_keeps_wide_coordinates(tmp_path, monkeypatch):
+    r""" test that the binary container and the particle index keep the
+    int64 co-ordinates of a configuration past the int32 range
+    """
+    import json
+    import numpy as np
+    from amoebot.elements.stategen import StateGenerator
+    from amoebot.elements.tracker import particle_trajectory, read_tracks
+    from amoebot.elements.trajectory import (TrajectoryReader,
+                                             TrajectoryWriter)
+
+    far = 3 * 10 ** 9
+    monkeypatch.chdir(tmp_path)
+    run = tmp_path / '.dumps' / 'run-wide'
+    run.mkdir(parents=True)
+    with open(run / 'init0.json', 'w') as f:
+        json.dump(dict(bots=[[far, far], [far + 1, far + 1]], walls=[]), f)
+
+    manager = StateGenerator(config_num='wide', extent=(far - 10, far - 10,
+                             far + 10, far + 10), backend='bit_array').manager
+    tracker = manager.tracker
+    tracker.tracker.fmt = 'binary'
+    for rnd in range(3):
+        tracker.update(manager.amoebots.positions() + rnd, rnd=rnd)
+    tracker.close()
+
+    reader = TrajectoryReader(run / 'tracks.bin')
+    assert reader.coordinate_dtype == np.int64
+    assert read_tracks(run)[2][1]['head_pos'] == [far + 3, far + 3]
+    assert particle_trajectory(run, 1)[:, 0].tolist() == [far + 1 + r
+                                                           for r in range(3)]
+
+    # an int32 container refuses them instead of wrapping
+    writer = TrajectoryWriter(tmp_path / 'narrow.bin')
+    with pytest.raises(OverflowError):
+        writer.append(manager.amoebots.positions())
+
+def test_particle_index_reads_one_history(tmp_path, monkeypatch):
+    r""" test that the particle-major index holds the history of every
+    particle, built from either tracker format
+    """
+    import numpy as np
+    from amoebot.elements.tracker import (PARTICLE_INDEX_FILE, StateTracker,
+                                          build_particle_index,
+                                          particle_trajectory)
+
+    monkeypatch.chdir(tmp_path)
+    np.random.seed(0)
+    frames = np.random.randint(-50, 50, size=(37, 12, 4))
+
+    for fmt in ('jsonl', 'binary'):
+        tracker = StateTracker(fmt, fmt=fmt, keyframe_every=5, chunk_frames=8)
+        for rnd, positions in enumerate(frames):
+            tracker.update([dict(head_pos=p[:2], tail_pos=p[2:])
+                                for p in positions.tolist()], rnd=rnd)
+        tracker.close()
+
+        rundir = tmp_path / '.dumps' / f'run-{fmt}'
+        for bot_id in (0, 7, 11):
+            assert np.array_equal(particle_trajectory(rundir, bot_id),
+                                  frames[:, bot_id])
+        assert np.array_equal(particle_trajectory(rundir, 3, 10, 20),
+                              frames[10:20, 3])
+
+        # blocks smaller than a chunk give the same index
+        x1 = np.load(rundir / PARTICLE_INDEX_FILE)
+        build_particle_index(rundir, block_frames=3)
+        assert np.array_equal(np.load(rundir / PARTICLE_INDEX_FILE), x1)
+
+def test_queued_tracker_backpressure(tmp_path, monkeypatch):
+    r""" test that the background writer keeps the frame order, applies its
+    policy to a full queue and writes everything queued on close
+    """
+    import threading
+    import numpy as np
+    from amoebot.elements.tracker import (QueuedTracker, StateTracker,
+                                          TrackReader)
+
+    monkeypatch.chdir(tmp_path)
+    frames = np.arange(10 * 6 * 4).reshape(10, 6, 4)
+
+    class GatedTracker(StateTracker):
+        # holds the writer thread until the gate opens
+        gate = threading.Event()
+        def update(self, config, rnd=None):
+            self.gate.wait()
+            super().update(config, rnd=rnd)
+
+    written = dict()
+    for policy in ('block', 'drop', 'coalesce'):
+        GatedTracker.gate.clear()
+        tracker = QueuedTracker(GatedTracker(policy), maxsize=3,
+                                backpressure=policy)
+        if policy == 'block': GatedTracker.gate.set()
+
+        for rnd, positions in enumerate(frames.copy()):
+            tracker.update(positions, rnd=rnd)
+            positions += 1000
+
+        GatedTracker.gate.set()
+        tracker.close()
+
+        reader = TrackReader(tmp_path / '.dumps' / f'run-{policy}')
+        written[policy] = [reader.positions(i) for i in range(len(reader))]
+        assert tracker.n_dropped == 10 - len(reader)
+
+    # queued frames are copies taken at `update`
+    assert np.array_equal(written['block'], frames)
+
+    # the first frame may be taken off the queue before it fills
+    x1 = len(written['drop'])
+    assert x1 in (3, 4) and np.array_equal(written['drop'], frames[:x1])
+    assert np.array_equal(written['coalesce'][-1], frames[-1])
+
+    # unknown attributes raise AttributeError, also before a tracker is set
+    assert tracker.fmt == 'jsonl' and not hasattr(tracker, 'missing')
+    assert not hasattr(QueuedTracker.__new__(QueuedTracker), 'fmt')
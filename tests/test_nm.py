@@ -126,3 +126,367 @@ def test_distance_calculation():
 
             # See if test count is the same as ping value
             assert nm.ping_for_wall(j, depth=10) == test
+
+
+def test_retarget_shared_manager():
+    """
+    Test that one manager can be shared between bots by retargeting it.
+    """
+    data = {"bots": [[11, 21], [15, 21]], "walls": []}
+    nm = manager.NodeManagerBitArray(nodes=get_loaded_nodes(data))
+
+    nodes_by_point = nm.nodes_by_point
+    for bot_id, (x, y) in enumerate(data["bots"]):
+        assert nm.retarget(bot_id=bot_id) is nm
+        assert nm.current_position().tolist() == [[x, y], [x, y]]
+
+    # moves made through the shared manager are visible to every bot
+    nm.retarget(bot_id=0)
+    nm.move_to(port=1)
+    nm.contract_forward()
+    nm.retarget(bot_id=1)
+    assert nm.is_occupied(x=11, y=23)
+    assert nm.nodes_by_point is nodes_by_point
+
+
+def test_working_nodes_table_consistency():
+    """
+    Test that the bot to working node table follows random moves.
+    """
+    data = {"bots": [[11, 21], [12, 22], [11, 23], [10, 22]], "walls": []}
+    nm = manager.NodeManagerBitArray(nodes=get_loaded_nodes(data),
+                                     validate=True)
+    nm.check_working_nodes()
+
+    for _ in range(500):
+        nm.retarget(bot_id=random.randint(0, len(data["bots"]) - 1))
+        if nm.move_to(port=random.randint(0, 5)):
+            if random.random() < .5:
+                nm.contract_forward()
+            else:
+                nm.contract_backward()
+
+    nm.check_working_nodes()
+
+
+def test_allocator_amortized_growth():
+    """
+    Test that lazily created nodes come from the free-list and the node array
+    only grows geometrically.
+    """
+    nm = get_nm_with_bot_0(empty_1_bot)
+    allocator = nm.allocator
+
+    # a ping only reads, the nodes along its rays are created by point
+    size = nm.nodes.size
+    for port in range(6):
+        nm.ping_for_wall(port=port, depth=200)
+    assert nm.nodes.size == size
+
+    x, y = nm.current_position()[0].tolist()
+    for port in range(6):
+        dx, dy = layout[port]
+        for k in range(1, 201):
+            nm.get_node(x=x + k * dx, y=y + k * dy)
+
+    stats = allocator.stats
+    assert stats['allocations'] == 6 * 200
+    assert stats['resizes'] <= math.ceil(math.log2(nm.nodes.size))
+    assert stats['free'] == np.count_nonzero(nm.nodes.get_enabled_type() == 0)
+
+
+def test_node_store_views():
+    """
+    Test that Node views write through to the packed store columns.
+    """
+    nm = get_nm_with_bot_0(single_bot_10_diameter_wall)
+    nodes = nm.nodes
+
+    wall = nm.get_node(x=11, y=11)
+    assert wall.is_wall() and not wall.occupied
+
+    head = nm.get_node(x=11, y=21)
+    assert (head.bot_id, head.bot_contraction_status) == (0, 3)
+    for port in range(6):
+        head.set_signal_on_port(value=1, port=port)
+        assert head.get_signal_status(port=port) == 1
+    assert nodes.signals[head.index] == 0b111111
+    assert (head.bot_id, head.bot_contraction_status) == (0, 3)
+
+    # int32 co-ordinates and bot id, one flags byte and one byte of packed
+    # signals, under half the 36 bytes of the old int16 node matrix
+    assert nodes.bytes_per_node() == 4 + 4 + 4 + 1 + 1
+    assert nodes.bytes_per_node() < 36 / 2
+
+    # neighbors are found by point
+    below = nm.get_node(x=11, y=19)
+    assert head.get_neighbor_index(port=4) == below.index
+
+
+def test_lattice_matches_bit_array():
+    """
+    Test that the dense lattice backend answers like the bit array backend.
+    """
+    from amoebot.elements.node.lattice import NodeManagerLattice, extent_of
+
+    data = dict(single_bot_10_diameter_wall)
+    data["bots"] = [[11, 21], [12, 22], [10, 20]]
+    points = np.zeros([4, len(data["bots"])])
+    for ix, (x, y) in enumerate(data["bots"]):
+        points[:, ix] = x, y, x, y
+
+    nm = manager.NodeManagerBitArray(points=points)
+    lattice = NodeManagerLattice(extent=extent_of(data["walls"]),
+                                 points=points, validate=True)
+    for wall in data["walls"]:
+        nm.add_wall(point=tuple(wall))
+        lattice.add_wall(point=tuple(wall))
+
+    for _ in range(500):
+        bot_id = random.randint(0, len(data["bots"]) - 1)
+        nm.retarget(bot_id=bot_id)
+        lattice.retarget(bot_id=bot_id)
+
+        for p, q in zip(nm.open_ports(), lattice.open_ports()):
+            assert p == q
+        for port in range(6):
+            assert nm.ping_for_wall(port, depth=10) == \
+                lattice.ping_for_wall(port, depth=10)
+
+        port = random.randint(0, 5)
+        assert nm.move_to(port) == lattice.move_to(port)
+        assert [len(s) for s in nm.get_occupied_neighbors()] == \
+            [len(s) for s in lattice.get_occupied_neighbors()]
+
+        if random.random() < .5:
+            nm.contract_forward()
+            lattice.contract_forward()
+        else:
+            nm.contract_backward()
+            lattice.contract_backward()
+        assert np.array_equal(nm.current_position(),
+                              lattice.current_position())
+
+
+def test_chunked_lattice_frees_blocks():
+    """
+    Test that the unbounded lattice follows the bit array backend and only
+    keeps the blocks the bots are standing on.
+    """
+    from amoebot.elements.node.lattice import NodeManagerLattice
+
+    points = np.array([[0., 2.], [0., 0.], [0., 2.], [0., 0.]])
+    nm = manager.NodeManagerBitArray(points=points)
+    lattice = NodeManagerLattice(points=points, validate=True, block_size=4)
+
+    for _ in range(500):
+        bot_id = random.randint(0, 1)
+        nm.retarget(bot_id=bot_id)
+        lattice.retarget(bot_id=bot_id)
+
+        for p, q in zip(nm.open_ports(), lattice.open_ports()):
+            assert p == q
+
+        port = random.randint(0, 5)
+        assert nm.move_to(port) == lattice.move_to(port)
+        nm.contract_forward()
+        lattice.contract_forward()
+        assert np.array_equal(nm.current_position(),
+                              lattice.current_position())
+
+        # contracted bots touch at most one block each
+        assert len(lattice.lattice.blocks) <= 2
+
+    chunks = lattice.lattice
+    assert chunks.allocations - chunks.releases == len(chunks.blocks)
+    assert chunks.releases > 0
+
+
+def test_compaction_bounds_node_array():
+    """
+    Test that compaction keeps the walk identical to an uncompacted one while
+    bounding the node array.
+    """
+    points = np.array([[0., 2.], [0., 0.], [0., 2.], [0., 0.]])
+    nm = manager.NodeManagerBitArray(points=points, compaction_ratio=None)
+    compacted = manager.NodeManagerBitArray(points=points, validate=True,
+                                            compaction_ratio=4.)
+
+    for _ in range(2000):
+        bot_id = random.randint(0, 1)
+        nm.retarget(bot_id=bot_id)
+        compacted.retarget(bot_id=bot_id)
+
+        for p, q in zip(nm.open_ports(), compacted.open_ports()):
+            assert p == q
+
+        port = random.randint(0, 5)
+        assert nm.move_to(port) == compacted.move_to(port)
+        nm.contract_forward()
+        compacted.contract_forward()
+        assert np.array_equal(nm.current_position(),
+                              compacted.current_position())
+
+    assert compacted.reclaimed > 0
+    assert compacted.nodes.size < nm.nodes.size
+
+    # points in the dictionary still lead to nodes at those points
+    nodes = compacted.nodes
+    for x, column in compacted.nodes_by_point.items():
+        for y, index in column.items():
+            assert (nodes.x[index], nodes.y[index]) == (x, y)
+
+
+def test_memmap_store_reopens(tmp_path):
+    """
+    Test that a memory-mapped node array grows on disk and can be reopened.
+    """
+    from amoebot.elements.node.store import MemmapNodeStore
+
+    points = np.array([[0., 2.], [0., 0.], [0., 2.], [0., 0.]])
+    nodes = MemmapNodeStore(directory=tmp_path)
+    nm = manager.NodeManagerBitArray(points=points, nodes=nodes, validate=True)
+
+    for _ in range(200):
+        nm.retarget(bot_id=random.randint(0, 1))
+        nm.move_to(random.randint(0, 5))
+        nm.contract_forward()
+
+    assert isinstance(nm.nodes, MemmapNodeStore)
+    assert isinstance(nm.nodes.bot_id, np.memmap)
+    assert nm.nodes.bytes_per_node() == nm.nodes.copy().bytes_per_node()
+    nm.nodes.flush()
+
+    reopened = manager.NodeManagerBitArray(
+        nodes=MemmapNodeStore.open(directory=tmp_path))
+    assert reopened.working_nodes_by_bot == nm.working_nodes_by_bot
+    assert reopened.nodes_by_point == nm.nodes_by_point
+
+
+def test_reorder_follows_morton_curve():
+    """
+    Test that reordering sorts the active columns along the Morton curve
+    without changing what the manager answers.
+    """
+    from amoebot.elements.node.manager_utils import get_morton_keys_ver_0
+
+    points = np.array([[0., 2., 4.], [0., 0., 0.], [0., 2., 4.], [0., 0., 0.]])
+    nm = manager.NodeManagerBitArray(points=points, validate=True,
+                                     compaction_ratio=None)
+    reference = manager.NodeManagerBitArray(points=points,
+                                            compaction_ratio=None)
+
+    for k in range(300):
+        if k % 50 == 0:
+            nm.reorder()
+            nodes = nm.nodes
+            active = np.where(nodes.get_enabled_type() != 0)[0]
+            assert np.array_equal(active, np.arange(active.size))
+            keys = get_morton_keys_ver_0(x=nodes.x[active], y=nodes.y[active])
+            assert np.all(np.diff(keys.astype(np.int64)) >= 0)
+
+        bot_id = random.randint(0, 2)
+        nm.retarget(bot_id=bot_id)
+        reference.retarget(bot_id=bot_id)
+        port = random.randint(0, 5)
+        assert nm.move_to(port) == reference.move_to(port)
+        nm.contract_backward()
+        reference.contract_backward()
+
+    assert sorted(nm.curve_order()) == [0, 1, 2]
+
+
+def test_wide_coordinates():
+    """
+    Test that an int64 node store walks bots far beyond the int32 range.
+    """
+    far = 5 * 10 ** 9
+    points = np.array([[far, far + 2], [far, far], [far, far + 2], [far, far]],
+                      dtype=np.int64)
+    nm = manager.NodeManagerBitArray(points=points, validate=True,
+                                     coordinate_dtype=np.int64)
+
+    nm.retarget(bot_id=1)
+    assert nm.move_to(port=1)
+    nm.contract_forward()
+    assert nm.current_position().tolist() == [[far + 2, far + 2]] * 2
+    assert nm.is_occupied(x=far, y=far)
+
+def test_propose_is_side_effect_free():
+    """
+    Test that a proposal reads the move without writing and that committing
+    it equals expanding and contracting to the head.
+    """
+    from amoebot.elements.node.lattice import NodeManagerLattice
+
+    bots = [[x, 2 * (ix // 5) + x % 2] for ix, x in
+            enumerate(np.arange(20) % 5)]
+    points = np.array([[x, y, x, y] for x, y in bots], dtype=np.int64).T
+
+    proposer = manager.NodeManagerBitArray(points=points, validate=True)
+    lattice = NodeManagerLattice(points=points, validate=True)
+    mover = manager.NodeManagerBitArray(points=points, validate=True)
+
+    for _ in range(300):
+        bot_id, port = random.randint(0, len(bots) - 1), random.randint(0, 5)
+        proposer.retarget(bot_id=bot_id)
+        lattice.retarget(bot_id=bot_id)
+        mover.retarget(bot_id=bot_id)
+
+        size, flags = proposer.nodes.size, proposer.nodes.flags.copy()
+        mask = proposer.propose(port=port)
+        assert proposer.nodes.size == size
+        assert np.array_equal(proposer.nodes.flags, flags)
+        assert lattice.propose(port=port) == mask
+
+        # so does a ping, past the nodes created so far
+        assert proposer.ping_for_wall(port, depth=30) == \
+            lattice.ping_for_wall(port, depth=30)
+        assert proposer.nodes.size == size
+
+        assert mover.move_to(port=port) == (mask != -1)
+        if mask == -1:
+            continue
+        assert mover.neighborhood_mask() == mask
+
+        if random.random() < .5:
+            proposer.commit(port=port)
+            lattice.commit(port=port)
+            mover.contract_forward()
+        else:
+            mover.contract_backward()
+
+        assert np.array_equal(proposer.current_position(),
+                              mover.current_position())
+        assert np.array_equal(lattice.current_position(),
+                              mover.current_position())
+
+def test_relocate_sparse_bot_ids():
+    """
+    Test that relocating places every bot under its own id when the ids of
+    the particle table are not 0 to n - 1.
+    """
+    import pytest
+    from amoebot.elements.bot.batch import CompressEngine
+    from amoebot.elements.bot.table import ParticleTable
+    from amoebot.elements.node.lattice import NodeManagerLattice
+
+    points = np.array([[x, 0, x, 0] for x in range(0, 10, 2)],
+                      dtype=np.int64).T
+
+    # bots 0, 1, 2 and 4 were removed, 9 and 12 loaded from elsewhere
+    table = ParticleTable()
+    moved = {3: [4, 4], 9: [7, 9], 12: [-5, 1]}
+    for bot_id, head in moved.items():
+        table.add(bot_id, head=np.array(head))
+    engine = CompressEngine(table)
+
+    for nm in (manager.NodeManagerBitArray(points=points, validate=True),
+               NodeManagerLattice(points=points, validate=True)):
+        nm.relocate(points=engine.points(), bot_ids=engine.bot_ids())
+
+        for bot_id, head in moved.items():
+            assert nm.retarget(bot_id=bot_id).current_position().tolist() \
+                == [head, head]
+        with pytest.raises(ValueError):
+            nm.retarget(bot_id=1)